@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Engine polling asyncio - cek banyak produk sekaligus
+dengan batas konkurensi global dan per host
+"""
+
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+from burst import BurstMode
+from scheduler import AdaptiveScheduler
+
+logger = logging.getLogger(__name__)
+
+# Batas tunggu perubahan jadwal dari thread lain diproses event loop (detik)
+LOOP_CALL_TIMEOUT = 10
+
+
+class AsyncPollingEngine:
+    """Jalankan check_product secara paralel untuk semua produk"""
+
+    def __init__(self, monitor, max_concurrency=None, per_host_concurrency=None):
+        self.monitor = monitor
+        config = monitor.config
+        self.max_concurrency = max(1, max_concurrency or config.MAX_CONCURRENCY)
+        self.per_host_concurrency = max(1, per_host_concurrency or config.PER_HOST_CONCURRENCY)
+        self.polite_delay = (config.POLITE_DELAY_MIN, config.POLITE_DELAY_MAX)
+
+        # Metode fetch pakai requests (blocking), jadi dijalankan di thread pool
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix='poll'
+        )
+        # Semaphore dibuat per event loop (lihat _limits): start_monitoring menjalankan
+        # asyncio.run ulang dengan engine yang sama setelah error
+        self._limits_loop = None
+        self._global_limit = None
+        self._host_limits = {}
+
+        self._wakeup = None
+        self._loop = None
+        self.scheduler = AdaptiveScheduler(config, monitor.metrics)
+        for product_name, product_url in monitor.products.items():
+            self.scheduler.add(product_name, product_url)
+
+    def _limits(self, url):
+        """(semaphore global, semaphore host dari URL) untuk event loop yang sedang jalan"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._limits_loop:
+            # Semaphore terikat ke loop pertama yang memakainya: loop baru = semaphore baru
+            self._limits_loop = loop
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+            self._host_limits = {}
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._global_limit, self._host_limits[host]
+
+    async def _polite_pause(self):
+        """Jeda acak kecil sebelum slot host dilepas"""
+        low, high = self.polite_delay
+        delay = random.uniform(low, high) if high > 0 else 0
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def run_blocking(self, func, *args):
+        """Jalankan fungsi blocking di thread pool engine"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def limited(self, url, func, *args):
+        """Jalankan fungsi blocking di dalam slot global + slot host dari url"""
+        # Slot host diambil dulu supaya slot global tidak tertahan
+        # oleh task yang masih antri di host yang sama
+        global_limit, host_limit = self._limits(url)
+        async with host_limit:
+            async with global_limit:
+                result = await self.run_blocking(func, *args)
+                await self._polite_pause()
+                return result
+
+    async def check_one(self, product_name, product_url, product_info=None):
+        """Cek satu produk di dalam batas konkurensi"""
+        if product_info is not None:
+            # Data sudah ada dari batch, tidak perlu request lagi
+            return await self.run_blocking(
+                self.monitor.check_product, product_url, product_name, product_info
+            )
+        return await self.limited(
+            product_url, self.monitor.check_product, product_url, product_name
+        )
+
+    async def prefetch(self, product_urls):
+        """Ambil data produk lewat batch API v4, return dict url -> product_info"""
+        chunks = self.monitor.batch_chunks(product_urls)
+        if not chunks:
+            return {}
+
+        base_url = self.monitor.base_url
+        results = await asyncio.gather(
+            *(self.limited(base_url, self.monitor.method_1_batch, chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        prefetched = {}
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Batch error: {result}")
+                continue
+            prefetched.update(result)
+        return prefetched
+
+    async def sweep(self, products=None, shops=False):
+        """Cek semua produk sekali (shops=True: listing toko juga), return durasi sweep (detik)"""
+        if products is None:
+            products = self.monitor.products
+        items = list(products.items())
+
+        started = time.monotonic()
+        prefetched = {}
+        if self.monitor.config.BATCH_FETCH:
+            prefetched = await self.prefetch([url for _, url in items])
+
+        checks = [self.check_one(name, url, prefetched.get(url)) for name, url in items]
+        if shops:
+            checks.append(self.sweep_shops())
+        results = await asyncio.gather(*checks, return_exceptions=True)
+        for (product_name, _), result in zip(items, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Error cek {product_name}: {result}")
+
+        elapsed = time.monotonic() - started
+        self.monitor.metrics.sweep_duration.observe(elapsed)
+        return elapsed
+
+    async def sweep_shops(self):
+        """Crawl listing semua toko di SHOPS sekali (satu toko = satu slot host)"""
+        watcher = self.monitor.shop_watch
+        if watcher is None:
+            return
+        names = list(watcher.shops)
+        results = await asyncio.gather(
+            *(self.limited(self.monitor.base_url, watcher.crawl, name) for name in names),
+            return_exceptions=True
+        )
+        for shop_name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Error cek toko {shop_name}: {result}")
+
+    async def run_shops(self):
+        """Loop pantau toko, terpisah dari jadwal produk"""
+        while True:
+            await self.sweep_shops()
+            await asyncio.sleep(self.monitor.config.SHOP_CHECK_INTERVAL)
+
+    async def run(self):
+        """Loop monitoring sesuai SCHEDULE_MODE (+ loop pantau toko / window burst jika diisi)"""
+        # Perubahan watchlist dari thread lain dijalankan di loop ini (lihat _in_loop)
+        self._loop = asyncio.get_running_loop()
+        tasks = []
+        if self.monitor.shop_watch is not None:
+            tasks.append(asyncio.create_task(self.run_shops()))
+        if self.monitor.config.BURST_WINDOWS:
+            tasks.append(asyncio.create_task(BurstMode(self.monitor, self).run()))
+        try:
+            if self.monitor.config.SCHEDULE_MODE == 'sweep':
+                await self.run_sweeps()
+            else:
+                await self.run_scheduled()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run_sweeps(self):
+        """Loop monitoring: sweep paralel lalu tunggu CHECK_INTERVAL"""
+        while True:
+            logger.info(f"\n{'#'*60}")
+            logger.info(f"🔄 PENGECEKAN BARU - {datetime.now().strftime('%d-%m-%Y %H:%M:%S')}")
+            logger.info(f"{'#'*60}\n")
+
+            elapsed = await self.sweep()
+            await self.run_blocking(self.monitor.product_status.flush)
+
+            self.monitor.log_stats()
+            logger.info(
+                f"\n✅ Pengecekan {len(self.monitor.products)} produk selesai dalam {elapsed:.1f} detik. "
+                f"Tunggu {self.monitor.check_interval} detik...\n"
+            )
+            await asyncio.sleep(self.monitor.check_interval)
+
+    async def _scheduled_check(self, product_name, product_url, prefetch=None):
+        """Cek produk lalu laporkan hasilnya ke scheduler (prefetch = task batch bersama)"""
+        product_info = None
+        if prefetch is not None:
+            try:
+                product_info = (await prefetch).get(product_url)
+            except Exception as e:
+                logger.warning(f"⚠️ Batch error: {e}")
+        try:
+            result = await self.check_one(product_name, product_url, product_info)
+        except Exception as e:
+            logger.error(f"❌ Error cek {product_name}: {e}")
+            result = None
+        interval = self.scheduler.report(product_name, result)
+        if interval is not None:
+            logger.debug(f"⏱️ {product_name}: cek lagi dalam {interval:.0f} detik")
+        self.wakeup()
+
+    def wakeup(self):
+        """Bangunkan loop scheduler (jadwal berubah)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _in_loop(self, func, *args):
+        """Jalankan func di thread event loop dan tunggu hasilnya
+
+        monitor.products dan heap scheduler hanya diubah dari loop (BurstMode
+        dan loop jadwal mengiterasinya tanpa lock). Dari thread lain (perintah
+        Telegram) panggilan dikirim lewat run_coroutine_threadsafe; tanpa loop
+        yang berjalan langsung dijalankan di sini.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed() or not loop.is_running():
+            return func(*args)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return func(*args)
+
+        async def call():
+            return func(*args)
+
+        return asyncio.run_coroutine_threadsafe(call(), loop).result(timeout=LOOP_CALL_TIMEOUT)
+
+    def add_product(self, product_name, product_url):
+        """Tambah produk ke monitoring tanpa restart (aman dari thread lain)"""
+        return self._in_loop(self._add_product, product_name, product_url)
+
+    def _add_product(self, product_name, product_url):
+        self.monitor.products[product_name] = product_url
+        self.scheduler.add(product_name, product_url)
+        self.wakeup()
+
+    def remove_product(self, product_name):
+        """Hapus produk dari monitoring, return URL-nya (None jika tidak ada; aman dari thread lain)"""
+        return self._in_loop(self._remove_product, product_name)
+
+    def _remove_product(self, product_name):
+        product_url = self.monitor.products.pop(product_name, None)
+        self.scheduler.remove(product_name)
+        self.wakeup()
+        return product_url
+
+    def set_interval(self, seconds, product_name=None):
+        """Ubah interval cek global atau satu produk tanpa restart (aman dari thread lain)"""
+        return self._in_loop(self._set_interval, seconds, product_name)
+
+    def _set_interval(self, seconds, product_name):
+        if product_name is None:
+            self.monitor.check_interval = seconds
+        changed = self.scheduler.set_interval(seconds, product_name)
+        self.wakeup()
+        return changed
+
+    async def _wait_for_wakeup(self, timeout):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def run_scheduled(self):
+        """Loop monitoring adaptif / fixed: cek produk yang jatuh tempo di scheduler"""
+        pending = set()
+        checks = 0
+        missed = 0
+        last_report = time.monotonic()
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+
+        while True:
+            # Jangan ambil lebih banyak dari yang bisa dikerjakan paralel
+            room = self.max_concurrency * 2 - len(pending)
+            due = self.scheduler.pop_due(limit=room) if room > 0 else []
+
+            if due:
+                # Batch jalan sebagai task sendiri: POST batch yang lambat tidak menahan loop
+                prefetch = None
+                if self.monitor.config.BATCH_FETCH:
+                    prefetch = asyncio.create_task(self.prefetch([url for _, url in due]))
+                for product_name, product_url in due:
+                    task = asyncio.create_task(
+                        self._scheduled_check(product_name, product_url, prefetch)
+                    )
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                checks += len(due)
+
+            if self.monitor.product_status.flush_due():
+                await self.run_blocking(self.monitor.product_status.flush)
+
+            now = time.monotonic()
+            if now - last_report >= self.monitor.check_interval:
+                self.monitor.log_stats()
+                logger.info(
+                    f"✅ {checks} pengecekan dalam {now - last_report:.0f} detik terakhir "
+                    f"({len(self.scheduler)} produk dijadwalkan)"
+                )
+                if self.scheduler.fixed:
+                    misses = self.scheduler.misses()
+                    total = sum(misses.values())
+                    if total > missed:
+                        worst = sorted(misses.items(), key=lambda item: -item[1])[:3]
+                        logger.warning(
+                            f"⏰ {total - missed} deadline miss baru (total per produk: "
+                            + ', '.join(f"{name} {count}x" for name, count in worst) + ")"
+                        )
+                    missed = total
+                checks = 0
+                last_report = now
+
+            wait = self.scheduler.seconds_until_next()
+            if wait is None or room <= 0:
+                wait = 1.0
+            await self._wait_for_wakeup(min(max(wait, 0.01), 1.0))
+
+    def close(self):
+        """Matikan thread pool"""
+        self._executor.shutdown(wait=False)
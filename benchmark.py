@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark offline pakai server Shopee & Telegram lokal (tanpa hit server asli)
+
+Yang diukur: throughput sweep, waktu deteksi restock (p50/p99, dari stok
+berubah di server sampai pesan diterima Telegram), biaya parsing HTML
+per halaman di method_2_html_scraping (fast path lxml vs BeautifulSoup),
+cold start mode --once di proses baru dan memori per produk (record
+hasil cek + tabel status).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from config import Config
+from bot_reliable import ShopeeMonitorReliable
+from async_engine import AsyncPollingEngine
+from fake_server import FakeShopeeServer, FakeTelegramServer
+from response_cache import ResponseCache
+from state_store import StateStore
+from product_record import Method, ProductSnapshot
+import fast_extract
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SHOP_ID = 7000
+
+
+def percentile(values, pct):
+    """Persentil nearest-rank, None jika values kosong"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+@contextmanager
+def config_overrides(**overrides):
+    """Ganti atribut Config sementara (monitor membaca Config saat dibuat)"""
+    original = {name: getattr(Config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(Config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in original.items():
+            setattr(Config, name, value)
+
+
+def product_page(item, filler_kb=200):
+    """Halaman produk mirip Shopee: banyak script di head, JSON-LD, body besar"""
+    filler = []
+    size = 0
+    index = 0
+    while size < filler_kb * 1024 // 2:
+        script = f"<script>window.__chunk_{index}=" + json.dumps({'k': 'x' * 900, 'i': index}) + ";</script>\n"
+        filler.append(script)
+        size += len(script)
+        index += 1
+    ld = {
+        '@type': 'Product',
+        'name': item['name'],
+        'brand': {'name': item['shop_name']},
+        'offers': {
+            'price': str(item['price'] // 100000),
+            'lowPrice': str(item['price_min'] // 100000),
+            'highPrice': str(item['price_max'] // 100000),
+            'availability': 'http://schema.org/InStock' if item['stock'] > 0 else 'http://schema.org/OutOfStock',
+        },
+    }
+    body = ''.join(
+        f'<div class="item-{i}"><span>Rekomendasi {i}</span><a href="/p/{i}">lihat</a></div>\n'
+        for i in range(filler_kb * 1024 // 2 // 80)
+    )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">\n'
+        f'<meta property="og:title" content="{item["name"]}">\n'
+        + ''.join(filler)
+        + f'<script type="application/ld+json">{json.dumps(ld)}</script>\n'
+        + '</head><body>\n' + body
+        + ('<button>Beli Sekarang</button>' if item['stock'] > 0 else '<span>Stok habis</span>')
+        + '</body></html>'
+    )
+
+
+class BenchmarkServers:
+    """Server Shopee + Telegram lokal berisi N produk (semua awalnya habis)"""
+
+    def __init__(self, args):
+        self.args = args
+        self.shopee = FakeShopeeServer()
+        self.telegram = FakeTelegramServer()
+        self.products = {}
+
+    def __enter__(self):
+        args = self.args
+        self.shopee.start()
+        self.telegram.start()
+        self.shopee.configure(
+            latency=args.latency, jitter=args.jitter,
+            error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed
+        )
+        if args.recording:
+            self.shopee.load_recording(args.recording)
+            for shop_id, item_id in self.shopee.items:
+                self.products[f"Rekaman {shop_id}.{item_id}"] = self.shopee.product_url(shop_id, item_id)
+        for i in range(args.products):
+            item_id = 100000 + i
+            self.shopee.add_item(SHOP_ID, item_id, name=f"Bench {i:05d}", price=10000 + i, stock=0)
+            self.products[f"Bench {i:05d}"] = self.shopee.product_url(SHOP_ID, item_id)
+            self.update_page(SHOP_ID, item_id)
+        return self
+
+    def __exit__(self, *exc):
+        self.shopee.stop()
+        self.telegram.stop()
+
+    def update_page(self, shop_id, item_id):
+        item = self.shopee.items[(shop_id, item_id)]
+        self.shopee.add_page(shop_id, item_id, product_page(item, self.args.page_kb))
+
+    def set_stock(self, product_name, stock):
+        """Ubah stok di API dan halaman HTML sekaligus"""
+        item_id = int(self.products[product_name].rsplit('.', 1)[1])
+        self.shopee.set_stock(SHOP_ID, item_id, stock)
+        self.update_page(SHOP_ID, item_id)
+
+    def overrides(self, **extra):
+        overrides = {
+            'SHOPEE_BASE_URL': self.shopee.base_url,
+            'TELEGRAM_API_URL': self.telegram.base_url,
+            'TELEGRAM_BOT_TOKEN': self.telegram.token,
+            'TELEGRAM_CHAT_ID': 'benchmark',
+            'STATE_DB': ':memory:',
+            'HISTORY_DIR': '',
+            'POLITE_DELAY_MIN': 0,
+            'POLITE_DELAY_MAX': 0,
+            'METHOD_RETRY_DELAY': 0,
+        }
+        overrides.update(extra)
+        return config_overrides(**overrides)
+
+
+def new_monitor(servers):
+    monitor = ShopeeMonitorReliable(state_path=':memory:', products=servers.products)
+    monitor.base_url = servers.shopee.base_url
+    return monitor
+
+
+def bench_sweep(servers, args):
+    """Throughput sweep penuh, dengan dan tanpa batch API v4"""
+    results = {}
+    for batch in (True, False):
+        with servers.overrides(BATCH_FETCH=batch):
+            monitor = new_monitor(servers)
+            engine = AsyncPollingEngine(monitor)
+            servers.shopee.hits.clear()
+
+            async def sweeps():
+                return [await engine.sweep() for _ in range(args.sweeps)]
+
+            try:
+                durations = asyncio.run(sweeps())
+            finally:
+                engine.close()
+                monitor.shutdown()
+
+        hits = servers.shopee.hits
+        requests_made = sum(count for path, count in hits.items() if not path.startswith('error_'))
+        best = min(durations)
+        results['batch' if batch else 'per_item'] = {
+            'products': len(servers.products),
+            'sweep_seconds_best': best,
+            'sweep_seconds_median': percentile(durations, 50),
+            'products_per_second': len(servers.products) / best if best > 0 else None,
+            'requests_per_sweep': requests_made / args.sweeps,
+            'errors_500': hits['error_500'],
+            'errors_429': hits['error_429'],
+        }
+    return results
+
+
+async def _restock_run(servers, engine, monitor, args):
+    task = asyncio.create_task(engine.run_scheduled())
+    urls = list(servers.products.values())
+    try:
+        # Tunggu semua produk dicek sekali (status awal HABIS tercatat)
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            if all('is_available' in monitor.product_status.get(monitor.identities.key(url), {}) for url in urls):
+                break
+            await asyncio.sleep(0.05)
+
+        rng = random.Random(args.seed)
+        # Hanya produk sintetis yang stoknya bisa diubah
+        candidates = [name for name in servers.products if name.startswith('Bench ')]
+        names = rng.sample(candidates, min(args.restocks, len(candidates)))
+        restocked = {}
+        for name in names:
+            await asyncio.sleep(rng.uniform(0, args.max_interval / 2))
+            servers.set_stock(name, 10)
+            restocked[name] = time.monotonic()
+
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            if len(detection_lags(servers, restocked)) == len(restocked):
+                break
+            await asyncio.sleep(0.05)
+        return restocked
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def detection_lags(servers, restocked):
+    """Detik dari stok berubah sampai pesan READY diterima Telegram lokal"""
+    lags = {}
+    received = list(zip(servers.telegram.received_at, servers.telegram.messages))
+    for name, flipped_at in restocked.items():
+        url = servers.products[name] + '\n'
+        for received_at, (_, text) in received:
+            if received_at >= flipped_at and 'READY STOCK' in text and url in text:
+                lags[name] = received_at - flipped_at
+                break
+    return lags
+
+
+def bench_restock(servers, args):
+    """Waktu deteksi restock dengan jadwal adaptif + antrian Telegram"""
+    with servers.overrides(
+        SCHEDULE_MODE='adaptive',
+        CHECK_INTERVAL=args.max_interval,
+        MIN_CHECK_INTERVAL=args.min_interval,
+        MAX_CHECK_INTERVAL=args.max_interval,
+    ):
+        monitor = new_monitor(servers)
+        engine = AsyncPollingEngine(monitor)
+        try:
+            restocked = asyncio.run(_restock_run(servers, engine, monitor, args))
+        finally:
+            engine.close()
+            monitor.shutdown()
+
+    lags = list(detection_lags(servers, restocked).values())
+    return {
+        'restocks': len(restocked),
+        'detected': len(lags),
+        'p50_seconds': percentile(lags, 50),
+        'p99_seconds': percentile(lags, 99),
+        'max_seconds': max(lags) if lags else None,
+    }
+
+
+def _timed(func, runs):
+    """(ms wall, ms CPU thread) rata-rata per panggilan"""
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    for _ in range(runs):
+        func()
+    return (
+        (time.perf_counter() - wall) * 1000 / runs,
+        (time.thread_time() - cpu) * 1000 / runs,
+    )
+
+
+def bench_parse(servers, args):
+    """Biaya parsing satu halaman produk: parser saja dan method_2 lewat HTTP lokal"""
+    name = next(iter(servers.products))
+    url = servers.products[name]
+    item_id = int(url.rsplit('.', 1)[1])
+    html = product_page(servers.shopee.items[(SHOP_ID, item_id)], args.page_kb)
+    body = html.encode('utf-8')
+    results = {'page_kb': len(body) / 1024}
+
+    with servers.overrides():
+        monitor = new_monitor(servers)
+        try:
+            parsers = {'beautifulsoup': lambda: monitor.parse_html_bs(html)}
+            if fast_extract.available():
+                parsers['lxml_fast'] = lambda: fast_extract.extract_product_info(
+                    (body[i:i + 16384] for i in range(0, len(body), 16384)), encoding='utf-8'
+                )
+            for parser, func in parsers.items():
+                wall_ms, cpu_ms = _timed(func, args.parse_runs)
+                results[parser] = {'wall_ms': wall_ms, 'cpu_ms': cpu_ms}
+
+            # method_2 end-to-end (tanpa error injection), cache dimatikan / aktif
+            shopee = servers.shopee
+            saved = (shopee.error_rate, shopee.throttle_rate, shopee.latency, shopee.latency_jitter)
+            shopee.error_rate = shopee.throttle_rate = shopee.latency = shopee.latency_jitter = 0
+            try:
+                for fast in (True, False):
+                    monitor.config.FAST_HTML = fast
+                    label = 'method_2_fast' if fast else 'method_2_bs'
+                    monitor.response_cache = ResponseCache(0)
+                    wall_ms, cpu_ms = _timed(lambda: monitor.method_2_html_scraping(url), args.parse_runs)
+                    results[label] = {'wall_ms': wall_ms, 'cpu_ms': cpu_ms}
+                    monitor.response_cache = ResponseCache(10)
+                    wall_ms, cpu_ms = _timed(lambda: monitor.method_2_html_scraping(url), args.parse_runs)
+                    results[label + '_cached'] = {'wall_ms': wall_ms, 'cpu_ms': cpu_ms}
+            finally:
+                shopee.error_rate, shopee.throttle_rate, shopee.latency, shopee.latency_jitter = saved
+        finally:
+            monitor.shutdown()
+    return results
+
+
+def bench_cold_start(servers, args):
+    """Cold start di proses baru: import bot_reliable saja, dan --once sampai semua hasil
+
+    Produk diambil dari watchlist state.db sementara (produk di config.py
+    ditandai dihapus) supaya tidak ada request ke Shopee asli.
+    """
+    products = dict(list(servers.products.items())[:args.cold_products])
+    import_times = []
+    once_times = []
+    failed_runs = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, 'state.db')
+        store = StateStore(state_path)
+        for product_name in Config.PRODUCTS:
+            store.unwatch(product_name)
+        for product_name, product_url in products.items():
+            store.watch(product_name, product_url)
+        store.close()
+
+        env = dict(
+            os.environ,
+            PYTHONPATH=BOT_DIR,
+            SHOPEE_BASE_URL=servers.shopee.base_url,
+            TELEGRAM_API_URL=servers.telegram.base_url,
+            TELEGRAM_BOT_TOKEN=servers.telegram.token,
+            TELEGRAM_CHAT_ID='benchmark',
+            STATE_DB=state_path,
+            HISTORY_DIR='',
+            POLITE_DELAY_MIN='0',
+            POLITE_DELAY_MAX='0',
+            METHOD_RETRY_DELAY='0',
+            METRICS_PORT='0',
+        )
+        # cwd = folder sementara supaya bot.log tidak menimpa log asli
+        for _ in range(args.cold_runs):
+            started = time.perf_counter()
+            subprocess.run(
+                [sys.executable, '-c', 'import bot_reliable'],
+                cwd=tmp, env=env, capture_output=True, check=True, timeout=args.timeout
+            )
+            import_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, os.path.join(BOT_DIR, 'bot_reliable.py'), '--once'],
+                cwd=tmp, env=env, capture_output=True, timeout=args.timeout
+            )
+            once_times.append(time.perf_counter() - started)
+            if result.returncode != 0:
+                failed_runs += 1
+
+    return {
+        'products': len(products),
+        'runs': args.cold_runs,
+        'import_seconds': percentile(import_times, 50),
+        'once_seconds': percentile(once_times, 50),
+        'failed_runs': failed_runs,
+    }
+
+
+def _traced_bytes(build):
+    """Byte yang masih teralokasi oleh hasil build() (tracemalloc)"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del kept
+    return used
+
+
+def _legacy_product_info(item):
+    """Bentuk product_info lama (dict 9 key, harga float) untuk pembanding"""
+    return {
+        'name': item['name'],
+        'price': item['price'] / 100000,
+        'price_min': item['price_min'] / 100000,
+        'price_max': item['price_max'] / 100000,
+        'stock': item['stock'],
+        'sold': item['sold'],
+        'shop_name': item['shop_name'],
+        'is_available': item['stock'] > 0,
+        'method': 'API v4',
+    }
+
+
+def bench_memory(args):
+    """Memori per produk: dict product_info + status dict per URL vs ProductSnapshot + StateStore"""
+    rng = random.Random(args.seed)
+    count = args.memory_products
+    items = []
+    for i in range(count):
+        price = rng.randrange(10, 5000) * 1000 * 100000
+        items.append({
+            'itemid': 100000 + i, 'shopid': SHOP_ID, 'name': f"Produk Benchmark {i}",
+            'price': price, 'price_min': price, 'price_max': price,
+            'stock': rng.randrange(0, 50), 'sold': rng.randrange(0, 5000), 'shop_name': f"Toko {i % 50}",
+        })
+    now = time.time()
+
+    def legacy():
+        records = [_legacy_product_info(item) for item in items]
+        status = {}
+        for item, record in zip(items, records):
+            url = f"https://shopee.co.id/{item['name'].replace(' ', '-')}-i.{item['shopid']}.{item['itemid']}"
+            status[url] = {
+                'is_available': record['is_available'], 'fail_count': 0,
+                'last_price': record['price'], 'last_seen': now,
+            }
+        return records, status
+
+    def compact():
+        records = [ProductSnapshot.from_item(item, Method.API_V4) for item in items]
+        store = StateStore(':memory:')
+        for item, record in zip(items, records):
+            state = store.add(f"{item['shopid']}.{item['itemid']}")
+            state.is_available = record.is_available
+            state.last_price_units = record.price_units
+            state.last_seen = now
+        return records, store
+
+    legacy_bytes = _traced_bytes(legacy)
+    compact_bytes = _traced_bytes(compact)
+    return {
+        'products': count,
+        'legacy_bytes_per_product': legacy_bytes / count,
+        'compact_bytes_per_product': compact_bytes / count,
+        'saved_percent': 100 * (1 - compact_bytes / legacy_bytes) if legacy_bytes else 0,
+    }
+
+
+def run_benchmarks(args):
+    """Jalankan semua benchmark, return dict hasil"""
+    with BenchmarkServers(args) as servers:
+        results = {
+            'settings': {
+                'products': len(servers.products),
+                'latency': args.latency,
+                'jitter': args.jitter,
+                'error_rate': args.error_rate,
+                'throttle_rate': args.throttle_rate,
+                'seed': args.seed,
+            },
+            'parse': bench_parse(servers, args),
+            'sweep': bench_sweep(servers, args),
+        }
+        if args.restocks > 0:
+            results['restock'] = bench_restock(servers, args)
+        if args.cold_runs > 0:
+            results['cold_start'] = bench_cold_start(servers, args)
+    if args.memory_products > 0:
+        results['memory'] = bench_memory(args)
+    return results
+
+
+def _fmt(value, unit=''):
+    return 'n/a' if value is None else f"{value:.3f}{unit}"
+
+
+def print_report(results):
+    settings = results['settings']
+    print("\n" + "="*60)
+    print("  BENCHMARK SHOPEE MONITOR (server lokal)")
+    print("="*60)
+    print(f"Produk: {settings['products']} | latency {settings['latency']*1000:.0f}ms "
+          f"(+{settings['jitter']*1000:.0f}ms) | error 500: {settings['error_rate']:.0%} | "
+          f"429: {settings['throttle_rate']:.0%} | seed {settings['seed']}")
+
+    print("\n📄 Parsing HTML per halaman "
+          f"({results['parse']['page_kb']:.0f} KB):")
+    for label, value in results['parse'].items():
+        if isinstance(value, dict):
+            print(f"   {label:24s} {value['wall_ms']:8.2f} ms wall  {value['cpu_ms']:8.2f} ms CPU")
+
+    print("\n🔄 Sweep:")
+    for label, value in results['sweep'].items():
+        print(f"   {label:10s} {_fmt(value['sweep_seconds_best'], 's')} terbaik, "
+              f"{_fmt(value['products_per_second'])} produk/detik, "
+              f"{value['requests_per_sweep']:.0f} request/sweep "
+              f"({value['errors_500']} x 500, {value['errors_429']} x 429)")
+
+    if 'restock' in results:
+        restock = results['restock']
+        print(f"\n🎉 Deteksi restock ({restock['detected']}/{restock['restocks']} terdeteksi):")
+        print(f"   p50 {_fmt(restock['p50_seconds'], 's')} | p99 {_fmt(restock['p99_seconds'], 's')} | "
+              f"maks {_fmt(restock['max_seconds'], 's')}")
+
+    if 'cold_start' in results:
+        cold = results['cold_start']
+        print(f"\n🚀 Cold start --once ({cold['products']} produk, median {cold['runs']}x):")
+        print(f"   import {_fmt(cold['import_seconds'], 's')} | start sampai semua hasil "
+              f"{_fmt(cold['once_seconds'], 's')} | gagal {cold['failed_runs']}x")
+
+    if 'memory' in results:
+        memory = results['memory']
+        print(f"\n🧮 Memori per produk ({memory['products']} produk, record + status):")
+        print(f"   dict lama {memory['legacy_bytes_per_product']:.0f} B | "
+              f"ProductSnapshot + tabel {memory['compact_bytes_per_product']:.0f} B | "
+              f"hemat {memory['saved_percent']:.0f}%")
+    print()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark offline bot Shopee (server lokal)')
+    parser.add_argument('--products', type=int, default=200, help='jumlah produk sintetis')
+    parser.add_argument('--recording', help='file JSON response asli yang direkam (items/pages)')
+    parser.add_argument('--sweeps', type=int, default=3, help='jumlah sweep yang diukur')
+    parser.add_argument('--latency', type=float, default=0.02, help='latency server (detik)')
+    parser.add_argument('--jitter', type=float, default=0.01, help='tambahan latency acak (detik)')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='peluang HTTP 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.02, help='peluang HTTP 429')
+    parser.add_argument('--restocks', type=int, default=20, help='jumlah restock yang diukur (0 = lewati)')
+    parser.add_argument('--min-interval', type=float, default=0.5, help='MIN_CHECK_INTERVAL (detik)')
+    parser.add_argument('--max-interval', type=float, default=2.0, help='MAX_CHECK_INTERVAL (detik)')
+    parser.add_argument('--page-kb', type=int, default=200, help='ukuran halaman HTML produk (KB)')
+    parser.add_argument('--parse-runs', type=int, default=20, help='pengulangan per parser')
+    parser.add_argument('--cold-runs', type=int, default=3, help='pengulangan cold start --once (0 = lewati)')
+    parser.add_argument('--cold-products', type=int, default=20, help='jumlah produk untuk cold start')
+    parser.add_argument('--memory-products', type=int, default=20000, help='jumlah produk untuk ukur memori (0 = lewati)')
+    parser.add_argument('--timeout', type=float, default=60, help='batas tunggu per tahap (detik)')
+    parser.add_argument('--seed', type=int, default=1, help='seed acak (hasil bisa diulang)')
+    parser.add_argument('--json', dest='json_path', help='simpan hasil ke file JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Log per produk dan error simulasi terlalu ramai untuk benchmark
+    logging.getLogger().setLevel(logging.CRITICAL)
+    results = run_benchmarks(args)
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Hasil disimpan ke {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,38 +6,58 @@ Bot Notifikasi Telegram - Shopee Product Monitor
 METODE PALING RELIABLE - Multiple Fallback Methods
 """
 
-import requests
-from bs4 import BeautifulSoup
 import time
-import re
-import json
+# Titik awal untuk mengukur cold start (--once), sebelum modul lain di-import
+IMPORT_STARTED = time.perf_counter()
 import logging
-from datetime import datetime
 from config import Config
 import random
+import asyncio
+import argparse
+from async_engine import AsyncPollingEngine
+from http_pool import HttpPool
+from egress import EgressPool, EgressUnavailable
+import fast_extract
+from state_store import StateStore
+from method_health import MethodHealth
+from telegram_queue import TelegramOutbox
+from notifiers import MessageRenderer, build_notifiers
+from response_cache import ResponseCache, fingerprint as response_fingerprint
+from metrics import Metrics, MetricsServer
+from rules import RuleEngine
+from history_store import HistoryStore
+from subscriptions import Subscriptions
+from product_identity import ProductIdentities
+from product_record import Method, ProductSnapshot
+from shop_watch import ShopWatcher
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
+def setup_logging(log_file='bot.log'):
+    """Log ke bot.log dan console (dipanggil dari main, bukan saat import)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler()
+        ]
+    )
+
+
 class ShopeeMonitorReliable:
     """Monitor Shopee dengan multiple metode fallback"""
     
-    def __init__(self):
+    def __init__(self, state_path=None, products=None, notify=None, shops=None):
         self.config = Config()
         self.telegram_token = self.config.TELEGRAM_BOT_TOKEN
         self.chat_id = self.config.TELEGRAM_CHAT_ID
-        self.products = self.config.PRODUCTS
+        self.products = dict(self.config.PRODUCTS if products is None else products)
+        # Jika diisi (mode sharding), pesan dikirim lewat callback ini, bukan langsung ke Telegram
+        self.notify = notify
         self.check_interval = self.config.CHECK_INTERVAL
-        self.product_status = {}
-        
+        self.base_url = self.config.SHOPEE_BASE_URL.rstrip('/')
         # User agents untuk rotation
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -46,6 +66,80 @@ class ShopeeMonitorReliable:
             'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1',
         ]
+        # Status per produk, disimpan di SQLite supaya selamat saat restart
+        self.product_status = StateStore(
+            state_path or self.config.STATE_DB,
+            batch_size=self.config.STATE_BATCH_SIZE,
+            flush_interval=self.config.STATE_FLUSH_INTERVAL
+        )
+        # Session keep-alive bersama untuk semua request Shopee & Telegram
+        self.http = HttpPool(self.config)
+        # Histogram latency/parsing/deteksi + counter gagal (endpoint /metrics)
+        self.metrics = Metrics()
+        self.metrics_server = None
+        # Egress (langsung / proxy / IP lokal) dengan budget per endpoint, None = langsung saja
+        # (dibuat sebelum identitas produk: resolve short link juga lewat egress)
+        self.egress = None
+        if self.config.EGRESS_POOL:
+            self.egress = EgressPool(self.config, self.http, self.metrics)
+            logger.info(f"🌐 Egress pool: {', '.join(egress.label for egress in self.egress.egresses)}")
+        # URL -> (shop_id, item_id); short link di-resolve sekali lalu disimpan di state.db
+        self.identities = ProductIdentities(
+            self.product_status, self.resolve_short_link, self.config.SHORT_LINK_HOSTS
+        )
+        if products is None:
+            # Produk yang ditambah/dihapus lewat perintah Telegram
+            added, removed = self.product_status.watchlist()
+            self.products.update(added)
+            for product_name in removed:
+                self.products.pop(product_name, None)
+        
+        # Item yang sama dengan slug/query/short link berbeda cukup dicek sekali
+        self.products, merged = self.identities.dedupe(self.products)
+        for product_name, kept_name in merged:
+            logger.info(f"🔗 {product_name} sama dengan {kept_name}, digabung")
+        
+        # Chat pemilik (TELEGRAM_CHAT_ID) otomatis berlangganan semua produk di atas;
+        # produk langganan chat lain ikut dicek, tapi tiap item hanya sekali
+        self.subscriptions = Subscriptions(
+            self.product_status if products is None else None, key=self.identities.key
+        )
+        for product_name, product_url in self.products.items():
+            self.subscriptions.subscribe(self.chat_id, product_url, product_name, persist=False)
+        watched = {self.identities.key(product_url) for product_url in self.products.values()}
+        for product_name, product_url in self.subscriptions.products().items():
+            if self.identities.key(product_url) not in watched:
+                if product_name in self.products:
+                    product_name = f"{product_name} ({product_url.rsplit('.', 1)[-1]})"
+                self.products[product_name] = product_url
+        # Cache response (ETag/Last-Modified + fingerprint) per URL
+        self.response_cache = ResponseCache(self.config.RESPONSE_CACHE_SIZE)
+        # Riwayat harga/stok (append-only, untuk analisis pola restock)
+        self.history = None
+        if self.config.HISTORY_DIR:
+            self.history = HistoryStore(
+                self.config.HISTORY_DIR,
+                downsample_after=self.config.HISTORY_DOWNSAMPLE_DAYS * 86400,
+                bucket=self.config.HISTORY_BUCKET
+            )
+        # Rule harga/stok/terjual, dievaluasi hanya untuk field yang berubah
+        self.rules = RuleEngine(self.config.RULES)
+        self.migrate_state_keys()
+        # Pesan Telegram dikirim dari thread background
+        self.outbox = TelegramOutbox(self.http, self.telegram_token, self.config, self.metrics)
+        # Backend notifikasi (Telegram / webhook / file), tiap backend antri sendiri
+        self.notifiers = build_notifiers(self.config, self.http, self.outbox)
+        # Template pesan + cache bagian statis per produk
+        self.renderer = MessageRenderer()
+        # Sukses rate & latency per metode, menentukan urutan fallback
+        self.health = MethodHealth(
+            ['api_v4', 'html', 'api_v2', 'batch'],
+            window=self.config.HEALTH_WINDOW,
+            cooldown=self.config.BREAKER_COOLDOWN
+        )
+        # Pantau seluruh toko (listing per halaman), None jika SHOPS kosong
+        shops = self.config.SHOPS if shops is None else shops
+        self.shop_watch = ShopWatcher(self, shops) if shops else None
     
     def get_random_headers(self):
         """Generate random headers"""
@@ -63,87 +157,124 @@ class ShopeeMonitorReliable:
             'Cache-Control': 'max-age=0',
         }
     
-    def send_telegram_message(self, message):
-        """Kirim pesan ke Telegram"""
-        try:
-            url = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
-            data = {
-                "chat_id": self.chat_id,
-                "text": message,
-                "parse_mode": "HTML",
-                "disable_web_page_preview": False
-            }
-            response = requests.post(url, data=data, timeout=10)
-            
-            if response.status_code == 200:
-                logger.info("✅ Pesan terkirim ke Telegram")
-                return True
+    def send_telegram_message(self, message, detected_at=None, key=None, urgent=False):
+        """Kirim pesan ke Telegram (lewat antrian background, tidak blocking)
+        
+        detected_at (time.time()) diisi untuk notifikasi perubahan status,
+        dipakai menghitung detection lag saat pesan benar-benar terkirim.
+        key = identitas produk (untuk laporan burst), urgent = tidak ditahan digest.
+        """
+        if self.notify is not None:
+            return self.notify(message, detected_at, key=key, urgent=urgent)
+        return self.notifiers.send(self.chat_id, message, detected_at, key=key, urgent=urgent)
+    
+    def notify_subscribers(self, product_url, message, detected_at=None, urgent=False):
+        """Kirim pesan perubahan produk ke semua chat pelanggannya (pesan dibuat sekali)"""
+        key = self.identities.key(product_url)
+        chats = self.subscriptions.subscribers(product_url)
+        if not chats or self.notify is not None:
+            return self.send_telegram_message(message, detected_at, key=key, urgent=urgent)
+        for chat_id in chats:
+            if chat_id == str(self.chat_id):
+                self.send_telegram_message(message, detected_at, key=key, urgent=urgent)
             else:
-                logger.error(f"❌ Gagal kirim: {response.text}")
-                return False
-        except Exception as e:
-            logger.error(f"❌ Error Telegram: {e}")
-            return False
+                self.notifiers.send(chat_id, message, detected_at, owner=False, key=key, urgent=urgent)
+        return True
+    
+    def record_failure(self, method, status):
+        """Counter fetch gagal per metode dan HTTP status ('invalid' / 'error' jika bukan HTTP)"""
+        self.metrics.fetch_failures.labels(method, str(status)).inc()
+    
+    def start_metrics(self, port=None):
+        """Buka endpoint /metrics jika METRICS_PORT diisi"""
+        port = self.config.METRICS_PORT if port is None else port
+        if port and self.metrics_server is None:
+            server = MetricsServer(self.metrics, port, self.config.METRICS_HOST)
+            if server.start():
+                self.metrics_server = server
+    
+    def shopee_request(self, endpoint, url, method='get', **kwargs):
+        """Request ke Shopee lewat egress yang masih punya budget untuk endpoint ini
+
+        403/429 membuat egress itu cooldown di endpoint tsb; jika semua egress
+        cooldown, EgressUnavailable dilempar dan metode fetch fallback.
+        """
+        if self.egress is None:
+            return getattr(self.http, method)('shopee', url, **kwargs)
+        egress = self.egress.acquire(endpoint)
+        response = getattr(self.http, method)(egress.session, url, **kwargs)
+        self.egress.report(egress, endpoint, response.status_code, response.headers.get('Retry-After'))
+        return response
     
     def extract_product_ids(self, url):
-        """Extract shop_id dan item_id dari URL"""
-        try:
-            # Format: https://shopee.co.id/product-name-i.SHOP_ID.ITEM_ID
-            if '-i.' in url:
-                parts = url.split('-i.')[1].split('?')[0].split('.')
-                if len(parts) >= 2:
-                    shop_id = parts[0]
-                    item_id = parts[1]
-                    return shop_id, item_id
-            
-            # Format alternatif: https://shopee.co.id/shop/SHOP_ID/ITEM_ID
-            if '/shop/' in url:
-                parts = url.split('/shop/')[1].split('?')[0].split('/')
-                if len(parts) >= 2:
-                    shop_id = parts[0]
-                    item_id = parts[1]
-                    return shop_id, item_id
-            
-            logger.error(f"❌ Format URL tidak dikenali: {url}")
-            return None, None
-            
-        except Exception as e:
-            logger.error(f"❌ Error extract ID: {e}")
-            return None, None
+        """Extract shop_id dan item_id dari URL (di-cache per URL, short link di-resolve)"""
+        return self.identities.ids(url)
+    
+    def resolve_short_link(self, url):
+        """URL akhir short link (shp.ee, s.shopee.co.id) setelah redirect"""
+        response = self.shopee_request(
+            'html', url, headers=self.get_random_headers(), timeout=15, stream=True
+        )
+        response.close()
+        return response.url
+    
+    def migrate_state_keys(self):
+        """Pindahkan state/history lama yang masih pakai key URL ke key identitas"""
+        moved = 0
+        for product_url in self.products.values():
+            key = self.identities.key(product_url)
+            if key == product_url:
+                continue
+            if self.product_status.rename(product_url, key):
+                moved += 1
+            if self.history is not None:
+                self.history.rename(product_url, key)
+        if moved:
+            logger.info(f"🔑 {moved} status produk dipindah ke key (shop_id, item_id)")
+    
+    def item_to_product_info(self, item, method, sold=None):
+        """Konversi item JSON API Shopee ke ProductSnapshot"""
+        return ProductSnapshot.from_item(item, method, sold)
     
-    def method_1_api_v4(self, shop_id, item_id):
-        """Metode 1: API v4 Shopee (paling cepat)"""
+    def method_1_api_v4(self, shop_id, item_id, endpoint='api_v4'):
+        """Metode 1: API v4 Shopee (paling cepat), endpoint = bucket egress ('burst' untuk mode burst)"""
         try:
-            url = f"https://shopee.co.id/api/v4/item/get?itemid={item_id}&shopid={shop_id}"
+            url = f"{self.base_url}/api/v4/item/get?itemid={item_id}&shopid={shop_id}"
             headers = self.get_random_headers()
+            headers.update(self.response_cache.conditional_headers(url))
             
-            response = requests.get(url, headers=headers, timeout=15)
+            response = self.shopee_request(endpoint, url, headers=headers, timeout=15)
+            
+            cached = self.cached_response(url, response)
+            if cached:
+                logger.debug(f"✅ Metode 1 (API v4) berhasil (cache)")
+                return cached
             
             if response.status_code == 200:
+                started = time.perf_counter()
                 data = response.json()
                 
                 if data.get('error') == 0 or data.get('data'):
                     item = data.get('data', {}) if data.get('data') else data.get('item', {})
                     
                     if item:
-                        product_info = {
-                            'name': item.get('name', 'Unknown'),
-                            'price': item.get('price', 0) / 100000,
-                            'price_min': item.get('price_min', 0) / 100000,
-                            'price_max': item.get('price_max', 0) / 100000,
-                            'stock': item.get('stock', 0),
-                            'sold': item.get('sold', item.get('historical_sold', 0)),
-                            'shop_name': item.get('shop_name', 'Unknown'),
-                            'is_available': item.get('stock', 0) > 0,
-                            'method': 'API v4'
-                        }
-                        logger.info(f"✅ Metode 1 (API v4) berhasil")
+                        product_info = self.item_to_product_info(item, Method.API_V4)
+                        self.metrics.parse_time.labels('json').observe(time.perf_counter() - started)
+                        self.store_response(url, response, product_info)
+                        logger.debug(f"✅ Metode 1 (API v4) berhasil")
                         return product_info
+                self.record_failure('api_v4', 'invalid')
+            else:
+                self.record_failure('api_v4', response.status_code)
             
             logger.warning("⚠️ Metode 1 gagal, coba metode 2...")
             return None
             
+        except EgressUnavailable:
+            # Budget / cooldown lokal, bukan kegagalan metode: get_product_info lanjut ke metode lain
+            raise
         except Exception as e:
+            self.record_failure('api_v4', 'error')
             logger.warning(f"⚠️ Metode 1 error: {e}")
             return None
     
@@ -151,242 +282,466 @@ class ShopeeMonitorReliable:
         """Metode 2: Scraping HTML langsung (paling reliable)"""
         try:
             headers = self.get_random_headers()
-            response = requests.get(url, headers=headers, timeout=20)
+            headers.update(self.response_cache.conditional_headers(url))
+            response = self.shopee_request('html', url, headers=headers, timeout=20, stream=True)
+            
+            if response.status_code == 304:
+                response.close()
+                cached = self.response_cache.not_modified(url)
+                if cached:
+                    logger.debug(f"✅ Metode 2 (HTML) tidak berubah (304)")
+                    return cached
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+                if self.config.FAST_HTML and fast_extract.available():
+                    product_info = self.parse_html_fast(response, url)
+                else:
+                    product_info = self.parse_html_cached(response, url)
                 
-                # Cari JSON-LD script tag (paling reliable)
-                scripts = soup.find_all('script', type='application/ld+json')
-                
-                for script in scripts:
-                    try:
-                        data = json.loads(script.string)
-                        
-                        # Cek apakah ada data produk
-                        if data.get('@type') == 'Product':
-                            offers = data.get('offers', {})
-                            
-                            # Cek availability
-                            availability = offers.get('availability', '')
-                            is_available = 'InStock' in availability or 'InStock' in str(offers)
-                            
-                            product_info = {
-                                'name': data.get('name', 'Unknown'),
-                                'price': float(offers.get('price', 0)),
-                                'price_min': float(offers.get('lowPrice', offers.get('price', 0))),
-                                'price_max': float(offers.get('highPrice', offers.get('price', 0))),
-                                'stock': 1 if is_available else 0,  # JSON-LD tidak ada exact stock
-                                'sold': 0,  # Tidak ada di JSON-LD
-                                'shop_name': data.get('brand', {}).get('name', 'Unknown') if isinstance(data.get('brand'), dict) else 'Unknown',
-                                'is_available': is_available,
-                                'method': 'HTML Scraping (JSON-LD)'
-                            }
-                            logger.info(f"✅ Metode 2 (HTML Scraping) berhasil")
-                            return product_info
-                            
-                    except json.JSONDecodeError:
-                        continue
-                
-                # Fallback: cari button "Beli Sekarang" atau "Habis"
-                page_text = response.text.lower()
-                
-                # Deteksi ketersediaan dari text
-                is_available = False
-                if 'habis' in page_text or 'sold out' in page_text or 'stok habis' in page_text:
-                    is_available = False
-                elif 'beli sekarang' in page_text or 'add to cart' in page_text or 'tambah' in page_text:
-                    is_available = True
-                
-                # Ambil title dari meta tag
-                title_tag = soup.find('meta', property='og:title')
-                product_name = title_tag['content'] if title_tag else 'Unknown'
-                
-                # Ambil harga dari meta tag
-                price_tag = soup.find('meta', property='product:price:amount')
-                price = float(price_tag['content']) if price_tag else 0
-                
-                product_info = {
-                    'name': product_name,
-                    'price': price,
-                    'price_min': price,
-                    'price_max': price,
-                    'stock': 1 if is_available else 0,
-                    'sold': 0,
-                    'shop_name': 'Unknown',
-                    'is_available': is_available,
-                    'method': 'HTML Scraping (Fallback)'
-                }
-                
-                logger.info(f"✅ Metode 2 (HTML Fallback) berhasil")
+                if product_info.method == Method.HTML_JSONLD:
+                    logger.debug(f"✅ Metode 2 (HTML Scraping) berhasil")
+                else:
+                    logger.debug(f"✅ Metode 2 (HTML Fallback) berhasil")
                 return product_info
             
+            response.close()
+            self.record_failure('html', response.status_code)
             logger.warning("⚠️ Metode 2 gagal, coba metode 3...")
             return None
             
+        except EgressUnavailable:
+            # Budget / cooldown lokal, bukan kegagalan metode: get_product_info lanjut ke metode lain
+            raise
         except Exception as e:
+            self.record_failure('html', 'error')
             logger.warning(f"⚠️ Metode 2 error: {e}")
             return None
     
+    def cached_response(self, url, response):
+        """product_info dari cache jika response 304 atau payload sama persis"""
+        if response.status_code == 304:
+            return self.response_cache.not_modified(url)
+        if response.status_code == 200:
+            return self.response_cache.match(url, response_fingerprint(response.content))
+        return None
+    
+    def store_response(self, url, response, product_info):
+        """Simpan hasil parsing response API ke cache"""
+        self.response_cache.store(
+            url, product_info, response.headers,
+            response_fingerprint(response.content), len(response.content)
+        )
+    
+    def parse_html_fast(self, response, url):
+        """Fast path: stream body ke lxml, berhenti saat JSON-LD Product ketemu
+        
+        Isi script JSON-LD yang sama dengan cek sebelumnya tidak di-parse ulang.
+        """
+        section = {}
+        
+        def parse_ld(text):
+            if text is None:
+                return fast_extract.product_info_from_ld_text(text)
+            fingerprint = response_fingerprint(text.encode('utf-8'))
+            # Script ld+json lain (bukan Product) jangan dihitung miss
+            cached = self.response_cache.match(url, fingerprint, count_miss=False)
+            if cached:
+                return cached
+            product_info = fast_extract.product_info_from_ld_text(text)
+            if product_info:
+                section['fingerprint'] = fingerprint
+                self.response_cache.count_miss()
+            return product_info
+        
+        chunks = response.iter_content(chunk_size=16384)
+        size = 0
+        network = 0.0
+        try:
+            def counted():
+                nonlocal size, network
+                while True:
+                    # Waktu tunggu network tidak ikut dihitung sebagai parsing
+                    started = time.perf_counter()
+                    chunk = next(chunks, None)
+                    network += time.perf_counter() - started
+                    if chunk is None:
+                        return
+                    size += len(chunk)
+                    yield chunk
+            
+            started = time.perf_counter()
+            product_info = fast_extract.extract_product_info(
+                counted(), encoding=response.encoding, parse_ld=parse_ld
+            )
+            parse_seconds = time.perf_counter() - started - network
+            # Habiskan sisa body tanpa parsing supaya koneksi bisa dipakai ulang
+            for chunk in chunks:
+                size += len(chunk)
+        finally:
+            response.close()
+        self.metrics.parse_time.labels('html_fast').observe(parse_seconds)
+        
+        if 'fingerprint' in section or product_info.method != Method.HTML_JSONLD:
+            self.response_cache.store(url, product_info, response.headers, section.get('fingerprint'), size)
+        return product_info
+    
+    def parse_html_cached(self, response, url):
+        """Parsing BeautifulSoup, dilewati jika body sama persis dengan sebelumnya"""
+        fingerprint = response_fingerprint(response.content)
+        cached = self.response_cache.match(url, fingerprint)
+        if cached:
+            return cached
+        started = time.perf_counter()
+        product_info = self.parse_html_bs(response.text)
+        self.metrics.parse_time.labels('html_bs').observe(time.perf_counter() - started)
+        self.response_cache.store(url, product_info, response.headers, fingerprint, len(response.content))
+        return product_info
+    
+    def parse_html_bs(self, html):
+        """Parsing lengkap dengan BeautifulSoup (fallback jika lxml tidak ada)"""
+        # Import berat, hanya dimuat saat fallback ini benar-benar dipakai
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Cari JSON-LD script tag (paling reliable)
+        scripts = soup.find_all('script', type='application/ld+json')
+        
+        for script in scripts:
+            product_info = fast_extract.product_info_from_ld_text(script.string)
+            if product_info:
+                return product_info
+        
+        # Fallback: cari button "Beli Sekarang" atau "Habis"
+        page_text = html.lower()
+        found = {word for word in fast_extract.SOLD_OUT_WORDS + fast_extract.BUY_WORDS if word in page_text}
+        is_available = fast_extract.availability_from_words(found)
+        
+        # Ambil title dari meta tag
+        title_tag = soup.find('meta', property='og:title')
+        product_name = title_tag['content'] if title_tag else 'Unknown'
+        
+        # Ambil harga dari meta tag
+        price_tag = soup.find('meta', property='product:price:amount')
+        price = float(price_tag['content']) if price_tag else 0
+        
+        return fast_extract.fallback_product_info(product_name, price, is_available)
+    
     def method_3_api_v2(self, shop_id, item_id):
         """Metode 3: API v2 Shopee (backup)"""
         try:
-            url = f"https://shopee.co.id/api/v2/item/get?itemid={item_id}&shopid={shop_id}"
+            url = f"{self.base_url}/api/v2/item/get?itemid={item_id}&shopid={shop_id}"
             headers = self.get_random_headers()
-            headers['Referer'] = f'https://shopee.co.id/'
+            headers['Referer'] = f'{self.base_url}/'
+            headers.update(self.response_cache.conditional_headers(url))
+            
+            response = self.shopee_request('api_v2', url, headers=headers, timeout=15)
             
-            response = requests.get(url, headers=headers, timeout=15)
+            cached = self.cached_response(url, response)
+            if cached:
+                logger.debug(f"✅ Metode 3 (API v2) berhasil (cache)")
+                return cached
             
             if response.status_code == 200:
+                started = time.perf_counter()
                 data = response.json()
                 
                 if data.get('item'):
                     item = data['item']
                     
-                    product_info = {
-                        'name': item.get('name', 'Unknown'),
-                        'price': item.get('price', 0) / 100000,
-                        'price_min': item.get('price_min', 0) / 100000,
-                        'price_max': item.get('price_max', 0) / 100000,
-                        'stock': item.get('stock', 0),
-                        'sold': item.get('sold', 0),
-                        'shop_name': item.get('shop_name', 'Unknown'),
-                        'is_available': item.get('stock', 0) > 0,
-                        'method': 'API v2'
-                    }
-                    logger.info(f"✅ Metode 3 (API v2) berhasil")
+                    product_info = self.item_to_product_info(item, Method.API_V2, sold=item.get('sold', 0))
+                    self.metrics.parse_time.labels('json').observe(time.perf_counter() - started)
+                    self.store_response(url, response, product_info)
+                    logger.debug(f"✅ Metode 3 (API v2) berhasil")
                     return product_info
+                self.record_failure('api_v2', 'invalid')
+            else:
+                self.record_failure('api_v2', response.status_code)
             
             logger.warning("⚠️ Metode 3 gagal")
             return None
             
+        except EgressUnavailable:
+            # Budget / cooldown lokal, bukan kegagalan metode: get_product_info lanjut ke metode lain
+            raise
         except Exception as e:
+            self.record_failure('api_v2', 'error')
             logger.warning(f"⚠️ Metode 3 error: {e}")
             return None
     
+    def batch_chunks(self, product_urls):
+        """Kelompokkan URL per toko lalu pecah jadi batch (shop_id, item_id)"""
+        by_shop = {}
+        for product_url in product_urls:
+            shop_id, item_id = self.extract_product_ids(product_url)
+            if shop_id and item_id:
+                by_shop.setdefault(shop_id, []).append((product_url, shop_id, item_id))
+        
+        # Produk dari toko yang sama dikumpulkan berurutan dalam batch
+        entries = [entry for shop_entries in by_shop.values() for entry in shop_entries]
+        size = max(1, self.config.BATCH_SIZE)
+        return [entries[i:i + size] for i in range(0, len(entries), size)]
+    
+    def method_1_batch(self, chunk):
+        """Metode 1 (batch): ambil banyak item API v4 dalam satu request
+        
+        chunk berisi list (product_url, shop_id, item_id). Return dict
+        product_url -> product_info, item yang tidak ada di response dilewati
+        (nanti pakai metode per-item biasa).
+        """
+        if not self.health.allow('batch'):
+            return {}
+        
+        started = time.monotonic()
+        try:
+            url = f"{self.base_url}{self.config.BATCH_ENDPOINT}"
+            headers = self.get_random_headers()
+            headers['Referer'] = f'{self.base_url}/'
+            payload = {
+                'shop_item_ids': [
+                    {'shopid': int(shop_id), 'itemid': int(item_id)}
+                    for _, shop_id, item_id in chunk
+                ]
+            }
+            
+            response = self.shopee_request('batch', url, method='post', json=payload, headers=headers, timeout=15)
+            
+            if response.status_code != 200:
+                logger.warning(f"⚠️ Batch API v4 gagal: HTTP {response.status_code}")
+                self.record_failure('batch', response.status_code)
+                self.record_latency('batch', False, time.monotonic() - started)
+                return {}
+            
+            data = response.json()
+            items = data.get('data') or data.get('items') or []
+            if isinstance(items, dict):
+                items = items.get('items') or []
+            
+            found = {}
+            for item in items:
+                item = item.get('item_basic', item)
+                key = (str(item.get('shopid')), str(item.get('itemid')))
+                found[key] = item
+            
+            results = {}
+            for product_url, shop_id, item_id in chunk:
+                item = found.get((shop_id, item_id))
+                if item:
+                    product_info = self.item_to_product_info(item, Method.API_V4_BATCH)
+                    product_info.url = product_url
+                    results[product_url] = product_info
+            
+            logger.debug(f"✅ Batch API v4: {len(results)}/{len(chunk)} produk dalam 1 request")
+            if not results:
+                self.record_failure('batch', 'invalid')
+            self.record_latency('batch', bool(results), time.monotonic() - started)
+            return results
+            
+        except EgressUnavailable as e:
+            # Budget batch habis: produk dicek per item, health batch tidak dicatat gagal
+            logger.debug(f"⏳ Batch API v4 dilewati: {e}")
+            return {}
+        except Exception as e:
+            logger.warning(f"⚠️ Batch API v4 error: {e}")
+            self.record_failure('batch', 'error')
+            self.record_latency('batch', False, time.monotonic() - started)
+            return {}
+    
+    def record_latency(self, method, ok, latency):
+        """Catat hasil fetch ke health tracker dan histogram latency"""
+        self.health.record(method, ok, latency)
+        self.metrics.fetch_latency.labels(method).observe(latency)
+    
     def get_product_info(self, product_url):
-        """Ambil info produk dengan multiple fallback methods"""
-        logger.info(f"🔍 Mencoba ambil data produk...")
+        """Ambil info produk dengan multiple fallback methods
+        
+        Urutan default API v4 → HTML Scraping → API v2, tapi metode yang
+        sedang sehat dicoba duluan dan metode dengan breaker open dilewati.
+        Metode yang ditahan egress pool dilewati tanpa dicatat gagal; jika
+        tidak ada metode yang dicoba sama sekali, EgressUnavailable dilempar.
+        """
+        logger.debug(f"🔍 Mencoba ambil data produk...")
         
         # Extract IDs dari URL
         shop_id, item_id = self.extract_product_ids(product_url)
         
-        # Try Metode 1: API v4
-        if shop_id and item_id:
-            result = self.method_1_api_v4(shop_id, item_id)
-            if result:
-                result['url'] = product_url
-                return result
-            time.sleep(2)
-        
-        # Try Metode 2: HTML Scraping (PALING RELIABLE)
-        result = self.method_2_html_scraping(product_url)
-        if result:
-            result['url'] = product_url
-            return result
-        time.sleep(2)
-        
-        # Try Metode 3: API v2
-        if shop_id and item_id:
-            result = self.method_3_api_v2(shop_id, item_id)
+        methods = {
+            'api_v4': lambda: self.method_1_api_v4(shop_id, item_id),
+            'html': lambda: self.method_2_html_scraping(product_url),
+            'api_v2': lambda: self.method_3_api_v2(shop_id, item_id),
+        }
+        if not (shop_id and item_id):
+            # Tanpa ID hanya bisa scraping HTML
+            methods = {'html': methods['html']}
+        
+        failed = False
+        deferred = None
+        for name in self.health.order():
+            if name not in methods:
+                continue
+            if not self.health.allow(name):
+                logger.debug(f"⏭️ Metode {name} dilewati (circuit breaker open)")
+                continue
+            if failed:
+                time.sleep(self.config.METHOD_RETRY_DELAY)
+            
+            started = time.monotonic()
+            try:
+                result = methods[name]()
+            except EgressUnavailable as e:
+                # Dibatasi budget/cooldown egress sendiri: bukan kegagalan metode, breaker tidak disentuh
+                logger.debug(f"⏳ Metode {name} dilewati: {e}")
+                deferred = e
+                continue
+            self.record_latency(name, result is not None, time.monotonic() - started)
+            
             if result:
-                result['url'] = product_url
+                result.url = product_url
                 return result
+            failed = True
         
+        if deferred is not None and not failed:
+            # Tidak ada metode yang benar-benar dicoba: tunda, jangan hitung gagal
+            raise deferred
         logger.error("❌ SEMUA METODE GAGAL!")
         return None
     
-    def format_message(self, product_info, status_change):
-        """Format pesan notifikasi"""
-        if status_change == 'ready':
-            emoji = "🎉✨🛒"
-            status_text = "PRODUK READY STOCK!"
-        elif status_change == 'sold_out':
-            emoji = "😢💔"
-            status_text = "Produk Habis"
-        else:
-            emoji = "ℹ️"
-            status_text = "Update Status"
-        
-        # Format harga
-        if product_info['price_min'] != product_info['price_max'] and product_info['price_max'] > 0:
-            price_text = f"Rp {product_info['price_min']:,.0f} - Rp {product_info['price_max']:,.0f}"
-        else:
-            price_text = f"Rp {product_info['price']:,.0f}"
-        
-        message = f"""
-{emoji} <b>{status_text}</b> {emoji}
-
-📦 <b>Produk:</b> {product_info['name']}
-
-💰 <b>Harga:</b> {price_text}
-📊 <b>Stok:</b> {'READY ✅' if product_info['is_available'] else 'HABIS ❌'}
-🛒 <b>Terjual:</b> {product_info.get('sold', 'N/A')} unit
-🏪 <b>Toko:</b> {product_info['shop_name']}
-
-🔗 <b>BELI SEKARANG:</b>
-{product_info['url']}
-
-🤖 <i>Metode: {product_info['method']}</i>
-⏰ <i>{datetime.now().strftime('%d-%m-%Y %H:%M:%S')}</i>
-"""
-        return message
+    def format_message(self, product_info, status_change, reasons=None):
+        """Format pesan notifikasi (reasons = alasan rule yang terpicu)"""
+        return self.renderer.render(product_info, status_change, reasons)
     
-    def check_product(self, product_url, product_name):
-        """Cek satu produk"""
-        logger.info(f"\n{'='*60}")
-        logger.info(f"🔍 Checking: {product_name}")
-        logger.info(f"{'='*60}")
+    def check_product(self, product_url, product_name, product_info=None, urgent=False):
+        """Cek satu produk (product_info bisa dari hasil batch)
+        
+        urgent=True (mode burst): notif perubahan stok tidak ditahan digest.
+        Return product_info hasil cek, None jika semua metode gagal atau
+        ditunda karena budget/cooldown egress.
+        """
+        logger.debug(f"🔍 Checking: {product_name}")
+        # State, rule dan history memakai key identitas (shop_id.item_id), bukan URL
+        key = self.identities.key(product_url)
         
-        product_info = self.get_product_info(product_url)
+        if product_info is None:
+            try:
+                product_info = self.get_product_info(product_url)
+            except EgressUnavailable as e:
+                logger.info(f"⏳ Cek {product_name} ditunda: {e}")
+                self.metrics.checks.labels('deferred').inc()
+                return None
         
         if product_info is None:
+            self.metrics.checks.labels('failed').inc()
             logger.error(f"❌ Tidak bisa ambil data: {product_name}")
             # Kirim notif error jika gagal terus
-            if product_url not in self.product_status:
-                self.product_status[product_url] = {'fail_count': 0}
+            status = self.product_status.get(key)
+            if status is None:
+                status = self.product_status.add(key)
             
-            self.product_status[product_url]['fail_count'] = self.product_status[product_url].get('fail_count', 0) + 1
+            status.fail_count += 1
             
-            if self.product_status[product_url]['fail_count'] >= 3:
+            if status.fail_count >= 3:
                 error_msg = f"⚠️ <b>Warning!</b>\n\nGagal ambil data produk <b>{product_name}</b> sebanyak 3x berturut-turut.\n\nCek URL atau koneksi internet."
                 self.send_telegram_message(error_msg)
-                self.product_status[product_url]['fail_count'] = 0
+                status.fail_count = 0
             
-            return
+            self.product_status.touch(key)
+            return None
+        
+        if self.history is not None:
+            try:
+                self.history.append(key, product_info)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Gagal simpan history: {e}")
+        
+        # First time check (termasuk produk baru yang belum ada di state.db)
+        status = self.product_status.get(key)
+        if status is None or status.is_available is None:
+            self.rules.evaluate(key, product_name, product_info)
+            if status is None:
+                status = self.product_status.add(key)
+            status.is_available = product_info.is_available
+            status.fail_count = 0
+            status.last_price_units = product_info.price_units
+            status.last_seen = time.time()
+            self.product_status.touch(key)
+            status_text = 'READY ✅' if product_info.is_available else 'HABIS ❌'
+            logger.info(f"📝 Status awal {product_name}: {status_text}")
+            self.metrics.checks.labels('new').inc()
+            return product_info
+        
+        reasons = self.rules.evaluate(key, product_name, product_info, status.last_price)
         
         # Reset fail count
-        if product_url in self.product_status:
-            self.product_status[product_url]['fail_count'] = 0
-        
-        # First time check
-        if product_url not in self.product_status or 'is_available' not in self.product_status[product_url]:
-            self.product_status[product_url] = {
-                'is_available': product_info['is_available'],
-                'fail_count': 0
-            }
-            status = 'READY ✅' if product_info['is_available'] else 'HABIS ❌'
-            logger.info(f"📝 Status awal: {status}")
-            return
+        status.fail_count = 0
+        status.last_price_units = product_info.price_units
+        status.last_seen = time.time()
         
         # Check status change
-        previous_status = self.product_status[product_url]['is_available']
-        current_status = product_info['is_available']
+        previous_status = status.is_available
+        current_status = product_info.is_available
         
         if previous_status != current_status:
+            detected_at = time.time()
+            self.metrics.checks.labels('changed').inc()
             if current_status:
                 logger.info(f"🎉🎉🎉 {product_name} READY STOCK! 🎉🎉🎉")
                 message = self.format_message(product_info, 'ready')
-                self.send_telegram_message(message)
+                self.notify_subscribers(product_url, message, detected_at, urgent)
             else:
                 logger.info(f"😢 {product_name} habis stock")
                 message = self.format_message(product_info, 'sold_out')
-                self.send_telegram_message(message)
+                self.notify_subscribers(product_url, message, detected_at, urgent)
             
-            self.product_status[product_url]['is_available'] = current_status
+            status.is_available = current_status
         else:
-            status = 'READY ✅' if current_status else 'HABIS ❌'
-            logger.info(f"✅ Status tidak berubah: {status}")
+            self.metrics.checks.labels('unchanged').inc()
+            status_text = 'READY ✅' if current_status else 'HABIS ❌'
+            logger.debug(f"✅ Status tidak berubah: {status_text}")
+        
+        if reasons:
+            logger.info(f"🔔 {product_name}: {'; '.join(reasons)}")
+            self.notify_subscribers(product_url, self.format_message(product_info, 'rule', reasons), time.time())
+        
+        self.product_status.touch(key)
+        return product_info
+    
+    def log_stats(self):
+        """Log statistik koneksi, metode fetch dan cache"""
+        self.http.log_stats()
+        if self.egress is not None:
+            self.egress.log_stats()
+        self.health.log_stats()
+        self.response_cache.log_stats()
+        if self.shop_watch is not None:
+            self.shop_watch.log_stats()
+        self.notifiers.log_stats()
+    
+    def shutdown(self):
+        """Kirim sisa pesan, simpan state dan tutup koneksi"""
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.notifiers.close()
+        self.outbox.close()
+        self.product_status.close()
+        self.http.close()
+    
+    def check_once(self):
+        """Mode --once (cron / systemd timer): cek semua produk paralel sekali lalu selesai
+
+        Status dimuat dari state.db, hanya notifikasi perubahan yang dikirim
+        (tanpa pesan start/stop). Return exit code: 1 jika semua cek gagal.
+        """
+        engine = AsyncPollingEngine(self)
+        try:
+            elapsed = asyncio.run(engine.sweep(shops=True))
+        finally:
+            engine.close()
+            self.shutdown()
+        failed = self.metrics.checks.labels('failed').value
+        logger.info(
+            f"⏱️ {len(self.products)} produk dicek dalam {elapsed:.2f} detik "
+            f"({time.perf_counter() - IMPORT_STARTED:.2f} detik sejak start, {failed} gagal)"
+        )
+        return 1 if self.products and failed >= len(self.products) else 0
     
     def start_monitoring(self):
         """Mulai monitoring"""
@@ -397,33 +752,35 @@ class ShopeeMonitorReliable:
         startup_msg = f"""
 🤖 <b>Bot Shopee Monitor Aktif!</b>
 
-📋 Monitoring: {len(self.products)} produk
+📋 Monitoring: {len(self.products)} produk{f' + {len(self.shop_watch)} toko' if self.shop_watch else ''}
 ⏱️ Interval: {self.check_interval} detik
 🔄 Multi-method fallback: API v4 → HTML Scraping → API v2
+⚡ Paralel: {self.config.MAX_CONCURRENCY} produk sekaligus
 
 Bot akan kirim notif jika ada perubahan status!
 """
         self.send_telegram_message(startup_msg)
+        self.start_metrics()
+        
+        engine = AsyncPollingEngine(self)
+        commands = None
+        if self.config.TELEGRAM_COMMANDS and self.notify is None:
+            from telegram_commands import TelegramCommands
+            commands = TelegramCommands(self, engine)
+            commands.start()
         
         while True:
             try:
-                logger.info(f"\n{'#'*60}")
-                logger.info(f"🔄 PENGECEKAN BARU - {datetime.now().strftime('%d-%m-%Y %H:%M:%S')}")
-                logger.info(f"{'#'*60}\n")
-                
-                for product_name, product_url in self.products.items():
-                    self.check_product(product_url, product_name)
-                    # Random delay antar produk
-                    delay = random.randint(3, 7)
-                    time.sleep(delay)
-                
-                logger.info(f"\n✅ Pengecekan selesai. Tunggu {self.check_interval} detik...\n")
-                time.sleep(self.check_interval)
+                asyncio.run(engine.run())
                 
             except KeyboardInterrupt:
                 logger.info("\n⛔ Bot dihentikan")
                 goodbye_msg = "⛔ <b>Bot Shopee Monitor Dihentikan</b>\n\nTerima kasih!"
                 self.send_telegram_message(goodbye_msg)
+                if commands is not None:
+                    commands.stop()
+                engine.close()
+                self.shutdown()
                 break
                 
             except Exception as e:
@@ -431,13 +788,35 @@ Bot akan kirim notif jika ada perubahan status!
                 time.sleep(60)
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Bot notifikasi Telegram - Shopee product monitor')
+    parser.add_argument(
+        '--workers', type=int, default=Config.WORKERS,
+        help='jumlah proses worker (>1 = mode sharding untuk watchlist besar)'
+    )
+    parser.add_argument(
+        '--once', action='store_true',
+        help='cek semua produk sekali, kirim notif perubahan, lalu keluar (untuk cron/systemd timer)'
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging()
     try:
-        monitor = ShopeeMonitorReliable()
-        monitor.start_monitoring()
+        if args.once:
+            return ShopeeMonitorReliable().check_once()
+        if args.workers > 1:
+            from sharding import ShardCoordinator
+            ShardCoordinator(args.workers).run()
+        else:
+            monitor = ShopeeMonitorReliable()
+            monitor.start_monitoring()
     except Exception as e:
         logger.error(f"❌ Fatal error: {e}")
+        return 1
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    raise SystemExit(main())
\ No newline at end of file
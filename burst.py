@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Mode burst flash sale: polling sub-detik pada jam drop yang sudah diketahui
+
+Menjelang window (BURST_WINDOWS) ID produk di-resolve, DNS dan koneksi
+keep-alive (TLS) ke Shopee dibuka duluan. Selama window produk itu keluar
+dari jadwal normal dan hanya dicek lewat API v4 (metode termurah) tiap
+BURST_INTERVAL detik, dibatasi BURST_BUDGET request per menit. Dengan
+EGRESS_POOL cek burst memakai bucket egress 'burst' sendiri, bukan budget
+api_v4 jadwal normal. Notif restock dikirim tanpa menunggu digest, dan untuk
+tiap produk yang restock dilaporkan waktu dari stok muncul sampai notif
+terkirim.
+"""
+
+import asyncio
+import logging
+import socket
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import partial
+from urllib.parse import urlparse
+
+from egress import EgressUnavailable
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+_DAILY = '%H:%M'
+_ONCE = '%Y-%m-%d %H:%M'
+
+
+class BurstWindow:
+    """Satu window: jam harian ('12:00') atau sekali ('2026-11-11 00:00'), durasi detik"""
+
+    __slots__ = ('at', 'daily', 'duration', 'product')
+
+    def __init__(self, at, duration, product=None):
+        at = at.strip()
+        self.daily = len(at) <= 5
+        self.at = datetime.strptime(at, _DAILY if self.daily else _ONCE)
+        self.duration = float(duration)
+        # None = semua produk
+        self.product = product
+
+    def next_start(self, now):
+        """Awal window berikutnya (atau yang sedang berjalan), None jika sudah lewat"""
+        if not self.daily:
+            return self.at if self.at + timedelta(seconds=self.duration) > now else None
+        start = now.replace(hour=self.at.hour, minute=self.at.minute, second=0, microsecond=0)
+        if start + timedelta(seconds=self.duration) <= now:
+            start += timedelta(days=1)
+        return start
+
+
+def parse_windows(entries, default_duration):
+    """BURST_WINDOWS dari config -> list BurstWindow (entry tidak valid di-log lalu dilewati)"""
+    windows = []
+    for entry in entries:
+        times = entry.get('at', [])
+        if isinstance(times, str):
+            times = [times]
+        for at in times:
+            try:
+                windows.append(BurstWindow(at, entry.get('duration', default_duration), entry.get('product')))
+            except (TypeError, ValueError):
+                logger.error(f"❌ Window burst tidak valid: {entry}")
+    return windows
+
+
+class _Target:
+    """State polling satu produk selama window"""
+
+    __slots__ = ('name', 'url', 'key', 'ids', 'due', 'task', 'last_unavailable')
+
+    def __init__(self, name, url, key, ids):
+        self.name = name
+        self.url = url
+        self.key = key
+        self.ids = ids
+        self.due = 0.0
+        self.task = None
+        # time.time() response terakhir yang masih HABIS (stok muncul setelah ini)
+        self.last_unavailable = None
+
+
+class BurstMode:
+    """Jalankan window burst di samping loop jadwal AsyncPollingEngine"""
+
+    def __init__(self, monitor, engine, windows=None):
+        self.monitor = monitor
+        self.engine = engine
+        config = monitor.config
+        if windows is None:
+            windows = parse_windows(config.BURST_WINDOWS, config.BURST_DURATION)
+        self.windows = windows
+        self.interval = config.BURST_INTERVAL
+        self.budget = config.BURST_BUDGET
+        self.prewarm_lead = config.BURST_PREWARM
+        egress_budget = config.EGRESS_BUDGETS.get('burst', 0)
+        if monitor.egress is not None and 0 < egress_budget * len(monitor.egress) < self.budget:
+            logger.warning(
+                f"⚠️ EGRESS_BUDGET_BURST {egress_budget:g}/menit x {len(monitor.egress)} egress "
+                f"lebih kecil dari BURST_BUDGET {self.budget}/menit, cek burst akan tertahan budget egress"
+            )
+        self.stats = Counter()
+        # Restock di window terakhir, waktu kirim diisi oleh notifiers (lihat _delivered)
+        self.detections = []
+        self._lock = threading.Lock()
+        monitor.notifiers.delivery_listeners.append(self._delivered)
+
+    def upcoming(self, now):
+        """(awal, akhir, {nama: url}) window terdekat; window yang mulai bersamaan digabung"""
+        starts = []
+        for window in self.windows:
+            start = window.next_start(now)
+            if start is not None:
+                starts.append((start, window))
+        if not starts:
+            return None
+        first = min(start for start, _ in starts)
+        end = first
+        products = {}
+        for start, window in starts:
+            if start != first:
+                continue
+            end = max(end, start + timedelta(seconds=window.duration))
+            if window.product is None:
+                products.update(self.monitor.products)
+            elif window.product in self.monitor.products:
+                products[window.product] = self.monitor.products[window.product]
+            else:
+                logger.warning(f"⚠️ Produk burst tidak dipantau: {window.product}")
+        return max(first, now), end, products
+
+    async def _sleep_until(self, moment):
+        """Tidur sampai waktu (datetime), dicek ulang tiap menit supaya tahan perubahan jam"""
+        while True:
+            remaining = (moment - datetime.now()).total_seconds()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, 60.0))
+
+    async def run(self):
+        """Loop: tunggu window berikutnya, prewarm, burst, kembali ke jadwal normal"""
+        try:
+            while True:
+                upcoming = self.upcoming(datetime.now())
+                if upcoming is None:
+                    logger.info("⚡ Tidak ada window burst tersisa")
+                    return
+                start, end, products = upcoming
+                if products:
+                    await self._sleep_until(start - timedelta(seconds=self.prewarm_lead))
+                    targets = await self.prewarm(products)
+                    await self._sleep_until(start)
+                    await self.burst(targets, end.timestamp())
+                else:
+                    await self._sleep_until(end)
+        finally:
+            self.close()
+
+    def close(self):
+        """Lepas callback dari notifiers (engine.run bisa dijalankan ulang)"""
+        if self._delivered in self.monitor.notifiers.delivery_listeners:
+            self.monitor.notifiers.delivery_listeners.remove(self._delivered)
+
+    def warm_dns(self):
+        """Resolve host Shopee sebelum window (cache resolver OS / nscd)"""
+        parsed = urlparse(self.monitor.base_url)
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        try:
+            socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)
+        except OSError as e:
+            logger.warning(f"⚠️ DNS {parsed.hostname} gagal: {e}")
+
+    async def prewarm(self, products):
+        """Resolve ID + DNS, lalu satu cek API v4 per produk (buka koneksi keep-alive, status awal)"""
+        started = time.monotonic()
+        with self._lock:
+            # Restock window sebelumnya yang notifnya belum terkirim tidak ditunggu lagi
+            self.detections = []
+        targets = []
+        for name, url in products.items():
+            ids = await self.engine.run_blocking(self.monitor.extract_product_ids, url)
+            if not all(ids):
+                logger.warning(f"⚠️ {name}: ID produk tidak dikenali, tidak ikut burst")
+                continue
+            targets.append(_Target(name, url, self.monitor.identities.key(url), ids))
+        await self.engine.run_blocking(self.warm_dns)
+        # Cek paralel = sebanyak itu koneksi TLS dibuka dan disimpan di pool
+        results = await asyncio.gather(*(self.poll(target) for target in targets), return_exceptions=True)
+        for target, result in zip(targets, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Prewarm {target.name} error: {result}")
+        logger.info(f"⚡ Prewarm burst {len(targets)} produk selesai dalam {time.monotonic() - started:.1f} detik")
+        return targets
+
+    async def poll(self, target):
+        """Satu cek API v4 + check_product (tanpa fallback ke metode lain)"""
+        self.stats['polls'] += 1
+        try:
+            product_info = await self.engine.run_blocking(
+                partial(self.monitor.method_1_api_v4, *target.ids, endpoint='burst')
+            )
+        except EgressUnavailable:
+            self.stats['egress_deferred'] += 1
+            return
+        observed = time.time()
+        if product_info is None:
+            self.stats['failed'] += 1
+            return
+        product_info.url = target.url
+        status = self.monitor.product_status.get(target.key)
+        detection = None
+        if product_info.is_available and status is not None and status.is_available is False:
+            # Restock: check_product di bawah akan mengirim notif READY
+            detection = {
+                'name': target.name,
+                'key': target.key,
+                'appeared_after': target.last_unavailable or observed,
+                'observed': observed,
+                'detected': None,
+                'delivered': None,
+            }
+            with self._lock:
+                self.detections.append(detection)
+        try:
+            await self.engine.run_blocking(
+                partial(self.monitor.check_product, target.url, target.name, product_info, urgent=True)
+            )
+        finally:
+            if detection is not None:
+                detection['detected'] = time.time()
+        if not product_info.is_available:
+            target.last_unavailable = observed
+
+    async def burst(self, targets, end):
+        """Polling cepat sampai `end` (time.time()), produk keluar dari jadwal normal selama window"""
+        if not targets:
+            return
+        scheduler = self.engine.scheduler
+        paused = [target for target in targets if scheduler.remove(target.name)]
+        bucket = TokenBucket(self.budget / 60.0, capacity=len(targets)) if self.budget > 0 else None
+        polls = self.stats['polls']
+        logger.info(
+            f"⚡ Burst mulai: {len(targets)} produk tiap {self.interval:g} detik sampai "
+            f"{datetime.fromtimestamp(end).strftime('%H:%M:%S')}"
+        )
+        try:
+            while time.time() < end:
+                now = time.monotonic()
+                wait = self.interval
+                for target in targets:
+                    if target.task is not None and not target.task.done():
+                        continue
+                    if target.due > now:
+                        wait = min(wait, target.due - now)
+                        continue
+                    if bucket is not None and not bucket.try_take(now=now):
+                        # Budget habis: produk ini menunggu giliran token berikutnya
+                        self.stats['over_budget'] += 1
+                        wait = min(wait, bucket.wait_time(now=now))
+                        break
+                    target.due = now + self.interval
+                    target.task = asyncio.create_task(self.poll(target))
+                await asyncio.sleep(min(max(wait, 0.01), max(0.01, end - time.time())))
+        finally:
+            tasks = [target.task for target in targets if target.task is not None]
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for target in paused:
+                if target.name in self.monitor.products:
+                    scheduler.add(target.name, self.monitor.products[target.name])
+            self.engine.wakeup()
+            logger.info(f"⚡ Burst selesai: {self.stats['polls'] - polls} cek, kembali ke jadwal normal")
+            self.report()
+
+    def _delivered(self, key, detected_at, sent_at):
+        """Dipanggil notifiers saat notif terkirim: cocokkan dengan restock produk yang sama"""
+        with self._lock:
+            for detection in self.detections:
+                if detection['key'] != key or detection['delivered'] is not None:
+                    continue
+                if detected_at < detection['observed']:
+                    continue
+                if detection['detected'] is not None and detected_at > detection['detected']:
+                    continue
+                detection['delivered'] = sent_at
+                elapsed = sent_at - detection['appeared_after']
+                self.monitor.metrics.burst_time_to_alert.observe(elapsed)
+                logger.info(f"⚡ {detection['name']}: stok muncul → notif terkirim ≤ {elapsed:.2f} detik")
+                return
+
+    def report(self):
+        """Log waktu stok muncul -> notif terkirim per produk yang restock"""
+        with self._lock:
+            detections = list(self.detections)
+        for detection in detections:
+            detect = (detection['detected'] or detection['observed']) - detection['appeared_after']
+            if detection['delivered'] is None:
+                logger.info(f"⚡ {detection['name']}: restock terdeteksi ≤ {detect:.2f} detik, notif masih antri")
+            else:
+                logger.info(
+                    f"⚡ {detection['name']}: restock terdeteksi ≤ {detect:.2f} detik, "
+                    f"notif terkirim ≤ {detection['delivered'] - detection['appeared_after']:.2f} detik"
+                )
+        stats = self.stats
+        logger.info(
+            f"⚡ Statistik burst: {stats['polls']} cek, {stats['failed']} gagal, "
+            f"{stats['over_budget']}x tertahan budget"
+        )
+        return detections
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pool egress (koneksi langsung, proxy, atau alamat sumber lokal) untuk request Shopee
+
+Tiap egress punya budget token bucket sendiri per endpoint (api_v4, html,
+api_v2, batch, shop, burst). Egress yang kena 403/429 di satu endpoint didinginkan
+(cooldown naik dua kali lipat tiap kena lagi), request berikutnya pindah
+ke egress lain. Jadi total cek per menit bisa naik tanpa satu IP
+menanggung semua request.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ('api_v4', 'html', 'api_v2', 'batch', 'shop', 'burst')
+# Status yang berarti egress ini sedang dibatasi / diblokir Shopee
+THROTTLE_STATUSES = (403, 429)
+
+
+class EgressUnavailable(RuntimeError):
+    """Semua egress sedang cooldown atau budget endpoint habis"""
+
+
+class Egress:
+    """Satu jalur keluar: 'direct', URL proxy, atau 'source:IP'"""
+
+    def __init__(self, index, spec, budgets, burst):
+        self.spec = spec
+        self.proxy = None
+        self.source_address = None
+        if spec.startswith('source:'):
+            self.source_address = spec.split(':', 1)[1]
+            self.label = spec
+        elif spec != 'direct':
+            self.proxy = spec
+            # Jangan tampilkan user:password proxy di log / metrics
+            parsed = urlparse(spec)
+            self.label = f"{parsed.scheme}://{parsed.hostname}:{parsed.port}" if parsed.hostname else spec
+        else:
+            self.label = 'direct'
+        # Nama session di HttpPool (koneksi keep-alive terpisah per egress)
+        self.session = 'shopee' if index == 0 and spec == 'direct' else f'shopee@{index}'
+        self.buckets = {
+            endpoint: TokenBucket(rate / 60.0, capacity=burst)
+            for endpoint, rate in budgets.items() if rate > 0
+        }
+        self.cooldown_until = {}
+        self.strikes = Counter()
+        self.stats = Counter()
+
+    def cooling(self, endpoint, now):
+        return self.cooldown_until.get(endpoint, 0) > now
+
+
+class EgressPool:
+    """Pilih egress untuk tiap request Shopee dan catat hasilnya"""
+
+    def __init__(self, config, http, metrics=None):
+        specs = config.EGRESS_POOL or ['direct']
+        self.egresses = [
+            Egress(index, spec, config.EGRESS_BUDGETS, config.EGRESS_BURST)
+            for index, spec in enumerate(specs)
+        ]
+        self.cooldown = config.EGRESS_COOLDOWN
+        self.max_cooldown = config.EGRESS_MAX_COOLDOWN
+        self.max_wait = config.EGRESS_MAX_WAIT
+        self.metrics = metrics
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        for egress in self.egresses:
+            if egress.proxy or egress.source_address:
+                http.configure(egress.session, proxy=egress.proxy, source_address=egress.source_address)
+
+    def __len__(self):
+        return len(self.egresses)
+
+    def _pick(self, endpoint, now):
+        """(egress, None) jika ada yang siap, (None, detik tunggu) jika budget habis,
+        (None, None) jika semua cooldown"""
+        wait = None
+        with self._lock:
+            start = next(self._next)
+            for offset in range(len(self.egresses)):
+                egress = self.egresses[(start + offset) % len(self.egresses)]
+                if egress.cooling(endpoint, now):
+                    continue
+                bucket = egress.buckets.get(endpoint)
+                if bucket is None or bucket.try_take(now=now):
+                    egress.stats[endpoint] += 1
+                    return egress, None
+                bucket_wait = bucket.wait_time(now=now)
+                wait = bucket_wait if wait is None else min(wait, bucket_wait)
+        return None, wait
+
+    def acquire(self, endpoint, timeout=None):
+        """Egress untuk satu request ke endpoint, tunggu token maksimal `timeout` detik
+
+        EgressUnavailable jika semua egress cooldown atau budget tidak kembali
+        dalam batas waktu (metode fetch lalu fallback ke metode lain).
+        """
+        timeout = self.max_wait if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            egress, wait = self._pick(endpoint, now)
+            if egress is not None:
+                return egress
+            if wait is None:
+                raise EgressUnavailable(f"Semua egress cooldown untuk {endpoint}")
+            if now + wait > deadline:
+                raise EgressUnavailable(f"Budget {endpoint} habis di semua egress")
+            time.sleep(wait)
+
+    def report(self, egress, endpoint, status, retry_after=None):
+        """Catat status HTTP; 403/429 -> cooldown egress di endpoint ini"""
+        with self._lock:
+            if status not in THROTTLE_STATUSES:
+                if status == 200:
+                    egress.strikes[endpoint] = 0
+                return
+            egress.strikes[endpoint] += 1
+            strikes = egress.strikes[endpoint]
+            seconds = min(self.max_cooldown, self.cooldown * 2 ** (strikes - 1))
+            if retry_after:
+                seconds = max(seconds, float(retry_after))
+            egress.cooldown_until[endpoint] = time.monotonic() + seconds
+            egress.stats['cooldowns'] += 1
+        if self.metrics is not None:
+            self.metrics.egress_cooldowns.labels(egress.label, endpoint).inc()
+        logger.warning(f"🧊 Egress {egress.label} kena HTTP {status} di {endpoint}, cooldown {seconds:.0f} detik")
+
+    def log_stats(self):
+        if len(self.egresses) < 2:
+            return
+        now = time.monotonic()
+        for egress in self.egresses:
+            cooling = [endpoint for endpoint in ENDPOINTS if egress.cooling(endpoint, now)]
+            used = sum(egress.stats[endpoint] for endpoint in ENDPOINTS)
+            logger.info(
+                f"🌐 Egress {egress.label}: {used} request, {egress.stats['cooldowns']} cooldown"
+                + (f" (sedang cooldown: {', '.join(cooling)})" if cooling else "")
+            )
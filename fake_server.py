@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Server lokal tiruan Shopee & Telegram untuk test tanpa hit server asli
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class LocalServer:
+    """Dasar server HTTP lokal di thread background"""
+
+    def __init__(self):
+        self.hits = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        # Simulasi jaringan: latency (detik, + jitter acak), peluang HTTP 500 dan 429
+        self.latency = 0.0
+        self.latency_jitter = 0.0
+        self.error_rate = 0.0
+        self.throttle_rate = 0.0
+        self.random = random.Random(0)
+        # Latency tambahan per path (detik), misal endpoint batch yang lambat
+        self.path_latency = {}
+        # Koneksi TCP yang diterima (keep-alive: satu koneksi bisa banyak request)
+        self.connections = 0
+        # Request yang sedang diproses (dan puncaknya), untuk test batas konkurensi
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def configure(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, seed=0):
+        """Atur simulasi latency/error, seed sama = urutan error sama"""
+        self.latency = latency
+        self.latency_jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def hit(self, path):
+        with self._lock:
+            self.hits[path] += 1
+
+    def track(self, delta):
+        with self._lock:
+            self.in_flight += delta
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def inject_fault(self, request):
+        """Tunda response lalu kadang jawab 500/429, return True jika sudah dijawab"""
+        with self._lock:
+            roll = self.random.random()
+            delay = self.latency + self.random.uniform(0, self.latency_jitter)
+            delay += self.path_latency.get(urlparse(request.path).path, 0)
+        if delay > 0:
+            time.sleep(delay)
+        if roll < self.error_rate:
+            self.hit('error_500')
+            request.send_json({'error': 500, 'ok': False}, status=500)
+            return True
+        if roll < self.error_rate + self.throttle_rate:
+            self.hit('error_429')
+            request.send_json({
+                'ok': False,
+                'error_code': 429,
+                'parameters': {'retry_after': 1},
+            }, status=429, headers={'Retry-After': '1'})
+            return True
+        return False
+
+    def handle_get(self, request, path, query):
+        request.send_json({'error': 404}, status=404)
+
+    def handle_post(self, request, path, body):
+        request.send_json({'error': 404}, status=404)
+
+    def start(self):
+        """Jalankan server di thread background, return base URL"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def send_body(self, body, content_type, status=200, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_json(self, payload, status=200, headers=None):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_body(body, 'application/json', status, headers)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                fake.hit(parsed.path)
+                fake.track(1)
+                try:
+                    if fake.inject_fault(self):
+                        return
+                    fake.handle_get(self, parsed.path, parse_qs(parsed.query))
+                finally:
+                    fake.track(-1)
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                fake.hit(path)
+                length = int(self.headers.get('Content-Length', 0))
+                raw = self.rfile.read(length)
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    body = json.loads(raw or b'{}')
+                else:
+                    body = {key: values[0] for key, values in parse_qs(raw.decode('utf-8')).items()}
+                if fake.inject_fault(self):
+                    return
+                fake.handle_post(self, path, body)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class FakeShopeeServer(LocalServer):
+    """Tiruan endpoint API v4, API v2, batch item/get_list dan listing toko"""
+
+    def __init__(self):
+        super().__init__()
+        self.items = {}
+        # Item yang sengaja tidak dikembalikan endpoint batch
+        self.batch_skip = set()
+        # Path yang dipaksa gagal (HTTP 403) untuk simulasi diblokir Shopee
+        self.blocked_paths = set()
+        # Halaman HTML produk: path -> html
+        self.pages = {}
+        # Short link: path -> URL tujuan (redirect 302)
+        self.short_links = {}
+        self.use_etag = True
+
+    def add_item(self, shop_id, item_id, name='Produk Test', price=100000,
+                 stock=1, sold=0, shop_name='Toko Test'):
+        """Tambah item; price dalam Rupiah (disimpan x100000 seperti Shopee)"""
+        self.items[(int(shop_id), int(item_id))] = {
+            'shopid': int(shop_id),
+            'itemid': int(item_id),
+            'name': name,
+            'price': price * 100000,
+            'price_min': price * 100000,
+            'price_max': price * 100000,
+            'stock': stock,
+            'sold': sold,
+            'shop_name': shop_name,
+        }
+
+    def set_stock(self, shop_id, item_id, stock):
+        self.items[(int(shop_id), int(item_id))]['stock'] = stock
+
+    def load_recording(self, path):
+        """Muat response asli yang direkam: {"items": [item API v4], "pages": {path: html}}"""
+        with open(path, 'r', encoding='utf-8') as f:
+            recording = json.load(f)
+        for item in recording.get('items', []):
+            item = item.get('item_basic', item)
+            self.items[(int(item['shopid']), int(item['itemid']))] = item
+        self.pages.update(recording.get('pages', {}))
+
+    def product_url(self, shop_id, item_id, slug='Produk-Test'):
+        return f"{self.base_url}/{slug}-i.{shop_id}.{item_id}"
+
+    def add_page(self, shop_id, item_id, html, slug='Produk-Test'):
+        """Tambah halaman HTML produk, return URL-nya"""
+        self.pages[f"/{slug}-i.{shop_id}.{item_id}"] = html
+        return self.product_url(shop_id, item_id, slug)
+
+    def add_short_link(self, code, target):
+        """Short link seperti shp.ee yang redirect ke `target`, return URL-nya"""
+        self.short_links[f"/s/{code}"] = target
+        return f"{self.base_url}/s/{code}"
+
+    def _send_page(self, request, html):
+        body = html.encode('utf-8')
+        headers = {}
+        if self.use_etag:
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if request.headers.get('If-None-Match') == etag:
+                request.send_response(304)
+                request.send_header('ETag', etag)
+                request.send_header('Content-Length', '0')
+                request.end_headers()
+                return
+            headers['ETag'] = etag
+        request.send_body(body, 'text/html; charset=utf-8', headers=headers)
+
+    def _item_from_query(self, query):
+        try:
+            key = (int(query['shopid'][0]), int(query['itemid'][0]))
+        except (KeyError, ValueError):
+            return None
+        return self.items.get(key)
+
+    def _send_shop_items(self, request, query):
+        """Listing toko per halaman, item terbaru (itemid terbesar) dulu"""
+        try:
+            shop_id = int(query['shopid'][0])
+            offset = int(query.get('offset', ['0'])[0])
+            limit = int(query.get('limit', ['30'])[0])
+        except (KeyError, ValueError):
+            request.send_json({'error': 4}, status=400)
+            return
+        items = sorted(
+            (item for (shop, _), item in self.items.items() if shop == shop_id),
+            key=lambda item: -item['itemid']
+        )
+        page = items[offset:offset + limit]
+        request.send_json({
+            'error': 0,
+            'total_count': len(items),
+            'nomore': offset + limit >= len(items),
+            'items': [{'item_basic': item} for item in page],
+        })
+
+    def handle_get(self, request, path, query):
+        if path in self.blocked_paths:
+            request.send_json({'error': 90309999}, status=403)
+        elif path == '/api/v4/item/get':
+            item = self._item_from_query(query)
+            if item:
+                request.send_json({'error': 0, 'data': item})
+            else:
+                request.send_json({'error': 4, 'data': None})
+        elif path == '/api/v2/item/get':
+            request.send_json({'item': self._item_from_query(query)})
+        elif path == '/api/v4/shop/search_items':
+            self._send_shop_items(request, query)
+        elif path in self.pages:
+            self._send_page(request, self.pages[path])
+        elif path in self.short_links:
+            request.send_body(b'', 'text/html', status=302, headers={'Location': self.short_links[path]})
+        else:
+            request.send_json({'error': 404}, status=404)
+
+    def handle_post(self, request, path, body):
+        if path in self.blocked_paths:
+            request.send_json({'error': 90309999}, status=403)
+        elif path == '/api/v4/item/get_list':
+            items = []
+            for ids in body.get('shop_item_ids', []):
+                key = (ids.get('shopid'), ids.get('itemid'))
+                item = self.items.get(key)
+                if item and key not in self.batch_skip:
+                    items.append(item)
+            request.send_json({'error': 0, 'data': items})
+        else:
+            request.send_json({'error': 404}, status=404)
+
+
+class FakeTelegramServer(LocalServer):
+    """Tiruan Bot API Telegram: sendMessage (simulasi 429) dan getUpdates long-poll"""
+
+    def __init__(self, token='TEST:TOKEN'):
+        super().__init__()
+        self.token = token
+        self.messages = []
+        # Waktu (time.monotonic) tiap pesan di self.messages diterima
+        self.received_at = []
+        # Jumlah request sendMessage berikutnya yang dijawab 429
+        self.throttle_next = 0
+        self.retry_after = 1
+        # Update yang belum dikonfirmasi (offset) untuk getUpdates
+        self.updates = []
+        self._update_id = 1000
+        self._updates_cond = threading.Condition(self._lock)
+        self.offsets = []
+
+    def push_command(self, text, chat_id='999'):
+        """Simulasi user mengirim pesan ke bot, return update_id"""
+        with self._updates_cond:
+            self._update_id += 1
+            self.updates.append({
+                'update_id': self._update_id,
+                'message': {
+                    'message_id': self._update_id,
+                    'chat': {'id': int(chat_id) if str(chat_id).lstrip('-').isdigit() else chat_id},
+                    'text': text,
+                    'date': int(time.time()),
+                },
+            })
+            self._updates_cond.notify_all()
+            return self._update_id
+
+    def _get_updates(self, request, params):
+        offset = int(params.get('offset', 0) or 0)
+        timeout = min(float(params.get('timeout', 0) or 0), 5.0)
+        deadline = time.monotonic() + timeout
+        with self._updates_cond:
+            self.offsets.append(offset)
+            # Update dengan id < offset sudah dikonfirmasi klien: buang
+            self.updates = [update for update in self.updates if update['update_id'] >= offset]
+            while not self.updates and time.monotonic() < deadline:
+                self._updates_cond.wait(deadline - time.monotonic())
+            result = list(self.updates)
+        request.send_json({'ok': True, 'result': result})
+
+    def handle_get(self, request, path, query):
+        if path == f"/bot{self.token}/getUpdates":
+            self._get_updates(request, {key: values[0] for key, values in query.items()})
+        else:
+            request.send_json({'ok': False, 'error_code': 404}, status=404)
+
+    def handle_post(self, request, path, body):
+        if path == f"/bot{self.token}/getUpdates":
+            self._get_updates(request, body)
+            return
+        if path != f"/bot{self.token}/sendMessage":
+            request.send_json({'ok': False, 'error_code': 404}, status=404)
+            return
+        with self._lock:
+            if self.throttle_next > 0:
+                self.throttle_next -= 1
+                request.send_json({
+                    'ok': False,
+                    'error_code': 429,
+                    'description': 'Too Many Requests',
+                    'parameters': {'retry_after': self.retry_after},
+                }, status=429)
+                return
+            self.messages.append((body.get('chat_id'), body.get('text')))
+            self.received_at.append(time.monotonic())
+            message_id = len(self.messages)
+        request.send_json({'ok': True, 'result': {'message_id': message_id}})
+
+
+class FakeWebhookServer(LocalServer):
+    """Tiruan webhook lokal (Home Assistant / n8n): simpan body JSON tiap POST"""
+
+    def __init__(self, path='/hook'):
+        super().__init__()
+        self.path = path
+        self.payloads = []
+
+    @property
+    def url(self):
+        return f"{self.base_url}{self.path}"
+
+    def handle_post(self, request, path, body):
+        if path != self.path:
+            request.send_json({'error': 404}, status=404)
+            return
+        with self._lock:
+            self.payloads.append(body)
+        request.send_json({'ok': True})
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fast-path ekstraksi HTML produk Shopee
+
+Body response di-stream ke lxml HTMLPullParser chunk per chunk, berhenti
+begitu ketemu JSON-LD Product. Hasilnya sama persis dengan parsing
+BeautifulSoup di method_2_html_scraping.
+"""
+
+import json
+
+from product_record import Method, ProductSnapshot
+
+# lxml di-import saat pertama dipakai supaya startup (--once) tetap cepat
+_etree = None
+_etree_loaded = False
+
+
+SOLD_OUT_WORDS = ('habis', 'sold out', 'stok habis')
+BUY_WORDS = ('beli sekarang', 'add to cart', 'tambah')
+
+LD_JSON_TYPE = 'application/ld+json'
+
+
+def _lxml():
+    """Modul lxml.etree, None jika lxml tidak terinstall (-> pakai BeautifulSoup)"""
+    global _etree, _etree_loaded
+    if not _etree_loaded:
+        try:
+            from lxml import etree
+            _etree = etree
+        except ImportError:
+            _etree = None
+        _etree_loaded = True
+    return _etree
+
+
+def available():
+    """True jika lxml tersedia untuk fast path"""
+    return _lxml() is not None
+
+
+def product_info_from_ld(data):
+    """ProductSnapshot dari JSON-LD, None jika bukan @type Product"""
+    if data.get('@type') != 'Product':
+        return None
+
+    offers = data.get('offers', {})
+
+    # Cek availability
+    availability = offers.get('availability', '')
+    is_available = 'InStock' in availability or 'InStock' in str(offers)
+
+    # JSON-LD tidak ada exact stock & terjual (stok 0/1, terjual 0)
+    return ProductSnapshot.from_rupiah(
+        data.get('name', 'Unknown'),
+        offers.get('price', 0),
+        offers.get('lowPrice', offers.get('price', 0)),
+        offers.get('highPrice', offers.get('price', 0)),
+        is_available,
+        data.get('brand', {}).get('name', 'Unknown') if isinstance(data.get('brand'), dict) else 'Unknown',
+        Method.HTML_JSONLD,
+    )
+
+
+def product_info_from_ld_text(text):
+    """Parse isi script ld+json; JSON rusak dilewati (None)"""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return product_info_from_ld(data)
+
+
+def availability_from_words(found):
+    """Deteksi ketersediaan dari kata kunci yang ditemukan di halaman"""
+    if any(word in found for word in SOLD_OUT_WORDS):
+        return False
+    if any(word in found for word in BUY_WORDS):
+        return True
+    return False
+
+
+def fallback_product_info(product_name, price, is_available):
+    """ProductSnapshot dari meta tag + deteksi kata kunci"""
+    return ProductSnapshot.from_rupiah(
+        product_name, price, price, price, is_available, 'Unknown', Method.HTML_FALLBACK
+    )
+
+
+class KeywordScanner:
+    """Cari kata kunci di body per chunk tanpa menyalin seluruh halaman"""
+
+    def __init__(self, words=SOLD_OUT_WORDS + BUY_WORDS):
+        self.words = [(word, word.encode('ascii')) for word in words]
+        self.found = set()
+        # Sisa chunk sebelumnya supaya kata yang terpotong antar chunk tetap ketemu
+        self._overlap = max(len(raw) for _, raw in self.words) - 1
+        self._tail = b''
+
+    def feed(self, chunk):
+        if len(self.found) == len(self.words):
+            return
+        window = self._tail + chunk.lower()
+        for word, raw in self.words:
+            if word not in self.found and raw in window:
+                self.found.add(word)
+        self._tail = window[-self._overlap:]
+
+
+def extract_product_info(chunks, encoding=None, parse_ld=product_info_from_ld_text):
+    """Ekstrak ProductSnapshot dari iterable chunk bytes
+
+    Berhenti membaca begitu JSON-LD Product ditemukan. Jika tidak ada,
+    baca sampai habis lalu pakai meta og:title / product:price:amount
+    dan kata kunci ketersediaan (sama seperti fallback BeautifulSoup).
+    parse_ld bisa diganti untuk cache hasil parsing isi script ld+json.
+    """
+    etree = _lxml()
+    parser = etree.HTMLPullParser(events=('end',), tag=('script', 'meta'), encoding=encoding)
+    scanner = KeywordScanner()
+    title_tag = None
+    price_tag = None
+
+    def handle_events():
+        nonlocal title_tag, price_tag
+        for _, element in parser.read_events():
+            if element.tag == 'script':
+                if element.get('type') == LD_JSON_TYPE:
+                    product_info = parse_ld(element.text)
+                    if product_info:
+                        return product_info
+            elif element.tag == 'meta':
+                prop = element.get('property')
+                if title_tag is None and prop == 'og:title':
+                    title_tag = element
+                elif price_tag is None and prop == 'product:price:amount':
+                    price_tag = element
+        return None
+
+    # Parser push libxml2 bisa melewatkan </script> yang terpotong antar feed,
+    # jadi data hanya di-feed sampai sebelum '<' terakhir, sisanya ditahan
+    pending = b''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        scanner.feed(chunk)
+        data = pending + chunk
+        cut = data.rfind(b'<')
+        if cut <= 0:
+            pending = data
+            continue
+        parser.feed(data[:cut])
+        pending = data[cut:]
+        product_info = handle_events()
+        if product_info:
+            return product_info
+
+    try:
+        if pending:
+            parser.feed(pending)
+        parser.close()
+    except etree.LxmlError:
+        # Dokumen kosong / rusak: lanjut ke fallback seperti BeautifulSoup
+        pass
+    product_info = handle_events()
+    if product_info:
+        return product_info
+
+    is_available = availability_from_words(scanner.found)
+    product_name = title_tag.attrib['content'] if title_tag is not None else 'Unknown'
+    price = float(price_tag.attrib['content']) if price_tag is not None else 0
+    return fallback_product_info(product_name, price, is_available)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Riwayat harga/stok per produk dalam file biner append-only
+
+Satu file per produk: header (magic + timestamp dasar) lalu record ukuran
+tetap 17 byte: offset detik dari timestamp dasar, harga (Rupiah, integer),
+stok, terjual, tersedia. Record bisa dicari dengan binary search langsung
+di mmap. Data lama di-downsample jadi satu record per bucket (default per
+jam) supaya file tetap kecil.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SHH1'
+HEADER = struct.Struct('<4sq4x')
+# offset detik, harga, stok (-1 = tidak diketahui), terjual (-1), tersedia
+RECORD = struct.Struct('<IIiiB')
+_MAX_U32 = 0xFFFFFFFF
+
+
+def _clamp_u32(value):
+    return max(0, min(_MAX_U32, int(round(value))))
+
+
+class HistoryStore:
+    """Append/query riwayat observasi produk, satu file per key (URL produk)"""
+
+    def __init__(self, directory, downsample_after=7 * 86400, bucket=3600, compact_every=86400):
+        self.directory = directory
+        self.downsample_after = downsample_after
+        self.bucket = bucket
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        # key -> (base timestamp, offset record terakhir)
+        self._tails = {}
+        self._next_compact = {}
+
+    def path(self, key):
+        name = hashlib.blake2b(key.encode('utf-8'), digest_size=10).hexdigest()
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def _read_tail(self, path):
+        """(base, offset terakhir) dari file, None jika file belum ada"""
+        try:
+            with open(path, 'rb') as f:
+                magic, base = HEADER.unpack(f.read(HEADER.size))
+                if magic != MAGIC:
+                    raise ValueError(f"Bukan file history: {path}")
+                size = os.fstat(f.fileno()).st_size
+                count = (size - HEADER.size) // RECORD.size
+                if count == 0:
+                    return base, 0
+                f.seek(HEADER.size + (count - 1) * RECORD.size)
+                return base, RECORD.unpack(f.read(RECORD.size))[0]
+        except FileNotFoundError:
+            return None
+
+    def append(self, key, product_info, now=None):
+        """Tambah satu observasi (murah: satu write 17 byte)"""
+        now = time.time() if now is None else now
+        exact = product_info.method.exact
+        path = self.path(key)
+        with self._lock:
+            tail = self._tails.get(key)
+            if tail is None:
+                tail = self._read_tail(path)
+                if tail is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    with open(path, 'wb') as f:
+                        f.write(HEADER.pack(MAGIC, int(now)))
+                    tail = (int(now), 0)
+            base, last_offset = tail
+            # Jam mundur: jaga offset tetap naik supaya binary search benar
+            offset = max(last_offset, min(_MAX_U32, int(now) - base))
+            record = RECORD.pack(
+                offset,
+                _clamp_u32(product_info.price),
+                int(product_info.stock) if exact else -1,
+                int(product_info.sold) if exact else -1,
+                1 if product_info.is_available else 0,
+            )
+            with open(path, 'ab') as f:
+                f.write(record)
+            self._tails[key] = (base, offset)
+
+            if now >= self._next_compact.get(key, 0):
+                self._next_compact[key] = now + self.compact_every
+                self._compact(key, path, now)
+
+    def _records(self, data):
+        base = HEADER.unpack_from(data, 0)[1]
+        count = (len(data) - HEADER.size) // RECORD.size
+        return base, count
+
+    def _offset_at(self, data, index):
+        return struct.unpack_from('<I', data, HEADER.size + index * RECORD.size)[0]
+
+    def _search(self, data, count, offset):
+        """Index record pertama dengan offset >= offset"""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self._offset_at(data, middle) < offset:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def query(self, key, start=None, end=None):
+        """List (timestamp, harga, stok, terjual, tersedia) untuk start <= t <= end"""
+        path = self.path(key)
+        with self._lock:
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                return []
+        with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            base, count = self._records(data)
+            first = 0 if start is None else self._search(data, count, max(0, int(start) - base))
+            last = count if end is None else self._search(data, count, max(0, int(end) - base + 1))
+            rows = []
+            for index in range(first, last):
+                offset, price, stock, sold, available = RECORD.unpack_from(
+                    data, HEADER.size + index * RECORD.size
+                )
+                rows.append((base + offset, price, stock, sold, bool(available)))
+            return rows
+
+    def restocks(self, key, start=None, end=None):
+        """Timestamp saat produk berubah dari habis ke tersedia"""
+        events = []
+        previous = None
+        for timestamp, _, _, _, available in self.query(key, start, end):
+            if available and previous is False:
+                events.append(timestamp)
+            previous = available
+        return events
+
+    def _compact(self, key, path, now):
+        """Record lebih lama dari downsample_after jadi satu per bucket
+
+        Per bucket disimpan harga terendah, stok/terjual terakhir, dan
+        tersedia jika sempat tersedia (restock tetap kelihatan). Idempotent.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        base, count = self._records(data)
+        cutoff = self._search(data, count, max(0, int(now - self.downsample_after) - base))
+        if cutoff == 0:
+            return
+
+        old = [RECORD.unpack_from(data, HEADER.size + i * RECORD.size) for i in range(cutoff)]
+        merged = []
+        current = None
+        for offset, price, stock, sold, available in old:
+            bucket = (base + offset) // self.bucket
+            if current is not None and current[0] == bucket:
+                _, first_offset, low, _, _, was_available = current
+                current = (bucket, first_offset, min(low, price), stock, sold, was_available | available)
+            else:
+                if current is not None:
+                    merged.append(current)
+                current = (bucket, offset, price, stock, sold, available)
+        merged.append(current)
+        if len(merged) == cutoff:
+            return
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data[:HEADER.size])
+            for _, offset, price, stock, sold, available in merged:
+                f.write(RECORD.pack(offset, price, stock, sold, available))
+            f.write(data[HEADER.size + cutoff * RECORD.size:])
+        os.replace(tmp_path, path)
+        logger.debug(f"🗜️ History {key}: {cutoff} record lama jadi {len(merged)}")
+
+    def compact(self, key, now=None):
+        """Paksa downsampling satu produk sekarang"""
+        now = time.time() if now is None else now
+        path = self.path(key)
+        with self._lock:
+            if os.path.exists(path):
+                self._compact(key, path, now)
+                self._next_compact[key] = now + self.compact_every
+
+    def rename(self, old, new):
+        """Pindahkan file history ke key baru (migrasi key lama), return True jika dipindah"""
+        with self._lock:
+            old_path, new_path = self.path(old), self.path(new)
+            if not os.path.exists(old_path) or os.path.exists(new_path):
+                return False
+            os.replace(old_path, new_path)
+            self._tails.pop(old, None)
+            self._next_compact.pop(old, None)
+            return True
+
+    def size(self):
+        """Total ukuran file history (byte)"""
+        total = 0
+        if not os.path.isdir(self.directory):
+            return 0
+        for name in os.listdir(self.directory):
+            if name.endswith('.bin'):
+                total += os.path.getsize(os.path.join(self.directory, name))
+        return total
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Connection pool bersama (keep-alive) untuk Shopee dan Telegram
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class HttpPool:
+    """Satu requests.Session per tujuan, dipakai ulang antar request"""
+
+    def __init__(self, config):
+        self.config = config
+        self.idle_timeout = config.HTTP_IDLE_TIMEOUT
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._last_used = {}
+        # Counter dari session yang sudah ditutup (idle timeout)
+        self._retired = {}
+        # Opsi per session: proxy / alamat sumber lokal (lihat egress.py)
+        self._options = {}
+
+    def configure(self, name, proxy=None, source_address=None):
+        """Atur proxy / alamat sumber untuk session `name` (berlaku saat session dibuat)"""
+        with self._lock:
+            self._options[name] = {'proxy': proxy, 'source_address': source_address}
+            if name in self._sessions:
+                self._retire(name)
+
+    def _pool_size(self, name):
+        if name.startswith('telegram'):
+            return self.config.TELEGRAM_POOL_SIZE
+        return self.config.HTTP_POOL_SIZE
+
+    def _retry(self, name):
+        """Retry adapter: GET boleh retry status 5xx, POST Telegram hanya saat connect gagal"""
+        from urllib3.util.retry import Retry
+        retries = self.config.HTTP_RETRIES
+        if name == 'telegram':
+            # Jangan retry POST yang mungkin sudah sampai (pesan dobel)
+            return Retry(total=retries, connect=retries, read=0, status=0, redirect=0)
+        return Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+
+    def _build_session(self, name):
+        # requests di-import saat session pertama dibuat (startup lebih cepat)
+        import requests
+        from requests.adapters import HTTPAdapter
+        options = self._options.get(name, {})
+        source_address = options.get('source_address')
+
+        class SourceAddressAdapter(HTTPAdapter):
+            """Koneksi keluar dari alamat lokal tertentu (server dengan banyak IP)"""
+
+            def init_poolmanager(self, *args, **kwargs):
+                kwargs['source_address'] = (source_address, 0)
+                super().init_poolmanager(*args, **kwargs)
+
+        session = requests.Session()
+        size = self._pool_size(name)
+        adapter = (SourceAddressAdapter if source_address else HTTPAdapter)(
+            pool_connections=size,
+            pool_maxsize=size,
+            max_retries=self._retry(name),
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if options.get('proxy'):
+            session.proxies = {'http': options['proxy'], 'https': options['proxy']}
+            # Abaikan HTTP(S)_PROXY dari environment untuk session ini
+            session.trust_env = False
+        return session
+
+    def session(self, name):
+        """Ambil session untuk tujuan tertentu, buat baru jika idle terlalu lama"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(name)
+            last = self._last_used.get(name, now)
+            if session is not None and self.idle_timeout > 0 and now - last > self.idle_timeout:
+                # Koneksi idle kemungkinan sudah diputus server, tutup dan mulai lagi
+                self._retire(name)
+                session = None
+            if session is None:
+                session = self._build_session(name)
+                self._sessions[name] = session
+            self._last_used[name] = now
+            return session
+
+    def get(self, name, url, **kwargs):
+        return self.session(name).get(url, **kwargs)
+
+    def post(self, name, url, **kwargs):
+        return self.session(name).post(url, **kwargs)
+
+    def _retire(self, name):
+        session = self._sessions.pop(name, None)
+        if session is None:
+            return
+        new, total = self._session_counts(session)
+        old_new, old_total = self._retired.get(name, (0, 0))
+        self._retired[name] = (old_new + new, old_total + total)
+        session.close()
+
+    @staticmethod
+    def _session_counts(session):
+        """Hitung (koneksi baru, total request) dari semua pool urllib3 di session"""
+        new = total = 0
+        seen = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+            for manager in managers:
+                if manager is None:
+                    continue
+                pools = manager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    new += pool.num_connections
+                    total += pool.num_requests
+        return new, total
+
+    def stats(self):
+        """Statistik per tujuan: koneksi baru vs koneksi dipakai ulang"""
+        result = {}
+        with self._lock:
+            names = set(self._sessions) | set(self._retired)
+            for name in names:
+                new, total = self._retired.get(name, (0, 0))
+                session = self._sessions.get(name)
+                if session is not None:
+                    live_new, live_total = self._session_counts(session)
+                    new += live_new
+                    total += live_total
+                result[name] = {
+                    'requests': total,
+                    'new_connections': new,
+                    'reused': max(0, total - new),
+                }
+        return result
+
+    def log_stats(self):
+        for name, stat in sorted(self.stats().items()):
+            logger.info(
+                f"🔌 Pool {name}: {stat['requests']} request, "
+                f"{stat['new_connections']} koneksi baru, {stat['reused']} reuse"
+            )
+
+    def close(self):
+        with self._lock:
+            for name in list(self._sessions):
+                self._retire(name)
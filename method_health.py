@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Health tracker per metode fetch + circuit breaker
+
+Metode yang sedang sehat dicoba duluan, metode yang terus gagal dilewati
+sampai probe half-open berhasil.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class _MethodStats:
+    def __init__(self, window):
+        self.results = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.probing = False
+        self.consecutive_failures = 0
+        self.total = 0
+        self.failures = 0
+
+    def success_rate(self):
+        if not self.results:
+            return 1.0
+        return sum(self.results) / len(self.results)
+
+    def avg_latency(self):
+        if not self.latencies:
+            return 0.0
+        return sum(self.latencies) / len(self.latencies)
+
+
+class MethodHealth:
+    """Rolling window sukses/latency per metode, urutan fallback dinamis"""
+
+    def __init__(self, methods, window=50, min_samples=5, failure_rate=0.5,
+                 max_consecutive_failures=5, cooldown=300):
+        self.methods = list(methods)
+        self.min_samples = min_samples
+        self.failure_rate = failure_rate
+        self.max_consecutive_failures = max_consecutive_failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._stats = {name: _MethodStats(window) for name in self.methods}
+
+    def allow(self, name, now=None):
+        """True jika metode boleh dicoba sekarang (breaker closed / probe half-open)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            stats = self._stats[name]
+            if stats.state == CLOSED:
+                return True
+            if stats.state == OPEN:
+                if now < stats.open_until:
+                    return False
+                stats.state = HALF_OPEN
+                stats.probing = False
+            # Half-open: hanya satu probe sekaligus
+            if stats.probing:
+                return False
+            stats.probing = True
+            return True
+
+    def record(self, name, ok, latency, now=None):
+        """Catat hasil satu percobaan metode"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            stats = self._stats[name]
+            stats.results.append(1 if ok else 0)
+            stats.latencies.append(latency)
+            stats.total += 1
+
+            if ok:
+                stats.consecutive_failures = 0
+                if stats.state != CLOSED:
+                    logger.info(f"✅ Metode {name} pulih, circuit breaker ditutup")
+                    # Mulai window baru supaya kegagalan lama tidak langsung membuka breaker lagi
+                    stats.results.clear()
+                    stats.results.append(1)
+                stats.state = CLOSED
+                stats.probing = False
+                return
+
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.state == HALF_OPEN:
+                self._open(name, stats, now)
+                return
+
+            samples = len(stats.results)
+            failing_rate = samples >= self.min_samples and stats.success_rate() < 1 - self.failure_rate
+            if failing_rate or stats.consecutive_failures >= self.max_consecutive_failures:
+                self._open(name, stats, now)
+
+    def _open(self, name, stats, now):
+        if stats.state != OPEN:
+            logger.warning(f"⚠️ Metode {name} sering gagal, dilewati {self.cooldown} detik")
+        stats.state = OPEN
+        stats.open_until = now + self.cooldown
+        stats.probing = False
+
+    def order(self):
+        """Urutan metode: sukses rate tertinggi dulu, breaker open paling akhir"""
+        with self._lock:
+            def key(item):
+                index, name = item
+                stats = self._stats[name]
+                return (stats.state == OPEN, -round(stats.success_rate(), 1), index)
+            return [name for _, name in sorted(enumerate(self.methods), key=key)]
+
+    def snapshot(self):
+        """Statistik per metode untuk log / metrics"""
+        with self._lock:
+            return {
+                name: {
+                    'state': stats.state,
+                    'success_rate': stats.success_rate(),
+                    'avg_latency': stats.avg_latency(),
+                    'total': stats.total,
+                    'failures': stats.failures,
+                }
+                for name, stats in self._stats.items()
+            }
+
+    def log_stats(self):
+        for name, stat in self.snapshot().items():
+            logger.info(
+                f"📈 Metode {name}: {stat['success_rate']*100:.0f}% sukses, "
+                f"{stat['avg_latency']:.2f} detik, breaker {stat['state']}"
+            )
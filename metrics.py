@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Metrics ringan untuk hot path polling + endpoint HTTP format Prometheus
+
+Histogram dan counter cukup satu bisect + satu lock per observasi, jadi
+aman dipanggil dari thread pool tiap request. Endpoint /metrics hanya
+aktif jika METRICS_PORT diisi.
+"""
+
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Detik: request / parsing (ms) sampai sweep & deteksi (puluhan detik)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _HistogramChild:
+    __slots__ = ('_buckets', '_counts', '_sum', '_lock')
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self):
+        """(jumlah kumulatif per bucket, sum, count)"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+class _CounterChild:
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+class _Metric:
+    """Dasar metric berlabel: child per kombinasi label dibuat sekali lalu di-cache
+
+    Subclass menyediakan _new_child() yang membuat child untuk satu kombinasi label.
+    """
+
+    kind = None
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def children(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = []
+        for values, child in self.children():
+            cumulative, total, count = child.snapshot()
+            for bound, running in zip(self.buckets + (float('inf'),), cumulative):
+                labels = _format_labels(self.labelnames, values, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {running}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in self.children()
+        ]
+
+
+class Metrics:
+    """Semua metric polling bot dalam satu registry"""
+
+    def __init__(self, prefix='shopee_'):
+        self._metrics = []
+        self.fetch_latency = self.histogram(
+            prefix + 'fetch_latency_seconds', 'Durasi fetch per metode', ['method'])
+        self.fetch_failures = self.counter(
+            prefix + 'fetch_failures_total', 'Fetch gagal per metode dan HTTP status', ['method', 'status'])
+        self.parse_time = self.histogram(
+            prefix + 'parse_seconds', 'Durasi parsing response per parser', ['parser'])
+        self.sweep_duration = self.histogram(
+            prefix + 'sweep_duration_seconds', 'Durasi satu sweep semua produk', buckets=DURATION_BUCKETS)
+        self.detection_lag = self.histogram(
+            prefix + 'detection_lag_seconds', 'Status berubah sampai notifikasi terkirim',
+            buckets=DURATION_BUCKETS)
+        self.checks = self.counter(
+            prefix + 'checks_total', 'Pengecekan produk per hasil', ['result'])
+        self.schedule_lag = self.histogram(
+            prefix + 'schedule_lag_seconds', 'Telat mulai cek dari deadline (mode fixed)',
+            buckets=DURATION_BUCKETS)
+        self.deadline_misses = self.counter(
+            prefix + 'deadline_misses_total', 'Cek yang melewati deadline (mode fixed)')
+        self.burst_time_to_alert = self.histogram(
+            prefix + 'burst_time_to_alert_seconds', 'Mode burst: stok muncul sampai notifikasi terkirim')
+        self.egress_cooldowns = self.counter(
+            prefix + 'egress_cooldowns_total', 'Egress didinginkan karena 403/429', ['egress', 'endpoint'])
+
+    def histogram(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, description, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, description, labelnames=()):
+        metric = Counter(name, description, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Teks exposition format Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Endpoint GET /metrics di thread background"""
+
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        self.metrics = metrics
+        self.port = port
+        self.host = host
+        self._server = None
+
+    def start(self):
+        # http.server hanya di-import jika endpoint metrics dipakai
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logger.error(f"❌ Endpoint metrics gagal dibuka di {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True).start()
+        logger.info(f"📈 Metrics: http://{self.host}:{self.server_port}/metrics")
+        return True
+
+    @property
+    def server_port(self):
+        return self._server.server_address[1] if self._server else self.port
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
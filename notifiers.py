@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Backend notifikasi (Telegram, webhook lokal, file/stdout) dan template pesan
+
+Tiap backend punya antrian dan thread pengirim sendiri, jadi backend yang
+lambat (webhook timeout, disk penuh) tidak pernah menunda backend lain
+maupun polling. Pesan produk dirakit dari template per jenis status;
+bagian statis tiap produk (nama, harga, toko, URL) di-cache dan hanya
+dirender ulang saat nama, toko atau harganya berubah.
+"""
+
+import html
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# emoji, judul per jenis pesan (template dirakit sekali saat import)
+_STATUS = {
+    'ready': ("🎉✨🛒", "PRODUK READY STOCK!"),
+    'sold_out': ("😢💔", "Produk Habis"),
+    'rule': ("🔔", "Perubahan Produk"),
+    'new': ("🆕", "PRODUK BARU DI TOKO!"),
+    None: ("ℹ️", "Update Status"),
+}
+HEADERS = {status: f"\n{emoji} <b>{text}</b> {emoji}\n" for status, (emoji, text) in _STATUS.items()}
+STOCK_LINES = {True: "📊 <b>Stok:</b> READY ✅\n", False: "📊 <b>Stok:</b> HABIS ❌\n"}
+
+_TAG = re.compile(r'<[^>]+>')
+
+
+def plain_text(text):
+    """Pesan HTML Telegram -> teks biasa (untuk file/stdout)"""
+    return html.unescape(_TAG.sub('', text)).strip()
+
+
+class MessageRenderer:
+    """Rakit pesan notifikasi produk dari template + cache bagian statis per produk"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._static = OrderedDict()
+        self._lock = threading.Lock()
+        # (detik, teks waktu) terakhir
+        self._stamp = (None, '')
+        self.stats = Counter()
+
+    def _static_parts(self, product_info):
+        """(bagian atas, bagian bawah) pesan, dirender ulang hanya jika nama/harga/toko berubah"""
+        signature = (
+            product_info.name, product_info.price_units, product_info.price_min_units,
+            product_info.price_max_units, product_info.shop_name, product_info.method,
+        )
+        key = product_info.url
+        with self._lock:
+            cached = self._static.get(key)
+            if cached is not None and cached[0] == signature:
+                self._static.move_to_end(key)
+                self.stats['hit'] += 1
+                return cached[1]
+
+        if product_info.price_min_units != product_info.price_max_units and product_info.price_max_units > 0:
+            price_text = f"Rp {product_info.price_min:,.0f} - Rp {product_info.price_max:,.0f}"
+        else:
+            price_text = f"Rp {product_info.price:,.0f}"
+        parts = (
+            f"\n📦 <b>Produk:</b> {product_info.name}\n\n💰 <b>Harga:</b> {price_text}\n",
+            f"🏪 <b>Toko:</b> {product_info.shop_name}\n\n🔗 <b>BELI SEKARANG:</b>\n"
+            f"{product_info.url}\n\n🤖 <i>Metode: {product_info.method.label}</i>\n",
+        )
+        with self._lock:
+            self.stats['render'] += 1
+            self._static[key] = (signature, parts)
+            self._static.move_to_end(key)
+            while len(self._static) > self.max_entries:
+                self._static.popitem(last=False)
+        return parts
+
+    def _timestamp(self):
+        """Waktu pesan, strftime paling banyak sekali per detik"""
+        second = int(time.time())
+        stamp = self._stamp
+        if stamp[0] != second:
+            stamp = (second, f"⏰ <i>{datetime.fromtimestamp(second).strftime('%d-%m-%Y %H:%M:%S')}</i>\n")
+            self._stamp = stamp
+        return stamp[1]
+
+    def render(self, product_info, status_change, reasons=None):
+        top, bottom = self._static_parts(product_info)
+        reason_text = ''
+        if reasons:
+            reason_text = '\n' + '\n'.join(f"📌 {reason}" for reason in reasons) + '\n'
+        return (
+            HEADERS.get(status_change, HEADERS[None])
+            + reason_text
+            + top
+            + STOCK_LINES[bool(product_info.is_available)]
+            + f"🛒 <b>Terjual:</b> {product_info.sold} unit\n"
+            + bottom
+            + self._timestamp()
+        )
+
+
+class Notifier:
+    """Dasar backend notifikasi
+
+    Subclass menyediakan send(chat_id, text, detected_at=None, key=None, urgent=False)
+    yang tidak pernah blocking; key = identitas produk, urgent = kirim tanpa menunggu digest.
+    """
+
+    name = None
+    # True = bisa kirim ke chat pelanggan lain (Telegram); backend lokal hanya dapat pesan pemilik
+    per_chat = False
+    # Dipasang Notifiers: callback (key, detected_at, sent_at) saat notif perubahan terkirim
+    on_delivered = None
+
+    def pending_count(self):
+        return 0
+
+    def close(self, timeout=15):
+        pass
+
+    def log_stats(self):
+        pass
+
+
+class TelegramNotifier(Notifier):
+    """Backend Telegram: TelegramOutbox (thread, rate limit, digest) yang sudah ada"""
+
+    name = 'telegram'
+    per_chat = True
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+        outbox.delivery_listeners.append(self._delivered)
+
+    def _delivered(self, key, detected_at, sent_at):
+        if self.on_delivered is not None:
+            self.on_delivered(key, detected_at, sent_at)
+
+    def send(self, chat_id, text, detected_at=None, key=None, urgent=False):
+        return self.outbox.send(chat_id, text, detected_at, key=key, urgent=urgent)
+
+    def pending_count(self):
+        return self.outbox.pending_count()
+
+    def close(self, timeout=15):
+        self.outbox.close(timeout)
+
+
+class QueueNotifier(Notifier):
+    """Backend dengan antrian terbatas + thread pengirim sendiri
+
+    Antrian penuh (backend macet): pesan terlama dibuang, bukan menunda pengirim.
+    Subclass menyediakan deliver(chat_id, text, detected_at): kirim satu pesan,
+    return True jika berhasil.
+    """
+
+    def __init__(self, queue_size=1000):
+        self._queue = deque()
+        self.queue_size = queue_size
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread = None
+        self.stats = Counter()
+
+    def send(self, chat_id, text, detected_at=None, key=None, urgent=False):
+        # Tanpa digest: pesan selalu dikirim begitu thread pengirim siap
+        with self._cond:
+            if self._closing:
+                return False
+            if len(self._queue) >= self.queue_size:
+                self._queue.popleft()
+                self.stats['dropped'] += 1
+            self._queue.append((chat_id, text, detected_at, key))
+            self.stats['queued'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'notify-{self.name}', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return True
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._queue)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait(1.0)
+                if not self._queue:
+                    return
+                chat_id, text, detected_at, key = self._queue.popleft()
+            try:
+                ok = self.deliver(chat_id, text, detected_at)
+            except Exception as e:
+                logger.error(f"❌ Notifier {self.name} error: {e}")
+                ok = False
+            self.stats['sent' if ok else 'failed'] += 1
+            if ok and detected_at is not None and self.on_delivered is not None:
+                self.on_delivered(key, detected_at, time.time())
+
+    def close(self, timeout=15):
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.warning(f"⚠️ {self.pending_count()} pesan {self.name} belum terkirim saat bot berhenti")
+
+    def log_stats(self):
+        stats = self.stats
+        logger.info(
+            f"📣 Notifier {self.name}: {stats['sent']} terkirim, {stats['failed']} gagal, "
+            f"{stats['dropped']} dibuang, {self.pending_count()} antri"
+        )
+
+
+class WebhookNotifier(QueueNotifier):
+    """POST JSON {chat_id, text, plain, detected_at} ke URL lokal (Home Assistant, n8n, ...)"""
+
+    name = 'webhook'
+
+    def __init__(self, http, url, timeout=5, queue_size=1000):
+        super().__init__(queue_size)
+        self.http = http
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, chat_id, text, detected_at):
+        payload = {'chat_id': str(chat_id), 'text': text, 'plain': plain_text(text), 'detected_at': detected_at}
+        response = self.http.post('webhook', self.url, json=payload, timeout=self.timeout)
+        if response.status_code >= 400:
+            logger.warning(f"⚠️ Webhook {self.url} gagal: HTTP {response.status_code}")
+            return False
+        return True
+
+
+class FileNotifier(QueueNotifier):
+    """Tulis pesan sebagai teks biasa ke file (append) atau stdout ('-')"""
+
+    name = 'file'
+
+    def __init__(self, path, queue_size=1000):
+        super().__init__(queue_size)
+        self.path = path
+
+    def deliver(self, chat_id, text, detected_at):
+        line = f"[{datetime.now().strftime('%d-%m-%Y %H:%M:%S')}] {plain_text(text)}\n\n"
+        if self.path == '-':
+            sys.stdout.write(line)
+            sys.stdout.flush()
+        else:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        return True
+
+
+class Notifiers:
+    """Kirim satu pesan ke semua backend aktif (masing-masing antri sendiri)"""
+
+    def __init__(self, backends):
+        self.backends = list(backends)
+        # Callback (key, detected_at, sent_at) tiap notif perubahan terkirim di backend mana pun
+        # (laporan mode burst), jadi tetap jalan tanpa backend Telegram
+        self.delivery_listeners = []
+        for backend in self.backends:
+            backend.on_delivered = self.delivered
+
+    def __len__(self):
+        return len(self.backends)
+
+    def get(self, name):
+        for backend in self.backends:
+            if backend.name == name:
+                return backend
+        return None
+
+    def send(self, chat_id, text, detected_at=None, owner=True, key=None, urgent=False):
+        """owner=False (chat pelanggan lain) hanya ke backend per_chat (Telegram)"""
+        sent = False
+        for backend in self.backends:
+            if owner or backend.per_chat:
+                sent = backend.send(chat_id, text, detected_at, key=key, urgent=urgent) or sent
+        return sent
+
+    def delivered(self, key, detected_at, sent_at):
+        """Teruskan ke delivery_listeners; listener yang error tidak menghentikan thread pengirim"""
+        for listener in list(self.delivery_listeners):
+            try:
+                listener(key, detected_at, sent_at)
+            except Exception:
+                logger.exception("❌ Listener notif terkirim error")
+
+    def close(self, timeout=15):
+        for backend in self.backends:
+            backend.close(timeout)
+
+    def log_stats(self):
+        for backend in self.backends:
+            backend.log_stats()
+
+
+def build_notifiers(config, http, outbox):
+    """Backend dari config.NOTIFIERS (telegram, webhook, file)"""
+    backends = []
+    for name in config.NOTIFIERS:
+        if name == 'telegram':
+            backends.append(TelegramNotifier(outbox))
+        elif name == 'webhook':
+            if not config.WEBHOOK_URL:
+                logger.error("❌ Notifier webhook butuh WEBHOOK_URL, dilewati")
+                continue
+            backends.append(WebhookNotifier(http, config.WEBHOOK_URL, config.WEBHOOK_TIMEOUT, config.NOTIFIER_QUEUE_SIZE))
+        elif name == 'file':
+            backends.append(FileNotifier(config.NOTIFY_FILE, config.NOTIFIER_QUEUE_SIZE))
+        else:
+            logger.error(f"❌ Notifier tidak dikenal: {name}")
+    return Notifiers(backends)
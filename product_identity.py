@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Identitas produk (shop_id, item_id) dari URL Shopee
+
+Produk yang sama bisa muncul dengan slug, query string atau short link
+(shp.ee) berbeda. Semua URL dipetakan sekali ke identitas yang sama;
+status, rule, history dan langganan memakai key identitas itu, jadi satu
+item hanya dicek sekali per siklus. Short link (hanya host di
+SHORT_LINK_HOSTS) di-resolve lewat redirect satu kali lalu disimpan di
+state.db.
+"""
+
+import logging
+import re
+import time
+from collections import Counter, OrderedDict
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# .../Nama-Produk-i.SHOP_ID.ITEM_ID, .../product/SHOP_ID/ITEM_ID, .../shop/SHOP_ID/ITEM_ID
+_ID_PATTERNS = (
+    re.compile(r'-i\.(\d+)\.(\d+)'),
+    re.compile(r'/(?:product|shop)/(\d+)/(\d+)'),
+)
+
+
+def parse_ids(url):
+    """(shop_id, item_id) dari URL tanpa request, (None, None) jika tidak dikenali"""
+    path = url.split('?', 1)[0].split('#', 1)[0]
+    for pattern in _ID_PATTERNS:
+        match = pattern.search(path)
+        if match:
+            return match.group(1), match.group(2)
+    return None, None
+
+
+# Host short link resmi Shopee; URL lain yang tidak bisa di-parse tidak pernah di-request
+SHORT_LINK_HOSTS = ('shp.ee', 's.shopee.co.id')
+# URL yang gagal dikenali: maksimal sekian entry, dicoba resolve lagi setelah TTL (detik)
+_FAILED_MAX = 1024
+_FAILED_TTL = 3600
+
+
+def is_short_link(url, hosts=SHORT_LINK_HOSTS):
+    """True jika URL http(s) dengan host di daftar short link (atau subdomainnya)"""
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return False
+    host = (parsed.hostname or '').lower()
+    if parsed.scheme not in ('http', 'https') or not host:
+        return False
+    return any(host == allowed or host.endswith('.' + allowed) for allowed in hosts)
+
+
+# Domain Shopee yang boleh ditambahkan lewat /add (selain host SHOPEE_BASE_URL)
+SHOPEE_DOMAINS = ('shopee.co.id',)
+
+
+def is_shopee_url(url, base_url, short_hosts=SHORT_LINK_HOSTS):
+    """True jika URL http(s) ke host SHOPEE_BASE_URL, domain Shopee, atau short link resmi
+
+    URL dari /add bisa berasal dari chat mana saja: host lain (jaringan
+    internal, metadata cloud) tidak boleh pernah di-fetch.
+    """
+    try:
+        parsed = urlparse(url)
+        base = urlparse(base_url)
+    except ValueError:
+        return False
+    host = (parsed.hostname or '').lower()
+    if parsed.scheme not in ('http', 'https') or not host:
+        return False
+    if parsed.netloc.lower() == base.netloc.lower():
+        return True
+    if any(host == domain or host.endswith('.' + domain) for domain in SHOPEE_DOMAINS):
+        return True
+    return is_short_link(url, short_hosts)
+
+
+def canonical_url(base_url, shop_id, item_id):
+    """URL produk yang disimpan dan di-fetch: {SHOPEE_BASE_URL}/product/SHOP_ID/ITEM_ID"""
+    return f"{base_url.rstrip('/')}/product/{shop_id}/{item_id}"
+
+
+def identity_key(shop_id, item_id):
+    """Key state untuk satu item: 'SHOP_ID.ITEM_ID'"""
+    return f"{shop_id}.{item_id}"
+
+
+class ProductIdentities:
+    """Index URL -> (shop_id, item_id), di memori untuk semua URL dan di state.db untuk short link"""
+
+    def __init__(self, store=None, resolver=None, short_hosts=SHORT_LINK_HOSTS):
+        # StateStore untuk hasil resolve short link (None = hanya di memori)
+        self._store = store
+        # Fungsi URL -> URL akhir setelah redirect (None = tidak resolve short link)
+        self._resolver = resolver
+        # Hanya host ini yang boleh di-resolve (URL dari /add bisa berasal dari siapa saja)
+        self.short_hosts = tuple(host.lower() for host in short_hosts)
+        self._ids = {}
+        # URL gagal -> time.monotonic() saat gagal (terbatas, lihat _FAILED_MAX)
+        self._failed = OrderedDict()
+        self.stats = Counter()
+        if store is not None:
+            self._ids.update(store.identities())
+
+    def ids(self, url):
+        """(shop_id, item_id) untuk URL, (None, None) jika tidak dikenali
+
+        Hasil yang berhasil di-cache, jadi tiap URL paling banyak di-parse /
+        di-resolve sekali per proses. URL yang gagal disimpan terbatas dan
+        dicoba lagi setelah _FAILED_TTL detik.
+        """
+        ids = self._ids.get(url)
+        if ids is not None:
+            return ids
+        failed_at = self._failed.get(url)
+        if failed_at is not None and time.monotonic() - failed_at < _FAILED_TTL:
+            return None, None
+        ids = parse_ids(url)
+        if ids[0] is None and self._resolver is not None and is_short_link(url, self.short_hosts):
+            ids = self._resolve(url)
+        if ids[0] is None:
+            logger.error(f"❌ Format URL tidak dikenali: {url}")
+            self._failed[url] = time.monotonic()
+            self._failed.move_to_end(url)
+            while len(self._failed) > _FAILED_MAX:
+                self._failed.popitem(last=False)
+            return ids
+        self._failed.pop(url, None)
+        self._ids[url] = ids
+        return ids
+
+    def _resolve(self, url):
+        self.stats['resolved'] += 1
+        try:
+            target = self._resolver(url)
+        except Exception as e:
+            logger.warning(f"⚠️ Gagal resolve short link {url}: {e}")
+            return None, None
+        ids = parse_ids(target or '')
+        if ids[0] is not None:
+            logger.info(f"🔗 Short link {url} → {ids[0]}.{ids[1]}")
+            if self._store is not None:
+                self._store.set_identity(url, *ids)
+        return ids
+
+    def key(self, url):
+        """Key identitas untuk URL (URL itu sendiri jika ID tidak dikenali)"""
+        shop_id, item_id = self.ids(url)
+        if shop_id is None:
+            return url
+        return identity_key(shop_id, item_id)
+
+    def dedupe(self, products):
+        """Gabungkan produk dengan identitas sama
+
+        Return (dict nama -> url tanpa duplikat, list (nama dibuang, nama dipakai)).
+        Nama dan URL pertama yang dipakai.
+        """
+        unique = {}
+        seen = {}
+        merged = []
+        for product_name, product_url in products.items():
+            key = self.key(product_url)
+            if key in seen:
+                merged.append((product_name, seen[key]))
+                continue
+            seen[key] = product_name
+            unique[product_name] = product_url
+        return unique, merged
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Record hasil cek produk yang ringkas (pengganti dict product_info)
+
+Harga disimpan dalam unit asli Shopee (rupiah x 100000, integer) dan
+metode fetch sebagai IntEnum, jadi satu snapshot hanya berisi slot
+tanpa dict per objek. Akses lama product_info['price'] tetap jalan
+untuk kode di luar hot path.
+"""
+
+from enum import IntEnum
+
+# Harga API Shopee = rupiah x 100000
+PRICE_SCALE = 100000
+
+
+class Method(IntEnum):
+    """Metode fetch yang menghasilkan snapshot"""
+    API_V4 = 1
+    API_V4_BATCH = 2
+    HTML_JSONLD = 3
+    HTML_FALLBACK = 4
+    API_V2 = 5
+    SHOP_LISTING = 6
+
+    @property
+    def label(self):
+        return _LABELS[self]
+
+    @property
+    def exact(self):
+        """False untuk HTML: stok 0/1 dan terjual 0, bukan angka asli"""
+        return self not in (Method.HTML_JSONLD, Method.HTML_FALLBACK)
+
+    @classmethod
+    def from_label(cls, label):
+        return _BY_LABEL[label]
+
+
+_LABELS = {
+    Method.API_V4: 'API v4',
+    Method.API_V4_BATCH: 'API v4 (Batch)',
+    Method.HTML_JSONLD: 'HTML Scraping (JSON-LD)',
+    Method.HTML_FALLBACK: 'HTML Scraping (Fallback)',
+    Method.API_V2: 'API v2',
+    Method.SHOP_LISTING: 'Listing Toko',
+}
+_BY_LABEL = {label: method for method, label in _LABELS.items()}
+
+
+def to_units(rupiah):
+    """Rupiah (float dari HTML/meta tag) -> unit harga Shopee"""
+    return int(round(float(rupiah) * PRICE_SCALE))
+
+
+class ProductSnapshot:
+    """Satu hasil cek produk: nama, harga (unit), stok, terjual, toko, metode"""
+
+    __slots__ = (
+        'name', 'price_units', 'price_min_units', 'price_max_units',
+        'stock', 'sold', 'shop_name', 'is_available', 'method', 'url',
+    )
+
+    def __init__(self, name, price_units, price_min_units, price_max_units, stock, sold,
+                 shop_name, is_available, method, url=None):
+        self.name = name
+        self.price_units = price_units
+        self.price_min_units = price_min_units
+        self.price_max_units = price_max_units
+        self.stock = stock
+        self.sold = sold
+        self.shop_name = shop_name
+        self.is_available = is_available
+        self.method = method
+        self.url = url
+
+    @classmethod
+    def from_item(cls, item, method, sold=None):
+        """Snapshot dari item JSON API Shopee (harga sudah dalam unit)"""
+        if sold is None:
+            sold = item.get('sold', item.get('historical_sold', 0))
+        stock = item.get('stock', 0)
+        return cls(
+            item.get('name', 'Unknown'),
+            int(item.get('price', 0)),
+            int(item.get('price_min', 0)),
+            int(item.get('price_max', 0)),
+            stock,
+            sold,
+            item.get('shop_name', 'Unknown'),
+            stock > 0,
+            method,
+        )
+
+    @classmethod
+    def from_rupiah(cls, name, price, price_min, price_max, is_available, shop_name, method):
+        """Snapshot dari harga rupiah (HTML); stok 0/1 dan terjual 0"""
+        return cls(
+            name, to_units(price), to_units(price_min), to_units(price_max),
+            1 if is_available else 0, 0, shop_name, is_available, method,
+        )
+
+    @property
+    def price(self):
+        return self.price_units / PRICE_SCALE
+
+    @property
+    def price_min(self):
+        return self.price_min_units / PRICE_SCALE
+
+    @property
+    def price_max(self):
+        return self.price_max_units / PRICE_SCALE
+
+    def copy(self):
+        return ProductSnapshot(*(getattr(self, slot) for slot in self.__slots__))
+
+    # Akses gaya dict lama (product_info['price'], product_info.get('sold'))
+    def __getitem__(self, field):
+        try:
+            value = getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+        return value.label if field == 'method' else value
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        if not isinstance(other, ProductSnapshot):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        return (
+            f"ProductSnapshot({self.name!r}, price={self.price:,.0f}, stock={self.stock}, "
+            f"sold={self.sold}, available={self.is_available}, method={self.method.label!r})"
+        )
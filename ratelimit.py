@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Token bucket sederhana untuk membatasi laju request
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """Isi ulang `rate` token per detik, maksimal `capacity` token"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._updated)
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def try_take(self, tokens=1, now=None):
+        """Ambil token jika cukup, return True/False tanpa menunggu"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens=1, now=None):
+        """Detik sampai token cukup (0 jika sudah cukup)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._refill(now)
+            if self._tokens >= tokens or self.rate <= 0:
+                return 0.0 if self._tokens >= tokens else float('inf')
+            return (tokens - self._tokens) / self.rate
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache response per URL: conditional request (ETag / Last-Modified) dan
+fingerprint payload supaya response yang tidak berubah tidak di-parse ulang
+"""
+
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(data):
+    """Hash murah untuk bytes payload"""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class ResponseCache:
+    """Cache LRU terbatas, key = URL produk / endpoint API"""
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def conditional_headers(self, key):
+        """Header If-None-Match / If-Modified-Since dari response sebelumnya"""
+        with self._lock:
+            entry = self._get(key)
+            if entry is None:
+                return {}
+            headers = {}
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+
+    def not_modified(self, key):
+        """Server jawab 304: pakai product_info dari cache"""
+        with self._lock:
+            entry = self._get(key)
+            if entry is None:
+                self.stats['miss'] += 1
+                return None
+            self.stats['hit_304'] += 1
+            self.stats['bytes_saved'] += entry['size']
+            return entry['product_info'].copy()
+
+    def match(self, key, payload_fingerprint, count_miss=True):
+        """Payload sama dengan sebelumnya: lewati parsing, pakai product_info cache"""
+        with self._lock:
+            entry = self._get(key)
+            if entry is not None and entry['fingerprint'] == payload_fingerprint:
+                self.stats['hit_fingerprint'] += 1
+                return entry['product_info'].copy()
+            if count_miss:
+                self.stats['miss'] += 1
+            return None
+
+    def count_miss(self):
+        with self._lock:
+            self.stats['miss'] += 1
+
+    def store(self, key, product_info, headers=None, payload_fingerprint=None, size=0):
+        """Simpan hasil parsing + validator dari header response"""
+        if self.max_entries <= 0:
+            return
+        headers = headers or {}
+        with self._lock:
+            self._entries[key] = {
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'fingerprint': payload_fingerprint,
+                'product_info': product_info.copy(),
+                'size': size,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evicted'] += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def log_stats(self):
+        stats = self.stats
+        hits = stats['hit_304'] + stats['hit_fingerprint']
+        logger.info(
+            f"🗂️ Cache response: {hits} hit ({stats['hit_304']} x 304, "
+            f"{stats['hit_fingerprint']} x fingerprint), {stats['miss']} miss, "
+            f"hemat {stats['bytes_saved'] / 1024:.0f} KB"
+        )
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Rule perubahan produk: harga turun, harga di bawah target, stok lewat
+batas, lonjakan terjual
+
+Tiap produk punya snapshot kecil (harga, stok, terjual). Saat cek, hanya
+field yang berubah dibandingkan snapshot yang dievaluasi, dan hanya rule
+yang mengawasi field itu yang dipanggil (index field -> rule).
+"""
+
+import logging
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Urutan field di snapshot (list), posisi terakhir = waktu 'sold' terakhir berubah
+FIELDS = ('price', 'price_min', 'price_max', 'stock', 'sold')
+_SOLD_AT = len(FIELDS)
+# Metode HTML tidak punya stok/terjual asli (stok 0/1, terjual 0)
+_EXACT_ONLY = ('stock', 'sold')
+
+
+def _rupiah(value):
+    return f"Rp {value:,.0f}"
+
+
+class Rule:
+    """Dasar rule: `fields` yang diawasi, check(field, old, new, elapsed) return alasan atau None"""
+
+    fields = ()
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.product = spec.get('product')
+
+
+class PriceDropRule(Rule):
+    """Harga turun minimal `percent` % dari cek sebelumnya"""
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.percent = float(spec['percent'])
+        self.fields = (spec.get('field', 'price'),)
+
+    def check(self, field, old, new, elapsed):
+        if old and new < old and (old - new) / old * 100 >= self.percent:
+            return f"Harga turun {(old - new) / old * 100:.0f}%: {_rupiah(old)} → {_rupiah(new)}"
+        return None
+
+
+class PriceBelowRule(Rule):
+    """Harga turun melewati `target` (sekali saat melewati batas)"""
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.target = float(spec['target'])
+        self.fields = (spec.get('field', 'price'),)
+
+    def check(self, field, old, new, elapsed):
+        if 0 < new <= self.target < old:
+            return f"Harga {_rupiah(new)} di bawah target {_rupiah(self.target)}"
+        return None
+
+
+class StockBelowRule(Rule):
+    """Stok turun di bawah `threshold` (stok menipis)"""
+
+    fields = ('stock',)
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.threshold = int(spec['threshold'])
+
+    def check(self, field, old, new, elapsed):
+        if new < self.threshold <= old:
+            return f"Stok menipis: tinggal {new} (batas {self.threshold})"
+        return None
+
+
+class StockAboveRule(Rule):
+    """Stok naik mencapai `threshold` (restock banyak)"""
+
+    fields = ('stock',)
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.threshold = int(spec['threshold'])
+
+    def check(self, field, old, new, elapsed):
+        if old < self.threshold <= new:
+            return f"Stok naik: {old} → {new} (batas {self.threshold})"
+        return None
+
+
+class SoldSpikeRule(Rule):
+    """Terjual naik minimal `per_hour` unit/jam sejak perubahan sebelumnya"""
+
+    fields = ('sold',)
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.per_hour = float(spec['per_hour'])
+
+    def check(self, field, old, new, elapsed):
+        if new <= old or elapsed <= 0:
+            return None
+        rate = (new - old) * 3600.0 / elapsed
+        if rate >= self.per_hour:
+            return f"Penjualan melonjak: +{new - old} unit ({rate:,.0f}/jam)"
+        return None
+
+
+RULE_TYPES = {
+    'price_drop': PriceDropRule,
+    'price_below': PriceBelowRule,
+    'stock_below': StockBelowRule,
+    'stock_above': StockAboveRule,
+    'sold_spike': SoldSpikeRule,
+}
+
+
+def build_rule(spec):
+    """Rule dari dict Config.RULES, ValueError jika type/parameter salah"""
+    rule_type = spec.get('type')
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Rule type tidak dikenal: {rule_type!r}")
+    try:
+        rule = RULE_TYPES[rule_type](spec)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Rule {rule_type} tidak valid: {spec} ({e})")
+    for field in rule.fields:
+        if field not in FIELDS:
+            raise ValueError(f"Field rule tidak dikenal: {field!r}")
+    return rule
+
+
+class RuleEngine:
+    """Snapshot per produk + index (produk, field) -> rule"""
+
+    def __init__(self, specs=()):
+        self.rules = [build_rule(spec) for spec in specs]
+        # field -> rule untuk semua produk, (nama produk, field) -> rule khusus
+        self._global = {}
+        self._by_product = {}
+        for rule in self.rules:
+            for field in rule.fields:
+                if rule.product:
+                    self._by_product.setdefault((rule.product, field), []).append(rule)
+                else:
+                    self._global.setdefault(field, []).append(rule)
+        self._snapshots = {}
+        self.stats = Counter()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _values(self, product_info):
+        exact = product_info.method.exact
+        values = []
+        for field in FIELDS:
+            value = getattr(product_info, field)
+            if field in _EXACT_ONLY and not exact:
+                value = None
+            values.append(value)
+        return values
+
+    def evaluate(self, key, product_name, product_info, last_price=None, now=None):
+        """Update snapshot produk, return list alasan rule yang terpicu
+
+        last_price (dari state.db) dipakai sebagai snapshot awal setelah
+        restart supaya penurunan harga pertama tidak terlewat.
+        """
+        if not self.rules:
+            return []
+        now = time.time() if now is None else now
+        values = self._values(product_info)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            if last_price is None:
+                self._snapshots[key] = values + [now]
+                return []
+            snapshot = [last_price] + [None] * (len(FIELDS) - 1) + [now]
+            self._snapshots[key] = snapshot
+
+        reasons = []
+        for index, field in enumerate(FIELDS):
+            new = values[index]
+            old = snapshot[index]
+            if new is None or new == old:
+                continue
+            snapshot[index] = new
+            if field == 'sold':
+                elapsed = now - snapshot[_SOLD_AT]
+                snapshot[_SOLD_AT] = now
+            else:
+                elapsed = None
+            if old is None:
+                continue
+
+            rules = self._global.get(field, ())
+            specific = self._by_product.get((product_name, field))
+            if specific:
+                rules = list(rules) + specific
+            for rule in rules:
+                self.stats['evaluated'] += 1
+                reason = rule.check(field, old, new, elapsed)
+                if reason:
+                    self.stats['fired'] += 1
+                    reasons.append(reason)
+        return reasons
+
+    def forget(self, key):
+        self._snapshots.pop(key, None)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Scheduler adaptif - produk yang sering berubah dicek lebih sering,
+produk yang stabil dicek makin jarang
+
+Mode 'fixed': tiap produk dicek pada deadline tetap (deadline sebelumnya +
+interval), tidak bergeser karena lama sweep atau delay. Deadline awal
+disebar sepanjang interval dan diberi jitter kecil supaya request tidak
+datang serentak.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+import zlib
+
+
+class AdaptiveScheduler:
+    """Priority queue waktu cek berikutnya (next-due) per produk"""
+
+    def __init__(self, config, metrics=None):
+        self.base_interval = config.CHECK_INTERVAL
+        self.min_interval = config.MIN_CHECK_INTERVAL
+        self.max_interval = config.MAX_CHECK_INTERVAL
+        self.backoff = config.INTERVAL_BACKOFF
+        self.options = config.PRODUCT_OPTIONS
+        # Budget request per menit (0 = tanpa batas)
+        self.budget = config.REQUEST_BUDGET
+        self._allowance = float(max(1, self.budget))
+        self._last_refill = time.monotonic()
+        # Mode fixed-rate: jitter = fraksi interval (0.05 = +-5%)
+        self.fixed = config.SCHEDULE_MODE == 'fixed'
+        self.jitter = max(0.0, min(0.5, config.SCHEDULE_JITTER))
+        self.metrics = metrics
+
+        self._heap = []
+        self._entries = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _limits(self, name):
+        """(min, max, priority) untuk produk, dengan override dari PRODUCT_OPTIONS"""
+        opts = self.options.get(name, {})
+        priority = max(0.1, float(opts.get('priority', 1)))
+        low = float(opts.get('min_interval', self.min_interval))
+        # Prioritas tinggi -> batas atas interval ikut turun
+        high = float(opts.get('max_interval', self.max_interval)) / priority
+        return low, max(low, high), priority
+
+    def _push(self, entry, due):
+        entry['due'] = due
+        entry['version'] += 1
+        heapq.heappush(self._heap, (due, next(self._seq), entry['name'], entry['version']))
+
+    def add(self, name, url, due=None):
+        """Daftarkan produk; default langsung jatuh tempo"""
+        low, high, priority = self._limits(name)
+        interval = min(high, max(low, self.base_interval / priority))
+        if self.fixed:
+            # Mode fixed: tepat CHECK_INTERVAL / priority, hanya dibatasi opsi per produk
+            opts = self.options.get(name, {})
+            interval = self.base_interval / priority
+            low = float(opts.get('min_interval', interval))
+            high = max(low, float(opts.get('max_interval', interval)))
+            interval = min(high, max(low, interval))
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = {'name': name, 'version': 0, 'fingerprint': None, 'misses': 0}
+                self._entries[name] = entry
+            entry.update(url=url, interval=interval, min=low, max=high, priority=priority)
+            due = time.monotonic() if due is None else due
+            if self.fixed:
+                entry['deadline'] = due
+                # Deadline berikutnya digeser (stabil per nama) supaya produk tersebar rata
+                entry['phase'] = interval * (1 + zlib.crc32(name.encode('utf-8')) % 1000) / 1000.0
+            self._push(entry, due)
+
+    def remove(self, name):
+        """Hapus produk (entry lama di heap diabaikan saat di-pop)"""
+        with self._lock:
+            return self._entries.pop(name, None) is not None
+
+    def set_interval(self, seconds, name=None):
+        """Ubah interval semua produk (name=None) atau satu produk, berlaku langsung"""
+        seconds = float(seconds)
+        with self._lock:
+            if name is None:
+                self.base_interval = seconds
+                self.min_interval = min(seconds, max(30.0, seconds / 4))
+                self.max_interval = seconds * 4
+                entries = list(self._entries.values())
+            else:
+                # Salin supaya Config.PRODUCT_OPTIONS tidak ikut berubah
+                self.options = dict(self.options)
+                self.options[name] = dict(self.options.get(name, {}), min_interval=seconds, max_interval=seconds)
+                entries = [self._entries[name]] if name in self._entries else []
+            targets = [(entry['name'], entry['url'], entry['due']) for entry in entries]
+
+        now = time.monotonic()
+        for entry_name, url, due in targets:
+            # Interval baru lebih pendek: jangan tunggu jadwal lama (due None = sedang dicek)
+            self.add(entry_name, url, due=now + seconds if due is None else min(due, now + seconds))
+        return len(targets)
+
+    def _refill(self, now):
+        if self.budget <= 0:
+            return
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._allowance = min(float(self.budget), self._allowance + elapsed * self.budget / 60.0)
+
+    def pop_due(self, now=None, limit=None):
+        """Ambil produk yang sudah jatuh tempo (urut paling telat dulu)"""
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            self._refill(now)
+            while self._heap and self._heap[0][0] <= now:
+                if limit is not None and len(due) >= limit:
+                    break
+                if self.budget > 0 and self._allowance < 1:
+                    break
+                _, _, name, version = heapq.heappop(self._heap)
+                entry = self._entries.get(name)
+                if entry is None or entry['version'] != version:
+                    continue
+                if self.fixed:
+                    self._record_lag(entry, now)
+                entry['due'] = None
+                if self.budget > 0:
+                    self._allowance -= 1
+                due.append((name, entry['url']))
+        return due
+
+    def seconds_until_next(self, now=None):
+        """Detik sampai produk berikutnya jatuh tempo (None jika kosong)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._heap:
+                _, _, name, version = self._heap[0]
+                entry = self._entries.get(name)
+                if entry is not None and entry['version'] == version:
+                    break
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return None
+            wait = self._heap[0][0] - now
+            if self.budget > 0 and self._allowance < 1:
+                wait = max(wait, (1 - self._allowance) * 60.0 / self.budget)
+            return max(0.0, wait)
+
+    def _record_lag(self, entry, now):
+        """Catat telat mulai cek terhadap deadline; lewat batas jitter = deadline miss"""
+        lag = max(0.0, now - entry['deadline'])
+        if self.metrics is not None:
+            self.metrics.schedule_lag.observe(lag)
+        if lag > self.jitter * entry['interval'] + 1.0:
+            self._miss(entry, 1)
+
+    def _miss(self, entry, count):
+        entry['misses'] += count
+        if self.metrics is not None:
+            self.metrics.deadline_misses.inc(count)
+
+    def _reschedule_fixed(self, entry, now):
+        """Deadline berikutnya = deadline sebelumnya + interval (tidak ikut lama cek)"""
+        interval = entry['interval']
+        phase = entry.pop('phase', None)
+        deadline = entry['deadline'] + (interval if phase is None else phase)
+        if deadline <= now:
+            skipped = int((now - deadline) // interval) + 1
+            deadline += skipped * interval
+            # Cek (plus antrian) lebih lama dari interval: slot yang terlewat dihitung miss
+            # (kecuali slot sebaran awal yang memang lebih pendek dari interval)
+            if phase is None:
+                self._miss(entry, skipped)
+        entry['deadline'] = deadline
+        jitter = random.uniform(-self.jitter, self.jitter) * interval
+        self._push(entry, max(now, deadline + jitter))
+        return interval
+
+    def report(self, name, product_info, now=None):
+        """Catat hasil cek lalu jadwalkan ulang produk
+
+        Berubah (stok/harga/ketersediaan) -> interval turun ke minimum,
+        tidak berubah -> interval naik bertahap sampai maksimum.
+        Mode fixed: interval tetap, jadwal mengikuti deadline.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            if self.fixed:
+                return self._reschedule_fixed(entry, now)
+            if product_info is not None:
+                fingerprint = (
+                    product_info.is_available,
+                    product_info.price_units,
+                    product_info.stock,
+                )
+                if entry['fingerprint'] is not None and fingerprint != entry['fingerprint']:
+                    entry['interval'] = entry['min']
+                else:
+                    entry['interval'] = min(entry['max'], entry['interval'] * self.backoff)
+                entry['fingerprint'] = fingerprint
+            self._push(entry, now + entry['interval'])
+            return entry['interval']
+
+    def intervals(self):
+        """Snapshot interval per produk (untuk log / status)"""
+        with self._lock:
+            return {name: entry['interval'] for name, entry in self._entries.items()}
+
+    def misses(self):
+        """Jumlah deadline miss per produk (mode fixed)"""
+        with self._lock:
+            return {name: entry['misses'] for name, entry in self._entries.items() if entry['misses']}
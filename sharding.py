@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Mode sharding - watchlist besar dibagi ke beberapa proses worker
+
+Coordinator membagi Config.PRODUCTS (+ watchlist Telegram) dengan hash
+stabil, tiap worker menjalankan loop polling sendiri, dan semua notifikasi
+dikirim oleh satu outbox Telegram di coordinator (tidak ada pesan dobel).
+Semua worker memakai satu state.db (WAL) dengan key identitas produk, jadi
+mengubah jumlah worker tidak menghilangkan status terakhir produk.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import zlib
+
+from config import Config
+from http_pool import HttpPool
+from metrics import Metrics, MetricsServer
+from product_identity import identity_key, parse_ids
+from state_store import StateStore
+from subscriptions import Subscriptions
+from telegram_queue import TelegramOutbox
+
+logger = logging.getLogger(__name__)
+
+# Cek worker yang mati tiap N detik, juga saat antrian event tidak pernah kosong
+WORKER_CHECK_INTERVAL = 1.0
+
+
+def shard_for(key, workers):
+    """Nomor shard stabil untuk key (sama di setiap restart)"""
+    return zlib.crc32(key.encode('utf-8')) % workers
+
+
+def _product_key(product_url):
+    """Identitas (shop_id.item_id) dari URL, URL apa adanya jika tanpa ID (short link)"""
+    shop_id, item_id = parse_ids(product_url)
+    return product_url if shop_id is None else identity_key(shop_id, item_id)
+
+
+def split_products(products, workers):
+    """Bagi dict produk ke `workers` shard berdasarkan hash identitas (shop_id, item_id)
+
+    URL berbeda untuk item yang sama masuk shard yang sama, jadi worker bisa
+    menggabungkannya. URL tanpa ID (short link) di-hash apa adanya.
+    """
+    shards = [{} for _ in range(workers)]
+    for product_name, product_url in products.items():
+        shards[shard_for(_product_key(product_url), workers)][product_name] = product_url
+    return shards
+
+
+def watched_products(store, products):
+    """Config.PRODUCTS + watchlist Telegram; produk langganan chat lain hanya diperingatkan
+
+    Mode sharding hanya mengirim notifikasi ke TELEGRAM_CHAT_ID, jadi produk
+    yang hanya dilanggan chat lain tidak ikut dicek.
+    """
+    products = dict(products)
+    added, removed = store.watchlist()
+    products.update(added)
+    for product_name in removed:
+        products.pop(product_name, None)
+    watched = {_product_key(product_url) for product_url in products.values()}
+    skipped = [
+        product_name for product_name, product_url in Subscriptions(store).products().items()
+        if _product_key(product_url) not in watched
+    ]
+    if skipped:
+        logger.warning(
+            f"⚠️ {len(skipped)} produk langganan chat lain tidak dicek di mode --workers: "
+            f"{', '.join(skipped[:5])}{' ...' if len(skipped) > 5 else ''}"
+        )
+    return products
+
+
+def _forward_deliveries(deliveries, notifiers):
+    """Thread worker: waktu kirim dari outbox coordinator -> delivery_listeners (laporan burst)"""
+    while True:
+        delivery = deliveries.get()
+        if delivery is None:
+            return
+        notifiers.delivered(*delivery)
+
+
+def worker_main(index, products, events, deliveries=None):
+    """Entry point proses worker: polling shard sendiri, notifikasi ke coordinator"""
+    # Import di sini supaya proses worker membuat session & thread sendiri
+    from bot_reliable import ShopeeMonitorReliable
+    from async_engine import AsyncPollingEngine
+
+    def notify(message, detected_at=None, key=None, urgent=False):
+        events.put((index, message, detected_at, key, urgent))
+        return True
+
+    monitor = ShopeeMonitorReliable(
+        # Satu state.db bersama: tiap worker hanya menulis key produknya sendiri
+        state_path=Config.STATE_DB,
+        products=products,
+        notify=notify,
+        # Toko cukup dipantau satu worker
+        shops=None if index == 0 else {}
+    )
+    if deliveries is not None:
+        threading.Thread(
+            target=_forward_deliveries, args=(deliveries, monitor.notifiers),
+            name='worker-deliveries', daemon=True
+        ).start()
+    if Config.METRICS_PORT:
+        # Port coordinator + 1 + nomor worker
+        monitor.start_metrics(Config.METRICS_PORT + 1 + index)
+    engine = AsyncPollingEngine(monitor)
+    logger.info(f"👷 Worker {index}: {len(products)} produk")
+    try:
+        asyncio.run(engine.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+        monitor.shutdown()
+
+
+class ShardCoordinator:
+    """Jalankan N worker dan satu notifier Telegram bersama"""
+
+    def __init__(self, workers, products=None):
+        self.config = Config()
+        self.workers = workers
+        if products is None:
+            store = StateStore(self.config.STATE_DB)
+            try:
+                products = watched_products(store, self.config.PRODUCTS)
+            finally:
+                store.close()
+        self.products = dict(products)
+        self.shards = split_products(self.products, workers)
+        self.events = multiprocessing.Queue()
+        # Per worker: (key, detected_at, sent_at) notif yang sudah terkirim (laporan mode burst)
+        self.deliveries = [multiprocessing.Queue() for _ in range(workers)]
+        # key produk -> nomor worker yang mengirim event terakhir untuk produk itu
+        self._key_workers = {}
+        self.processes = {}
+        self._stopping = threading.Event()
+        self.http = HttpPool(self.config)
+        # Coordinator hanya mencatat detection lag (notifikasi dikirim di sini)
+        self.metrics = Metrics()
+        self.metrics_server = None
+        self.outbox = TelegramOutbox(self.http, self.config.TELEGRAM_BOT_TOKEN, self.config, self.metrics)
+        self.outbox.delivery_listeners.append(self._delivered)
+
+    def _start_worker(self, index):
+        process = multiprocessing.Process(
+            target=worker_main,
+            args=(index, self.shards[index], self.events, self.deliveries[index]),
+            name=f'shopee-worker-{index}',
+            daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+
+    def _check_workers(self):
+        """Worker yang mati tidak wajar dijalankan ulang"""
+        for index, process in list(self.processes.items()):
+            if not process.is_alive():
+                logger.error(f"❌ Worker {index} berhenti (exit {process.exitcode}), restart...")
+                self._start_worker(index)
+
+    def notify(self, message, detected_at=None, key=None, urgent=False):
+        return self.outbox.send(self.config.TELEGRAM_CHAT_ID, message, detected_at, key=key, urgent=urgent)
+
+    def _event(self, event):
+        """Event dari worker -> outbox; ingat worker pengirim supaya waktu kirimnya bisa dikembalikan"""
+        index, message, detected_at, key, urgent = event
+        if key is not None:
+            self._key_workers[key] = index
+        self.notify(message, detected_at, key, urgent)
+
+    def _delivered(self, key, detected_at, sent_at):
+        """Callback outbox (thread pengirim): teruskan ke worker yang mendeteksi perubahan"""
+        index = self._key_workers.get(key)
+        if index is not None:
+            self.deliveries[index].put((key, detected_at, sent_at))
+
+    def stop(self):
+        """Hentikan loop coordinator (dari thread lain)"""
+        self._stopping.set()
+
+    def run(self):
+        logger.info("="*60)
+        logger.info(f"🚀 BOT NOTIFIKASI SHOPEE DIMULAI! ({self.workers} worker)")
+        logger.info("="*60)
+
+        for index, shard in enumerate(self.shards):
+            # Worker 0 juga memantau SHOPS, jadi tetap jalan walau tidak dapat produk
+            if shard or (index == 0 and self.config.SHOPS):
+                self._start_worker(index)
+
+        self.notify(f"""
+🤖 <b>Bot Shopee Monitor Aktif!</b>
+
+📋 Monitoring: {len(self.products)} produk
+⏱️ Interval: {self.config.CHECK_INTERVAL} detik
+👷 Worker: {len(self.processes)} proses
+
+Bot akan kirim notif jika ada perubahan status!
+""")
+        if self.config.METRICS_PORT:
+            self.metrics_server = MetricsServer(self.metrics, self.config.METRICS_PORT, self.config.METRICS_HOST)
+            self.metrics_server.start()
+
+        next_check = time.monotonic() + WORKER_CHECK_INTERVAL
+        try:
+            while not self._stopping.is_set():
+                if time.monotonic() >= next_check:
+                    self._check_workers()
+                    next_check = time.monotonic() + WORKER_CHECK_INTERVAL
+                try:
+                    event = self.events.get(timeout=WORKER_CHECK_INTERVAL)
+                except queue.Empty:
+                    continue
+                self._event(event)
+        except KeyboardInterrupt:
+            logger.info("\n⛔ Bot dihentikan")
+            self.notify("⛔ <b>Bot Shopee Monitor Dihentikan</b>\n\nTerima kasih!")
+        finally:
+            if self._stopping.is_set():
+                # Berhenti lewat stop(): minta worker simpan state lalu keluar
+                for process in self.processes.values():
+                    if process.is_alive():
+                        os.kill(process.pid, signal.SIGINT)
+            for process in self.processes.values():
+                process.join(10)
+                if process.is_alive():
+                    process.terminate()
+            # Pesan terakhir dari worker yang sempat masuk antrian
+            while True:
+                try:
+                    event = self.events.get_nowait()
+                except queue.Empty:
+                    break
+                self._event(event)
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            self.outbox.close()
+            self.http.close()
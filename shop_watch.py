@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Mode pantau toko: semua item satu toko Shopee lewat listing toko
+
+Listing diambil per halaman (item terbaru dulu). Tiap toko punya index
+ringkas item_id -> (stok, hash harga) dan fingerprint per halaman;
+halaman yang bytes-nya sama dengan crawl sebelumnya tidak di-decode dan
+tidak di-diff. Notifikasi hanya untuk item baru dan item yang restock.
+Item yang hilang dari listing lengkap dibuang dari index, jadi item yang
+di-relist dapat alert produk baru lagi.
+"""
+
+import json
+import logging
+import re
+import time
+import zlib
+from array import array
+from collections import Counter
+
+from egress import EgressUnavailable
+from product_identity import identity_key, parse_ids
+from product_record import Method, ProductSnapshot
+from response_cache import fingerprint as response_fingerprint
+
+logger = logging.getLogger(__name__)
+
+_SHOP_PATTERN = re.compile(r'/shop/(\d+)/?$')
+_FINGERPRINT_SIZE = 16
+_MAX_STOCK = 0xFFFFFFFF
+
+
+def parse_shop_id(value):
+    """shop_id dari angka, URL .../shop/ID atau URL produk toko itu (None jika tidak dikenali)"""
+    value = str(value).strip()
+    if value.isdigit():
+        return value
+    path = value.split('?', 1)[0].split('#', 1)[0]
+    match = _SHOP_PATTERN.search(path)
+    if match:
+        return match.group(1)
+    return parse_ids(value)[0]
+
+
+def pack_entry(stock, price_units):
+    """Stok (32 bit atas) + crc32 harga (32 bit bawah) dalam satu integer"""
+    stock = max(0, min(_MAX_STOCK, int(stock or 0)))
+    return stock << 32 | zlib.crc32(str(price_units).encode('ascii'))
+
+
+def entry_stock(packed):
+    return packed >> 32
+
+
+def listing_items(body):
+    """List item_basic dari bytes satu halaman listing"""
+    data = json.loads(body)
+    entries = data.get('items') or (data.get('data') or {}).get('items') or []
+    return data, [entry.get('item_basic', entry) for entry in entries]
+
+
+class ShopIndex:
+    """Index satu toko: item_id -> entry terpacking, fingerprint tiap halaman listing"""
+
+    __slots__ = ('items', 'pages')
+
+    def __init__(self, items=None, pages=None):
+        self.items = items if items is not None else {}
+        # Fingerprint halaman 0..n-1 dari crawl terakhir (halaman terakhir = akhir listing)
+        self.pages = pages if pages is not None else []
+
+    def to_blobs(self):
+        flat = array('Q')
+        for item_id, packed in self.items.items():
+            flat.append(item_id)
+            flat.append(packed)
+        return flat.tobytes(), b''.join(self.pages)
+
+    @classmethod
+    def from_blobs(cls, items_blob, pages_blob):
+        flat = array('Q')
+        flat.frombytes(items_blob)
+        items = dict(zip(flat[::2], flat[1::2]))
+        pages = [pages_blob[i:i + _FINGERPRINT_SIZE] for i in range(0, len(pages_blob), _FINGERPRINT_SIZE)]
+        return cls(items, pages)
+
+
+class ShopWatcher:
+    """Crawl listing toko di Config.SHOPS lalu kirim alert item baru / restock"""
+
+    def __init__(self, monitor, shops):
+        self.monitor = monitor
+        self.config = monitor.config
+        self.shops = {}
+        for shop_name, value in shops.items():
+            shop_id = parse_shop_id(value)
+            if shop_id is None:
+                logger.error(f"❌ Toko tidak dikenali: {shop_name} ({value})")
+                continue
+            self.shops[shop_name] = shop_id
+        self._indexes = {}
+        self.stats = Counter()
+
+    def __len__(self):
+        return len(self.shops)
+
+    def index(self, shop_id):
+        """Index toko dari memori, dimuat dari state.db saat pertama dipakai"""
+        index = self._indexes.get(shop_id)
+        if index is None:
+            blobs = self.monitor.product_status.shop_index(shop_id)
+            index = ShopIndex.from_blobs(*blobs) if blobs else ShopIndex()
+            self._indexes[shop_id] = index
+        return index
+
+    def page_url(self, shop_id, page):
+        size = self.config.SHOP_PAGE_SIZE
+        return (
+            f"{self.monitor.base_url}{self.config.SHOP_LISTING_ENDPOINT}"
+            f"?filter_sold_out=0&limit={size}&offset={page * size}&order=desc&shopid={shop_id}&sort_by=ctime"
+        )
+
+    def fetch_page(self, shop_id, page):
+        """Bytes satu halaman listing, None jika gagal"""
+        headers = self.monitor.get_random_headers()
+        headers['Referer'] = f'{self.monitor.base_url}/shop/{shop_id}'
+        try:
+            response = self.monitor.shopee_request('shop', self.page_url(shop_id, page), headers=headers, timeout=15)
+        except EgressUnavailable as e:
+            logger.debug(f"⏳ Listing toko {shop_id} ditunda: {e}")
+            return None
+        except Exception as e:
+            self.monitor.record_failure('shop', 'error')
+            logger.warning(f"⚠️ Listing toko {shop_id} halaman {page + 1} error: {e}")
+            return None
+        if response.status_code != 200:
+            self.monitor.record_failure('shop', response.status_code)
+            logger.warning(f"⚠️ Listing toko {shop_id} halaman {page + 1} gagal: HTTP {response.status_code}")
+            return None
+        return response.content
+
+    def crawl(self, shop_name):
+        """Crawl satu toko, return list (jenis, ProductSnapshot) yang dikirim sebagai alert"""
+        shop_id = self.shops[shop_name]
+        index = self.index(shop_id)
+        first = not index.pages
+        watched = {self.monitor.identities.key(url) for url in self.monitor.products.values()}
+        alerts = []
+        pages = []
+        # item_id yang terlihat di halaman yang di-decode + bytes halaman yang dilewati
+        seen = set()
+        skipped = []
+        decoded = False
+        complete = False
+        changed = False
+
+        for page in range(self.config.SHOP_MAX_PAGES):
+            body = self.fetch_page(shop_id, page)
+            if body is None:
+                break
+            self.stats['pages'] += 1
+            page_fingerprint = response_fingerprint(body)
+            pages.append(page_fingerprint)
+            if page < len(index.pages) and index.pages[page] == page_fingerprint:
+                # Halaman sama persis dengan crawl sebelumnya: tidak perlu decode / diff
+                self.stats['pages_skipped'] += 1
+                skipped.append(body)
+                if page == len(index.pages) - 1:
+                    complete = True
+                    break
+                continue
+
+            data, items = listing_items(body)
+            decoded = True
+            for item in items:
+                item_id = int(item.get('itemid', 0))
+                seen.add(item_id)
+                packed = pack_entry(item.get('stock', 0), item.get('price', 0))
+                old = index.items.get(item_id)
+                if old == packed:
+                    continue
+                index.items[item_id] = packed
+                changed = True
+                if first or identity_key(shop_id, item_id) in watched:
+                    continue
+                if old is None:
+                    alerts.append(('new', item))
+                elif entry_stock(old) == 0 and entry_stock(packed) > 0:
+                    alerts.append(('ready', item))
+            if data.get('nomore') or len(items) < self.config.SHOP_PAGE_SIZE:
+                complete = True
+                break
+
+        if complete and decoded:
+            # Listing lengkap berubah: item yang tidak ada lagi dibuang dari index.
+            # Halaman yang dilewati baru di-decode di sini, hanya untuk daftar item_id.
+            for body in skipped:
+                seen.update(int(item.get('itemid', 0)) for item in listing_items(body)[1])
+            removed = index.items.keys() - seen
+            for item_id in removed:
+                del index.items[item_id]
+            if removed:
+                self.stats['removed'] += len(removed)
+                changed = True
+        if complete:
+            changed = changed or pages != index.pages
+            index.pages = pages
+        elif pages and not first:
+            # Crawl terputus: fingerprint halaman yang sudah diproses tetap diperbarui
+            # (crawl pertama yang terputus diulang dari awal tanpa alert)
+            changed = True
+            index.pages[:len(pages)] = pages
+        if changed:
+            self.monitor.product_status.save_shop_index(shop_id, *index.to_blobs())
+
+        if first and complete:
+            logger.info(f"📝 Index awal toko {shop_name}: {len(index.items)} item, {len(pages)} halaman")
+        snapshots = [(kind, self.snapshot(shop_id, item)) for kind, item in alerts]
+        self.send_alerts(shop_name, snapshots)
+        return snapshots
+
+    def snapshot(self, shop_id, item):
+        product_info = ProductSnapshot.from_item(item, Method.SHOP_LISTING)
+        product_info.url = f"{self.monitor.base_url}/product/{shop_id}/{item.get('itemid')}"
+        return product_info
+
+    def send_alerts(self, shop_name, snapshots):
+        """Satu pesan per item (maks SHOP_MAX_ALERTS), sisanya diringkas"""
+        limit = self.config.SHOP_MAX_ALERTS
+        detected_at = time.time()
+        for kind, product_info in snapshots[:limit]:
+            self.stats[kind] += 1
+            label = 'Produk baru' if kind == 'new' else 'Restock'
+            logger.info(f"🏬 {shop_name}: {label} {product_info.name}")
+            message = self.monitor.format_message(product_info, kind, [f"Toko {shop_name}"])
+            self.monitor.send_telegram_message(message, detected_at)
+        rest = snapshots[limit:]
+        if rest:
+            self.stats['summarized'] += len(rest)
+            names = '\n'.join(
+                f"{'🆕' if kind == 'new' else '🎉'} {product_info.name}\n{product_info.url}"
+                for kind, product_info in rest
+            )
+            self.monitor.send_telegram_message(
+                f"🏬 <b>{shop_name}</b>: {len(rest)} perubahan lain\n\n{names}", detected_at
+            )
+
+    def log_stats(self):
+        stats = self.stats
+        logger.info(
+            f"🏬 Pantau toko: {stats['pages']} halaman ({stats['pages_skipped']} tidak berubah), "
+            f"{stats['new']} produk baru, {stats['ready']} restock, {stats['removed']} hilang dari listing"
+        )
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+State produk persisten (SQLite WAL) supaya restart tidak kehilangan status
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+
+from product_record import PRICE_SCALE
+
+logger = logging.getLogger(__name__)
+
+# Key yang sudah dicek tidak ada di SQLite (tidak perlu query ulang)
+_MISSING = -1
+_NO_PRICE = -1
+FIELDS = ('is_available', 'fail_count', 'last_price', 'last_seen')
+
+
+class ProductState:
+    """View satu baris tabel status (bukan salinan): perubahan langsung ke array
+
+    Bisa dipakai seperti dict lama (status['is_available']) atau atribut.
+    Field kosong: is_available/last_price/last_seen None.
+    """
+
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    @property
+    def is_available(self):
+        value = self._table._available[self._row]
+        return None if value < 0 else bool(value)
+
+    @is_available.setter
+    def is_available(self, value):
+        self._table._available[self._row] = -1 if value is None else int(bool(value))
+
+    @property
+    def fail_count(self):
+        return self._table._fail_count[self._row]
+
+    @fail_count.setter
+    def fail_count(self, value):
+        self._table._fail_count[self._row] = value
+
+    @property
+    def last_price_units(self):
+        value = self._table._price_units[self._row]
+        return None if value == _NO_PRICE else value
+
+    @last_price_units.setter
+    def last_price_units(self, value):
+        self._table._price_units[self._row] = _NO_PRICE if value is None else value
+
+    @property
+    def last_price(self):
+        value = self.last_price_units
+        return None if value is None else value / PRICE_SCALE
+
+    @last_price.setter
+    def last_price(self, value):
+        self.last_price_units = None if value is None else int(round(value * PRICE_SCALE))
+
+    @property
+    def last_seen(self):
+        value = self._table._last_seen[self._row]
+        return value or None
+
+    @last_seen.setter
+    def last_seen(self, value):
+        self._table._last_seen[self._row] = value or 0.0
+
+    # Akses gaya dict lama
+    def __contains__(self, field):
+        return field in FIELDS and getattr(self, field) is not None
+
+    def __getitem__(self, field):
+        if field not in self:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __setitem__(self, field, value):
+        if field not in FIELDS:
+            raise KeyError(field)
+        setattr(self, field, value)
+
+    def get(self, field, default=None):
+        return getattr(self, field) if field in self else default
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in FIELDS if field in self}
+
+    def __eq__(self, other):
+        if isinstance(other, ProductState):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self):
+        return f"ProductState({self.to_dict()})"
+
+
+class StateStore:
+    """Pengganti dict product_status: dimuat lazy per produk, ditulis per batch
+
+    Status disimpan di array per kolom (satu baris per produk) dengan index
+    key -> baris, bukan dict per produk. store[key] memberi ProductState
+    (view ke baris itu). Setelah mengubah status, panggil touch(key)
+    supaya perubahan ikut ditulis ke disk.
+    """
+
+    def __init__(self, path, batch_size=500, flush_interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        # key -> nomor baris (_MISSING = tidak ada di SQLite)
+        self._rows = {}
+        self._free = []
+        self._available = array('b')
+        self._fail_count = array('l')
+        self._price_units = array('q')
+        self._last_seen = array('d')
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+
+        # timeout: mode --workers menulis ke file yang sama dari beberapa proses
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS product_status ('
+            ' key TEXT PRIMARY KEY,'
+            ' is_available INTEGER,'
+            ' fail_count INTEGER NOT NULL DEFAULT 0,'
+            ' last_price REAL,'
+            ' last_seen REAL)'
+        )
+        # Produk yang ditambah/dihapus lewat perintah Telegram (menimpa Config.PRODUCTS)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS watchlist ('
+            ' name TEXT PRIMARY KEY,'
+            ' url TEXT,'
+            ' removed INTEGER NOT NULL DEFAULT 0)'
+        )
+        # Langganan chat lain (multi user): chat -> produk
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS subscriptions ('
+            ' chat_id TEXT NOT NULL,'
+            ' url TEXT NOT NULL,'
+            ' name TEXT,'
+            ' PRIMARY KEY (chat_id, url))'
+        )
+        # Hasil resolve short link -> identitas produk
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS identities ('
+            ' url TEXT PRIMARY KEY,'
+            ' shop_id TEXT NOT NULL,'
+            ' item_id TEXT NOT NULL)'
+        )
+        # Index pantau toko: item (array item_id, entry) + fingerprint halaman listing
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS shop_index ('
+            ' shop_id TEXT PRIMARY KEY,'
+            ' items BLOB NOT NULL,'
+            ' pages BLOB NOT NULL)'
+        )
+        # Nilai kecil lain, misal offset getUpdates Telegram
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._conn.commit()
+
+    def _allocate(self, key):
+        """Baris kosong baru untuk key"""
+        if self._free:
+            row = self._free.pop()
+            self._available[row] = -1
+            self._fail_count[row] = 0
+            self._price_units[row] = _NO_PRICE
+            self._last_seen[row] = 0.0
+        else:
+            row = len(self._available)
+            self._available.append(-1)
+            self._fail_count.append(0)
+            self._price_units.append(_NO_PRICE)
+            self._last_seen.append(0.0)
+        self._rows[key] = row
+        return row
+
+    def _load(self, key):
+        """Nomor baris status, dibaca dari SQLite saat pertama kali diakses"""
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        record = self._conn.execute(
+            'SELECT is_available, fail_count, last_price, last_seen FROM product_status WHERE key = ?',
+            (key,)
+        ).fetchone()
+        if record is None:
+            self._rows[key] = _MISSING
+            return _MISSING
+        row = self._allocate(key)
+        state = ProductState(self, row)
+        state.is_available = None if record[0] is None else bool(record[0])
+        state.fail_count = record[1]
+        state.last_price = record[2]
+        state.last_seen = record[3]
+        return row
+
+    def __len__(self):
+        """Jumlah status yang sedang dimuat di memori"""
+        return len(self._available) - len(self._free)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._load(key) != _MISSING
+
+    def __getitem__(self, key):
+        with self._lock:
+            row = self._load(key)
+        if row == _MISSING:
+            raise KeyError(key)
+        return ProductState(self, row)
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._load(key)
+        return default if row == _MISSING else ProductState(self, row)
+
+    def add(self, key):
+        """Status kosong baru untuk key (atau yang sudah ada), ditandai berubah"""
+        with self._lock:
+            row = self._load(key)
+            if row == _MISSING:
+                row = self._allocate(key)
+        self.touch(key)
+        return ProductState(self, row)
+
+    def __setitem__(self, key, status):
+        """Isi status dari dict (field yang tidak ada jadi kosong)"""
+        values = status.to_dict() if isinstance(status, ProductState) else status
+        with self._lock:
+            row = self._load(key)
+            if row == _MISSING:
+                row = self._allocate(key)
+            state = ProductState(self, row)
+            state.is_available = values.get('is_available')
+            state.fail_count = values.get('fail_count', 0)
+            state.last_price = values.get('last_price')
+            state.last_seen = values.get('last_seen')
+        self.touch(key)
+
+    def __delitem__(self, key):
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None and row != _MISSING:
+                self._free.append(row)
+            self._rows[key] = _MISSING
+            self._conn.execute('DELETE FROM product_status WHERE key = ?', (key,))
+            self._conn.commit()
+            self._dirty.discard(key)
+
+    def rename(self, old, new):
+        """Pindahkan status ke key baru (migrasi key lama), return True jika dipindah
+
+        Status yang sudah ada di key baru tidak ditimpa.
+        """
+        with self._lock:
+            row = self._load(old)
+            if row == _MISSING or self._load(new) != _MISSING:
+                return False
+            self._rows[new] = row
+            self._dirty.add(new)
+            # Baris dipakai key baru, jadi jangan dibebaskan oleh __delitem__
+            self._rows[old] = _MISSING
+            del self[old]
+            return True
+
+    def touch(self, key):
+        """Tandai status produk berubah (ditulis pada flush berikutnya)"""
+        with self._lock:
+            self._dirty.add(key)
+            if len(self._dirty) >= self.batch_size:
+                self.flush()
+
+    def flush_due(self):
+        """True jika ada perubahan dan sudah lewat flush_interval"""
+        return bool(self._dirty) and time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self, force=True):
+        """Tulis semua status yang berubah dalam satu transaksi
+
+        force=False hanya flush jika sudah lewat flush_interval.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_flush < self.flush_interval:
+                return 0
+            self._last_flush = now
+            if not self._dirty:
+                return 0
+
+            rows = []
+            for key in self._dirty:
+                row = self._rows.get(key, _MISSING)
+                if row == _MISSING:
+                    continue
+                state = ProductState(self, row)
+                is_available = state.is_available
+                rows.append((
+                    key,
+                    None if is_available is None else int(is_available),
+                    state.fail_count,
+                    state.last_price,
+                    state.last_seen,
+                ))
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        'INSERT OR REPLACE INTO product_status'
+                        ' (key, is_available, fail_count, last_price, last_seen)'
+                        ' VALUES (?, ?, ?, ?, ?)',
+                        rows
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"❌ Gagal simpan state: {e}")
+                return 0
+            self._dirty.clear()
+            return len(rows)
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        """Simpan langsung (commit), bukan lewat batch"""
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def watchlist(self):
+        """(dict nama -> url yang ditambah, set nama yang dihapus)"""
+        with self._lock:
+            rows = self._conn.execute('SELECT name, url, removed FROM watchlist').fetchall()
+        added = {name: url for name, url, removed in rows if not removed}
+        removed = {name for name, _, removed in rows if removed}
+        return added, removed
+
+    def watch(self, name, url):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO watchlist (name, url, removed) VALUES (?, ?, 0)', (name, url)
+            )
+
+    def unwatch(self, name):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO watchlist (name, url, removed) VALUES (?, NULL, 1)', (name,)
+            )
+
+    def identities(self):
+        """Dict url -> (shop_id, item_id) hasil resolve short link"""
+        with self._lock:
+            rows = self._conn.execute('SELECT url, shop_id, item_id FROM identities').fetchall()
+        return {url: (shop_id, item_id) for url, shop_id, item_id in rows}
+
+    def set_identity(self, url, shop_id, item_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO identities (url, shop_id, item_id) VALUES (?, ?, ?)',
+                (url, str(shop_id), str(item_id))
+            )
+
+    def shop_index(self, shop_id):
+        """(blob item, blob fingerprint halaman) index toko, None jika belum ada"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT items, pages FROM shop_index WHERE shop_id = ?', (str(shop_id),)
+            ).fetchone()
+        return None if row is None else (bytes(row[0]), bytes(row[1]))
+
+    def save_shop_index(self, shop_id, items, pages):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO shop_index (shop_id, items, pages) VALUES (?, ?, ?)',
+                (str(shop_id), items, pages)
+            )
+
+    def subscriptions(self):
+        """List (chat_id, url, nama) semua langganan"""
+        with self._lock:
+            return self._conn.execute('SELECT chat_id, url, name FROM subscriptions ORDER BY rowid').fetchall()
+
+    def subscribe(self, chat_id, url, name):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO subscriptions (chat_id, url, name) VALUES (?, ?, ?)',
+                (str(chat_id), url, name)
+            )
+
+    def unsubscribe(self, chat_id, url):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'DELETE FROM subscriptions WHERE chat_id = ? AND url = ?', (str(chat_id), url)
+            )
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._conn.close()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Langganan banyak chat ke banyak produk
+
+Produk dicek sekali per siklus berapa pun jumlah pelanggannya; perubahan
+status dikirim ke semua chat lewat inverted index URL produk -> chat.
+"""
+
+import threading
+
+
+class Subscriptions:
+    """Index chat -> {url: nama} dan inverted index key produk -> set(chat)"""
+
+    def __init__(self, store=None, key=None):
+        # StateStore untuk menyimpan langganan (None = hanya di memori)
+        self._store = store
+        # URL -> key index (identitas produk), URL beda untuk item sama = satu produk
+        self._key = key or (lambda url: url)
+        self._by_chat = {}
+        self._by_key = {}
+        # (nama, url) produk dari pelanggan pertama
+        self._names = {}
+        self._lock = threading.Lock()
+        if store is not None:
+            for chat_id, url, name in store.subscriptions():
+                self._add(chat_id, url, name, self._key(url))
+
+    def _add(self, chat_id, url, name, key):
+        """Masukkan ke index (dipanggil dengan lock), key dihitung di luar lock"""
+        chats = self._by_key.setdefault(key, set())
+        first = not chats
+        chats.add(chat_id)
+        self._names.setdefault(key, (name, url))
+        self._by_chat.setdefault(chat_id, {})[url] = name
+        return first
+
+    def subscribe(self, chat_id, url, name, persist=True):
+        """Tambah langganan, return True jika produk ini belum punya pelanggan"""
+        chat_id = str(chat_id)
+        # Key bisa butuh resolve short link (request jaringan): jangan tahan lock,
+        # subscribers() dipanggil dari jalur cek produk
+        key = self._key(url)
+        with self._lock:
+            first = self._add(chat_id, url, name, key)
+        if persist and self._store is not None:
+            self._store.subscribe(chat_id, url, name)
+        return first
+
+    def unsubscribe(self, chat_id, url, persist=True):
+        """Hapus langganan, return True jika produk tidak punya pelanggan lagi"""
+        chat_id = str(chat_id)
+        key = self._key(url)
+        with self._lock:
+            products = self._by_chat.get(chat_id, {})
+            products.pop(url, None)
+            if not products:
+                self._by_chat.pop(chat_id, None)
+            chats = self._by_key.get(key)
+            if chats is not None:
+                chats.discard(chat_id)
+                if not chats:
+                    del self._by_key[key]
+                    self._names.pop(key, None)
+            last = key not in self._by_key
+        if persist and self._store is not None:
+            self._store.unsubscribe(chat_id, url)
+        return last
+
+    def subscribers(self, url):
+        """Chat yang berlangganan produk (tuple, aman dipakai di luar lock)"""
+        key = self._key(url)
+        with self._lock:
+            return tuple(self._by_key.get(key, ()))
+
+    def chat_products(self, chat_id):
+        """Produk milik satu chat: dict url -> nama (urut saat ditambahkan)"""
+        with self._lock:
+            return dict(self._by_chat.get(str(chat_id), {}))
+
+    def find(self, chat_id, url):
+        """URL langganan chat untuk item yang sama dengan `url`, None jika belum berlangganan"""
+        key = self._key(url)
+        with self._lock:
+            if str(chat_id) not in self._by_key.get(key, ()):
+                return None
+            products = list(self._by_chat.get(str(chat_id), {}))
+        for existing in products:
+            if self._key(existing) == key:
+                return existing
+        return None
+
+    def chats(self):
+        """Chat yang punya minimal satu langganan"""
+        with self._lock:
+            return list(self._by_chat)
+
+    def products(self):
+        """Produk unik yang perlu dicek: dict nama -> url (nama dari pelanggan pertama)"""
+        with self._lock:
+            result = {}
+            for name, url in self._names.values():
+                if name in result:
+                    name = f"{name} ({url.rsplit('.', 1)[-1]})"
+                result[name] = url
+            return result
+
+    def __len__(self):
+        """Jumlah langganan (pasangan chat-produk)"""
+        with self._lock:
+            return sum(len(products) for products in self._by_chat.values())
+
+    def product_count(self):
+        with self._lock:
+            return len(self._by_key)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Perintah Telegram (/add, /remove, /list, /status, /interval) lewat getUpdates
+
+Thread long-polling sendiri, jadi pengecekan produk tidak pernah menunggu.
+Perubahan watchlist langsung masuk ke jadwal engine dan disimpan di
+state.db. Offset update disimpan supaya tiap perintah diproses sekali.
+
+Chat pemilik (TELEGRAM_CHAT_ID) boleh semua perintah; chat di
+SUBSCRIBER_CHATS hanya /add, /remove dan /list untuk langganannya sendiri.
+"""
+
+import html
+import logging
+import threading
+import time
+from collections import Counter
+
+from product_identity import canonical_url, is_shopee_url
+
+logger = logging.getLogger(__name__)
+
+# Interval terkecil yang boleh di-set lewat /interval (detik)
+MIN_COMMAND_INTERVAL = 10
+OFFSET_KEY = 'telegram_update_offset'
+
+HELP_TEXT = """🤖 <b>Perintah Bot Shopee Monitor</b>
+
+/add URL [nama] - tambah produk
+/remove nama|nomor - hapus produk
+/list - daftar produk &amp; status
+/status - ringkasan bot (pemilik)
+/interval detik [nama|nomor] - ubah interval cek (pemilik)"""
+
+
+def name_from_url(url):
+    """Nama default dari slug URL: .../Apple-iPhone-15-i.1.2 -> Apple iPhone 15"""
+    path = url.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+    slug = path.split('-i.')[0] if '-i.' in path else ''
+    name = ' '.join(part for part in slug.split('-') if part)
+    return name[:60] or path[:60] or url[:60]
+
+
+class TelegramCommands:
+    """Consumer getUpdates di thread background"""
+
+    def __init__(self, monitor, engine, poll_timeout=None):
+        self.monitor = monitor
+        self.engine = engine
+        config = monitor.config
+        self.url = f"{config.TELEGRAM_API_URL.rstrip('/')}/bot{monitor.telegram_token}/getUpdates"
+        self.poll_timeout = config.TELEGRAM_POLL_TIMEOUT if poll_timeout is None else poll_timeout
+        self.owner_chat = str(config.TELEGRAM_CHAT_ID)
+        self.subscriber_chats = {str(chat) for chat in config.SUBSCRIBER_CHATS}
+        self.max_subscriptions = config.MAX_SUBSCRIPTIONS_PER_CHAT
+        self.offset = int(monitor.product_status.get_meta(OFFSET_KEY, 0))
+        self.started_at = time.time()
+        self.stats = Counter()
+        # Perintah yang hanya boleh dari chat pemilik
+        self.owner_only = {'/status', '/interval'}
+        self.handlers = {
+            '/start': self.cmd_help,
+            '/help': self.cmd_help,
+            '/add': self.cmd_add,
+            '/remove': self.cmd_remove,
+            '/list': self.cmd_list,
+            '/status': self.cmd_status,
+            '/interval': self.cmd_interval,
+        }
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='telegram-commands', daemon=True)
+            self._thread.start()
+            logger.info("💬 Perintah Telegram aktif (/help)")
+
+    def stop(self, timeout=2):
+        """Hentikan thread; long-poll yang sedang jalan dibiarkan habis sendiri (daemon)"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        failures = 0
+        while not self._stopping.is_set():
+            try:
+                self.poll_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.warning(f"⚠️ getUpdates error: {e}")
+                # Backoff 2, 4, 8 ... detik (maks 60)
+                self._stopping.wait(min(60, 2 ** failures))
+
+    def poll_once(self):
+        """Satu long-poll getUpdates, return jumlah update yang diproses"""
+        response = self.monitor.http.get(
+            'telegram_updates', self.url,
+            params={'offset': self.offset, 'timeout': self.poll_timeout, 'allowed_updates': '["message"]'},
+            timeout=self.poll_timeout + 10
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        data = response.json()
+        if not data.get('ok'):
+            raise RuntimeError(data.get('description', 'getUpdates gagal'))
+
+        updates = sorted(data.get('result', []), key=lambda update: update['update_id'])
+        for update in updates:
+            if update['update_id'] < self.offset:
+                continue
+            try:
+                self.handle_update(update)
+            except Exception as e:
+                logger.error(f"❌ Error proses perintah: {e}")
+            # Offset disimpan per update: restart tidak memproses perintah yang sama lagi
+            self.offset = update['update_id'] + 1
+            self.monitor.product_status.set_meta(OFFSET_KEY, self.offset)
+        return len(updates)
+
+    def handle_update(self, update):
+        message = update.get('message') or {}
+        text = (message.get('text') or '').strip()
+        chat_id = str(message.get('chat', {}).get('id', ''))
+        if not text.startswith('/'):
+            return
+        if not self.allowed(chat_id):
+            self.stats['rejected'] += 1
+            logger.warning(f"⚠️ Perintah dari chat {chat_id} ditolak")
+            return
+
+        parts = text.split()
+        command = parts[0].split('@')[0].lower()
+        handler = self.handlers.get(command)
+        if handler is None:
+            reply = f"❓ Perintah tidak dikenal: {html.escape(command)}\n\n{HELP_TEXT}"
+        elif command in self.owner_only and chat_id != self.owner_chat:
+            self.stats['rejected'] += 1
+            reply = "⛔ Perintah ini hanya untuk pemilik bot"
+        else:
+            self.stats[command] += 1
+            reply = handler(chat_id, parts[1:])
+        logger.info(f"💬 Perintah {command} diproses")
+        self.monitor.outbox.send(chat_id, reply)
+
+    def allowed(self, chat_id):
+        return (
+            chat_id == self.owner_chat
+            or chat_id in self.subscriber_chats
+            or '*' in self.subscriber_chats
+        )
+
+    def _product_name(self, url):
+        """Nama produk di engine untuk item yang sama dengan URL (None jika belum dicek)"""
+        key = self.monitor.identities.key(url)
+        for name, existing in list(self.monitor.products.items()):
+            if self.monitor.identities.key(existing) == key:
+                return name
+        return None
+
+    def _status(self, url):
+        return self.monitor.product_status.get(self.monitor.identities.key(url)) or {}
+
+    def _find_subscription(self, chat_id, query):
+        """(url, nama) langganan chat dari nomor /list, nama (tidak case sensitive) atau URL"""
+        products = list(self.monitor.subscriptions.chat_products(chat_id).items())
+        if query.isdigit() and 1 <= int(query) <= len(products):
+            return products[int(query) - 1]
+        for url, name in products:
+            if query == url or query.lower() == name.lower():
+                return url, name
+        return None, None
+
+    def _find_product(self, chat_id, query):
+        url, _ = self._find_subscription(chat_id, query)
+        return self._product_name(url) if url else None
+
+    def cmd_help(self, chat_id, args):
+        return HELP_TEXT
+
+    def cmd_add(self, chat_id, args):
+        if not args:
+            return "⚠️ Format: /add URL [nama]"
+        if not is_shopee_url(args[0], self.monitor.base_url, self.monitor.identities.short_hosts):
+            return "❌ Hanya URL produk Shopee (shopee.co.id / shp.ee) yang bisa ditambahkan"
+        shop_id, item_id = self.monitor.extract_product_ids(args[0])
+        if not (shop_id and item_id):
+            return "❌ URL produk Shopee tidak dikenali"
+        # Yang disimpan dan di-fetch hanya URL kanonik, bukan teks dari chat
+        url = canonical_url(self.monitor.base_url, shop_id, item_id)
+        mine = self.monitor.subscriptions.chat_products(chat_id)
+        existing = self.monitor.subscriptions.find(chat_id, url)
+        if existing is not None:
+            return f"ℹ️ Sudah dimonitor sebagai <b>{html.escape(mine[existing])}</b>"
+        if chat_id != self.owner_chat and len(mine) >= self.max_subscriptions:
+            return f"⚠️ Maksimal {self.max_subscriptions} produk per chat"
+
+        name = ' '.join(args[1:]) or name_from_url(args[0])
+        is_owner = chat_id == self.owner_chat
+        self.monitor.subscriptions.subscribe(chat_id, url, name, persist=not is_owner)
+        if is_owner:
+            self.monitor.product_status.watch(name, url)
+        # Produk yang sudah dicek untuk chat lain tidak di-fetch dua kali
+        if self._product_name(url) is None:
+            engine_name = name
+            if engine_name in self.monitor.products:
+                engine_name = f"{name} ({item_id})"
+            self.engine.add_product(engine_name, url)
+        return f"✅ Ditambahkan: <b>{html.escape(name)}</b>\n📋 Total {len(mine) + 1} produk"
+
+    def cmd_remove(self, chat_id, args):
+        if not args:
+            return "⚠️ Format: /remove nama|nomor"
+        url, name = self._find_subscription(chat_id, ' '.join(args))
+        if url is None:
+            return "❌ Produk tidak ditemukan, cek /list"
+        is_owner = chat_id == self.owner_chat
+        last = self.monitor.subscriptions.unsubscribe(chat_id, url, persist=not is_owner)
+        if is_owner:
+            self.monitor.product_status.unwatch(name)
+        if last:
+            # Tidak ada chat lain yang berlangganan: berhenti cek produk ini
+            engine_name = self._product_name(url)
+            if engine_name is not None:
+                self.engine.remove_product(engine_name)
+            self.monitor.rules.forget(self.monitor.identities.key(url))
+        remaining = len(self.monitor.subscriptions.chat_products(chat_id))
+        return f"🗑️ Dihapus: <b>{html.escape(name)}</b>\n📋 Sisa {remaining} produk"
+
+    def cmd_list(self, chat_id, args):
+        products = self.monitor.subscriptions.chat_products(chat_id)
+        if not products:
+            return "📋 Belum ada produk. Tambah dengan /add URL"
+        lines = [f"📋 <b>{len(products)} produk dimonitor</b>\n"]
+        for number, (url, name) in enumerate(products.items(), 1):
+            status = self._status(url)
+            if 'is_available' not in status:
+                state = '⏳ belum dicek'
+            else:
+                state = 'READY ✅' if status['is_available'] else 'HABIS ❌'
+            lines.append(f"{number}. {html.escape(name)} - {state}")
+        return '\n'.join(lines)
+
+    def cmd_status(self, chat_id, args):
+        products = list(self.monitor.products.values())
+        ready = sum(
+            1 for url in products
+            if self._status(url).get('is_available')
+        )
+        uptime = int(time.time() - self.started_at)
+        return (
+            f"📊 <b>Status Bot</b>\n\n"
+            f"📋 Produk: {len(products)} ({ready} ready)\n"
+            f"👥 Langganan: {len(self.monitor.subscriptions)} dari "
+            f"{len(self.monitor.subscriptions.chats())} chat\n"
+            f"⏱️ Interval: {self.monitor.check_interval} detik\n"
+            f"🔄 Urutan metode: {' → '.join(self.monitor.health.order())}\n"
+            f"📨 Antrian Telegram: {self.monitor.outbox.pending_count()} pesan\n"
+            f"⏰ Aktif: {uptime // 3600} jam {uptime % 3600 // 60} menit"
+        )
+
+    def cmd_interval(self, chat_id, args):
+        if not args:
+            return f"⏱️ Interval sekarang {self.monitor.check_interval} detik\nFormat: /interval detik [nama|nomor]"
+        try:
+            seconds = int(args[0])
+        except ValueError:
+            return "⚠️ Interval harus angka (detik)"
+        if seconds < MIN_COMMAND_INTERVAL:
+            return f"⚠️ Interval minimal {MIN_COMMAND_INTERVAL} detik"
+
+        if len(args) > 1:
+            name = self._find_product(chat_id, ' '.join(args[1:]))
+            if name is None:
+                return "❌ Produk tidak ditemukan, cek /list"
+            self.engine.set_interval(seconds, name)
+            return f"⏱️ <b>{html.escape(name)}</b> dicek tiap {seconds} detik"
+        self.engine.set_interval(seconds)
+        return f"⏱️ Interval semua produk: {seconds} detik"
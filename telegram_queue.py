@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Antrian pesan keluar Telegram - dikirim di thread background
+
+Polling produk tidak pernah menunggu Telegram. Pesan yang datang
+berdekatan untuk chat yang sama digabung jadi satu digest, laju kirim
+dibatasi token bucket dan retry_after dari Telegram dihormati. Pesan
+urgent (restock mode burst) tidak ditahan window digest.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Batas panjang satu pesan Telegram
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = "\n➖➖➖➖➖➖➖➖➖➖\n"
+
+
+class TelegramOutbox:
+    """Thread pengirim pesan Telegram dengan rate limit, retry dan digest"""
+
+    def __init__(self, http, token, config, metrics=None):
+        self.http = http
+        self.metrics = metrics
+        self.url = f"{config.TELEGRAM_API_URL.rstrip('/')}/bot{token}/sendMessage"
+        self.digest_window = config.TELEGRAM_DIGEST_WINDOW
+        self.max_retries = config.TELEGRAM_MAX_RETRIES
+        self.per_chat_rate = config.TELEGRAM_RATE_PER_CHAT
+        self._global_bucket = TokenBucket(config.TELEGRAM_RATE_GLOBAL)
+        self._chat_buckets = {}
+
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._blocked_until = {}
+        self._attempts = Counter()
+        self._closing = False
+        self._thread = None
+        self.stats = Counter()
+        # Callback (key, detected_at, sent_at) tiap notif perubahan terkirim (laporan mode burst)
+        self.delivery_listeners = []
+
+    def send(self, chat_id, text, detected_at=None, key=None, urgent=False):
+        """Masukkan pesan ke antrian (tidak blocking)
+
+        detected_at (time.time()) = saat perubahan status terdeteksi, untuk
+        histogram detection lag ketika pesan terkirim. key = identitas produk
+        (diteruskan ke delivery_listeners), urgent = kirim tanpa menunggu
+        digest_window (rate limit tetap berlaku).
+        """
+        with self._cond:
+            if self._closing:
+                logger.warning("⚠️ Outbox sudah ditutup, pesan dibuang")
+                return False
+            self._pending.setdefault(chat_id, deque()).append((text, time.monotonic(), detected_at, key, urgent))
+            self.stats['queued'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='telegram-outbox', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return True
+
+    def pending_count(self):
+        with self._cond:
+            return sum(len(messages) for messages in self._pending.values())
+
+    def _chat_bucket(self, chat_id):
+        if chat_id not in self._chat_buckets:
+            self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, capacity=1)
+        return self._chat_buckets[chat_id]
+
+    def _next_job(self, now):
+        """Pilih chat yang siap dikirim, return (job, detik tunggu)"""
+        wait = None
+        for chat_id, messages in self._pending.items():
+            if not messages:
+                continue
+            ready = self._blocked_until.get(chat_id, 0)
+            if not self._closing and not any(message[4] for message in messages):
+                # Tunggu sebentar supaya pesan berdekatan bisa digabung
+                ready = max(ready, messages[0][1] + self.digest_window)
+            ready = max(ready, now + self._chat_bucket(chat_id).wait_time(now=now))
+            ready = max(ready, now + self._global_bucket.wait_time(now=now))
+            if ready > now:
+                wait = ready - now if wait is None else min(wait, ready - now)
+                continue
+            if not (self._chat_bucket(chat_id).try_take(now=now) and self._global_bucket.try_take(now=now)):
+                continue
+            return (chat_id, self._take_digest(messages)), 0
+        return None, wait
+
+    def _take_digest(self, messages):
+        """Ambil pesan dari depan antrian sebanyak muat dalam satu pesan"""
+        taken = [messages.popleft()]
+        length = len(taken[0][0])
+        while messages and length + len(DIGEST_SEPARATOR) + len(messages[0][0]) <= MAX_MESSAGE_LENGTH:
+            text = messages.popleft()
+            length += len(DIGEST_SEPARATOR) + len(text[0])
+            taken.append(text)
+        return taken
+
+    def _deliver(self, chat_id, text):
+        """Kirim ke Telegram, return ('ok'|'throttled'|'retry'|'drop', retry_after)"""
+        data = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "HTML",
+            "disable_web_page_preview": False
+        }
+        try:
+            response = self.http.post('telegram', self.url, data=data, timeout=10)
+        except Exception as e:
+            logger.error(f"❌ Error Telegram: {e}")
+            return 'retry', None
+
+        if response.status_code == 200:
+            return 'ok', None
+        if response.status_code == 429:
+            try:
+                retry_after = response.json().get('parameters', {}).get('retry_after', 5)
+            except ValueError:
+                retry_after = 5
+            logger.warning(f"⚠️ Telegram rate limit, tunggu {retry_after} detik")
+            return 'throttled', float(retry_after)
+        if response.status_code >= 500:
+            logger.error(f"❌ Telegram error {response.status_code}, akan dicoba lagi")
+            return 'retry', None
+        logger.error(f"❌ Gagal kirim: {response.text}")
+        return 'drop', None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job, wait = self._next_job(time.monotonic())
+                if job is None:
+                    if self._closing and not any(self._pending.values()):
+                        return
+                    self._cond.wait(min(wait, 60.0) if wait is not None else 1.0)
+                    continue
+
+            chat_id, taken = job
+            text = DIGEST_SEPARATOR.join(message[0] for message in taken)
+            result, retry_after = self._deliver(chat_id, text)
+            now = time.monotonic()
+
+            with self._cond:
+                if result == 'ok':
+                    self._attempts[chat_id] = 0
+                    self.stats['sent'] += 1
+                    self.stats['merged'] += len(taken) - 1
+                    sent_at = time.time()
+                    for _, _, detected_at, key, _ in taken:
+                        if detected_at is None:
+                            continue
+                        # Error di metric/listener tidak boleh menghentikan thread pengirim
+                        try:
+                            if self.metrics is not None:
+                                self.metrics.detection_lag.observe(max(0.0, sent_at - detected_at))
+                        except Exception:
+                            logger.exception("❌ Gagal catat detection lag")
+                        for listener in list(self.delivery_listeners):
+                            try:
+                                listener(key, detected_at, sent_at)
+                            except Exception:
+                                logger.exception("❌ Listener notif terkirim error")
+                    if len(taken) > 1:
+                        logger.info(f"✅ Digest {len(taken)} pesan terkirim ke Telegram")
+                    else:
+                        logger.info("✅ Pesan terkirim ke Telegram")
+                elif result == 'drop':
+                    self.stats['dropped'] += len(taken)
+                else:
+                    if result == 'throttled':
+                        self.stats['throttled'] += 1
+                        self._blocked_until[chat_id] = now + retry_after
+                    else:
+                        self._attempts[chat_id] += 1
+                        if self._attempts[chat_id] > self.max_retries:
+                            logger.error(f"❌ Pesan dibuang setelah {self.max_retries}x retry")
+                            self.stats['dropped'] += len(taken)
+                            self._attempts[chat_id] = 0
+                            continue
+                        self.stats['retried'] += 1
+                        # Exponential backoff: 2, 4, 8, ... detik (maks 60)
+                        self._blocked_until[chat_id] = now + min(60, 2 ** self._attempts[chat_id])
+                    # Kembalikan ke depan antrian, urutan tetap
+                    self._pending[chat_id].extendleft(reversed(taken))
+
+    def close(self, timeout=15):
+        """Kirim sisa antrian lalu hentikan thread (maksimal timeout detik)"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.warning(f"⚠️ {self.pending_count()} pesan belum terkirim saat bot berhenti")
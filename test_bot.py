@@ -3,9 +3,34 @@
 
 """Test Bot Telegram dan Shopee Scraping"""
 
+import asyncio
+import multiprocessing
+import threading
+import time
 import requests
 from config import Config
 from bot_reliable import ShopeeMonitorReliable
+from async_engine import AsyncPollingEngine
+from fake_server import FakeShopeeServer, FakeTelegramServer, FakeWebhookServer
+from scheduler import AdaptiveScheduler
+from state_store import StateStore
+from method_health import MethodHealth
+from http_pool import HttpPool
+from telegram_queue import TelegramOutbox
+from sharding import ShardCoordinator, _forward_deliveries, split_products
+import fast_extract
+import benchmark
+from metrics import Metrics, MetricsServer
+from rules import RuleEngine
+from history_store import HistoryStore, HEADER, RECORD
+from telegram_commands import TelegramCommands
+from subscriptions import Subscriptions
+from product_identity import ProductIdentities, is_short_link, parse_ids
+from egress import EgressUnavailable
+from product_record import Method, ProductSnapshot, to_units
+from shop_watch import parse_shop_id
+from notifiers import MessageRenderer, Notifiers
+from burst import BurstMode, BurstWindow, parse_windows
 
 def test_telegram():
     """Test koneksi Telegram"""
@@ -97,6 +122,1493 @@ def test_shopee():
         return False
 
 
+def offline_monitor(server):
+    """Monitor yang diarahkan ke server Shopee lokal"""
+    monitor = ShopeeMonitorReliable(state_path=':memory:')
+    monitor.base_url = server.base_url
+    monitor.config.POLITE_DELAY_MIN = 0
+    monitor.config.POLITE_DELAY_MAX = 0
+    monitor.config.METHOD_RETRY_DELAY = 0
+    monitor.send_telegram_message = lambda message, detected_at=None, **kwargs: True
+    monitor.history = None
+    return monitor
+
+
+def test_batch_fake_server():
+    """Test batch lookup API v4 dengan server Shopee lokal"""
+    server = FakeShopeeServer()
+    server.start()
+    try:
+        server.add_item(1, 101, name='Produk A', price=15000, stock=5)
+        server.add_item(1, 102, name='Produk B', price=20000, stock=0)
+        server.add_item(2, 201, name='Produk C', price=30000, stock=2)
+        server.add_item(2, 202, name='Produk D', price=40000, stock=1)
+        # Produk D tidak ada di response batch -> harus fallback per item
+        server.batch_skip.add((2, 202))
+        
+        monitor = offline_monitor(server)
+        products = {
+            'A': server.product_url(1, 101),
+            'B': server.product_url(1, 102),
+            'C': server.product_url(2, 201),
+            'D': server.product_url(2, 202),
+        }
+        
+        chunks = monitor.batch_chunks(products.values())
+        assert len(chunks) == 1
+        
+        results = monitor.method_1_batch(chunks[0])
+        assert set(results) == {products['A'], products['B'], products['C']}
+        assert results[products['A']]['price'] == 15000
+        assert results[products['A']]['is_available'] is True
+        assert results[products['B']]['is_available'] is False
+        assert results[products['C']]['url'] == products['C']
+        
+        server.hits.clear()
+        engine = AsyncPollingEngine(monitor)
+        asyncio.run(engine.sweep(products))
+        engine.close()
+        
+        assert server.hits['/api/v4/item/get_list'] == 1
+        assert server.hits['/api/v4/item/get'] == 1
+        assert monitor.product_status[monitor.identities.key(products['D'])]['is_available'] is True
+        assert monitor.product_status[monitor.identities.key(products['B'])]['is_available'] is False
+    finally:
+        server.stop()
+
+
+def test_bounded_concurrency():
+    """Test sweep paralel: konkurensi dibatasi MAX_CONCURRENCY, engine tetap jalan di event loop baru"""
+    server = FakeShopeeServer()
+    server.start()
+    server.configure(latency=0.2)
+    try:
+        products = {}
+        for item_id in range(101, 109):
+            server.add_item(1, item_id, name=f'Produk {item_id}', stock=1)
+            products[f'P{item_id}'] = server.product_url(1, item_id)
+        with benchmark.config_overrides(
+            SHOPEE_BASE_URL=server.base_url, HISTORY_DIR='', BATCH_FETCH=False,
+            MAX_CONCURRENCY=4, PER_HOST_CONCURRENCY=4, POLITE_DELAY_MIN=0, POLITE_DELAY_MAX=0,
+        ):
+            monitor = ShopeeMonitorReliable(state_path=':memory:', products=products)
+            monitor.send_telegram_message = lambda message, detected_at=None, **kwargs: True
+            engine = AsyncPollingEngine(monitor)
+            
+            # 8 produk x 0.2 detik: berurutan 1.6 detik, 4 paralel ~0.4 detik
+            elapsed = asyncio.run(engine.sweep())
+            assert server.hits['/api/v4/item/get'] == 8
+            assert server.max_in_flight == 4
+            assert elapsed < 1.0
+            
+            # asyncio.run kedua (jalur recovery start_monitoring) dengan engine yang sama
+            server.max_in_flight = 0
+            elapsed = asyncio.run(engine.sweep())
+            assert server.hits['/api/v4/item/get'] == 16
+            assert monitor.metrics.checks.labels('failed').value == 0
+            assert server.max_in_flight == 4 and elapsed < 1.0
+            engine.close()
+            monitor.shutdown()
+    finally:
+        server.stop()
+
+def test_adaptive_scheduler():
+    """Test produk yang berubah dijadwalkan lebih sering dari produk stabil"""
+    config = Config()
+    config.CHECK_INTERVAL = 100
+    config.MIN_CHECK_INTERVAL = 20
+    config.MAX_CHECK_INTERVAL = 400
+    config.PRODUCT_OPTIONS = {'vip': {'priority': 2}}
+    scheduler = AdaptiveScheduler(config)
+    
+    scheduler.add('hot', 'url-hot', due=0)
+    scheduler.add('cold', 'url-cold', due=0)
+    scheduler.add('vip', 'url-vip', due=1000)
+    assert scheduler.intervals()['vip'] == 50
+    
+    now = 0
+    for i in range(6):
+        for name, _ in scheduler.pop_due(now=now + 1000):
+            available = i % 2 == 0 if name == 'hot' else True
+            info = ProductSnapshot(name, 100000, 100000, 100000, 1, 0, 'Toko', available, Method.API_V4)
+            scheduler.report(name, info, now=now)
+        now += 1000
+    
+    intervals = scheduler.intervals()
+    assert intervals['hot'] == 20
+    assert intervals['cold'] == 400
+    assert intervals['vip'] == 200
+    
+    assert scheduler.remove('cold')
+    assert all(name != 'cold' for name, _ in scheduler.pop_due(now=10 ** 9))
+
+
+def test_scheduler_slow_batch():
+    """Test batch yang lambat tidak menahan loop scheduler: produk baru tetap langsung dikirim"""
+    server = FakeShopeeServer()
+    server.start()
+    server.path_latency['/api/v4/item/get_list'] = 1.5
+    try:
+        server.add_item(1, 101, name='Produk A', stock=1)
+        server.add_item(1, 102, name='Produk B', stock=1)
+        with benchmark.config_overrides(
+            SHOPEE_BASE_URL=server.base_url, HISTORY_DIR='', BATCH_FETCH=True,
+            POLITE_DELAY_MIN=0, POLITE_DELAY_MAX=0, CHECK_INTERVAL=60,
+        ):
+            monitor = ShopeeMonitorReliable(state_path=':memory:', products={'A': server.product_url(1, 101)})
+            monitor.send_telegram_message = lambda message, detected_at=None, **kwargs: True
+            engine = AsyncPollingEngine(monitor)
+            
+            async def scenario():
+                task = asyncio.create_task(engine.run_scheduled())
+                await asyncio.sleep(0.2)
+                # Batch pertama masih jalan (1.5 detik): produk baru harus tetap dikirim
+                engine.add_product('B', server.product_url(1, 102))
+                deadline = time.monotonic() + 0.6
+                while server.hits['/api/v4/item/get_list'] < 2 and time.monotonic() < deadline:
+                    await asyncio.sleep(0.02)
+                dispatched = server.hits['/api/v4/item/get_list']
+                while monitor.metrics.checks.labels('new').value < 2 and time.monotonic() < deadline + 3:
+                    await asyncio.sleep(0.02)
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return dispatched
+            
+            assert asyncio.run(scenario()) == 2
+            assert monitor.metrics.checks.labels('new').value == 2
+            assert monitor.product_status['1.102']['is_available'] is True
+            engine.close()
+            monitor.shutdown()
+    finally:
+        server.stop()
+
+def test_fixed_rate_scheduler():
+    """Test mode fixed: interval efektif tetap CHECK_INTERVAL walau cek lambat"""
+    config = Config()
+    config.CHECK_INTERVAL = 60
+    config.SCHEDULE_MODE = 'fixed'
+    config.SCHEDULE_JITTER = 0
+    config.PRODUCT_OPTIONS = {}
+    metrics = Metrics()
+    scheduler = AdaptiveScheduler(config, metrics)
+    for name in ('a', 'b', 'c'):
+        scheduler.add(name, f'url-{name}', due=0)
+    assert len(scheduler.pop_due(now=0)) == 3
+    for name in ('a', 'b', 'c'):
+        scheduler.report(name, None, now=5)
+    # Deadline kedua disebar dalam satu interval, tidak serentak
+    deadlines = sorted(scheduler._entries[name]['deadline'] for name in ('a', 'b', 'c'))
+    assert len(set(deadlines)) == 3 and 5 < deadlines[0] and deadlines[-1] <= 65
+    
+    # Cek makan 20 detik, jarak antar cek tetap 60 detik (tidak 60 + 20)
+    starts = []
+    now = 0
+    while len(starts) < 5:
+        now = min(entry['due'] for entry in scheduler._entries.values() if entry['due'] is not None)
+        for name, _ in scheduler.pop_due(now=now):
+            if name == 'a':
+                starts.append(now)
+            scheduler.report(name, None, now=now + 20)
+    assert [round(b - a, 6) for a, b in zip(starts, starts[1:])] == [60, 60, 60, 60]
+    assert scheduler.misses() == {}
+    
+    # Cek 130 detik melewati 2 deadline, mulai telat 10 detik = 1 miss
+    deadline = scheduler._entries['a']['deadline']
+    assert ('a', 'url-a') in scheduler.pop_due(now=deadline + 10)
+    scheduler.report('a', None, now=deadline + 130)
+    assert scheduler.misses()['a'] == 3
+    assert round(scheduler._entries['a']['deadline'] - deadline, 6) == 180
+    assert metrics.deadline_misses.labels().value == sum(scheduler.misses().values())
+    assert 'shopee_schedule_lag_seconds_count' in metrics.render()
+
+
+SAMPLE_PAGES = [
+    # JSON-LD Product setelah JSON-LD lain dan JSON rusak
+    """<html><head><meta property="og:title" content="Meta Title">
+<script type="application/ld+json">{"@type": "Organization", "name": "Shopee"}</script>
+<script type="application/ld+json">{rusak</script>
+<script type="application/ld+json">{"@type": "Product", "name": "Kaos Polos",
+ "brand": {"name": "Toko Kaos"}, "offers": {"price": "45000", "lowPrice": "40000",
+ "highPrice": "50000", "availability": "http://schema.org/InStock"}}</script>
+</head><body>Stok habis</body></html>""",
+    # Tanpa JSON-LD: meta tag + kata kunci (terpotong antar chunk)
+    """<html><head><meta property="og:title" content="Sepatu Lari">
+<meta property="product:price:amount" content="250000"></head>
+<body><button>Beli Sekarang</button></body></html>""",
+    # Tanpa JSON-LD dan ada kata 'habis'
+    """<html><head><meta property="og:title" content="Tas"></head>
+<body><button>Tambah ke keranjang</button><span>SOLD OUT</span></body></html>""",
+    # Halaman kosong
+    "",
+]
+
+
+def test_fast_html_extractor():
+    """Test fast path lxml menghasilkan product_info yang sama dengan BeautifulSoup"""
+    if not fast_extract.available():
+        print("   ⚠️ lxml tidak ada, fast path dilewati")
+        return
+    
+    monitor = ShopeeMonitorReliable(state_path=':memory:')
+    for html in SAMPLE_PAGES:
+        expected = monitor.parse_html_bs(html)
+        body = html.encode('utf-8')
+        for size in (7, 64, len(body) or 1):
+            chunks = (body[i:i + size] for i in range(0, len(body), size))
+            assert fast_extract.extract_product_info(chunks, encoding='utf-8') == expected
+    
+    assert monitor.parse_html_bs(SAMPLE_PAGES[0])['price_min'] == 40000
+    assert monitor.parse_html_bs(SAMPLE_PAGES[1])['is_available'] is True
+    assert monitor.parse_html_bs(SAMPLE_PAGES[2])['is_available'] is False
+
+
+def test_state_store_restart():
+    """Test status produk tetap ada setelah restart (state.db dibuka ulang)"""
+    import os
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'state.db')
+        store = StateStore(path, batch_size=2)
+        store['a'] = {'is_available': False, 'fail_count': 0, 'last_price': 1500.0}
+        store['b'] = {'fail_count': 2}
+        store['c'] = {'is_available': True, 'fail_count': 0}
+        store['c']['is_available'] = False
+        store.touch('c')
+        store.close()
+        
+        store = StateStore(path)
+        assert store['a'] == {'is_available': False, 'fail_count': 0, 'last_price': 1500.0}
+        assert store['b'] == {'fail_count': 2}
+        assert store['c']['is_available'] is False
+        assert 'd' not in store
+        store.close()
+
+
+def test_method_health_reorder():
+    """Test API v4 yang diblokir dilewati dan API v2 dipakai duluan"""
+    server = FakeShopeeServer()
+    server.start()
+    try:
+        server.add_item(1, 101, stock=3)
+        server.blocked_paths.add('/api/v4/item/get')
+        monitor = offline_monitor(server)
+        url = server.product_url(1, 101)
+        
+        for _ in range(5):
+            assert monitor.get_product_info(url)['method'] == 'API v2'
+        # Setelah gagal sekali, API v2 langsung jadi metode pertama
+        assert server.hits['/api/v4/item/get'] == 1
+        assert monitor.health.order()[0] == 'api_v2'
+        
+        server.hits.clear()
+        assert monitor.get_product_info(url)['method'] == 'API v2'
+        assert server.hits['/api/v4/item/get'] == 0
+        assert sum(server.hits.values()) == 1
+    finally:
+        server.stop()
+    
+    # Circuit breaker: open setelah gagal beruntun, probe half-open setelah cooldown
+    health = MethodHealth(['api_v4', 'html'], cooldown=60)
+    for _ in range(5):
+        health.record('api_v4', False, 1.0, now=0)
+    assert not health.allow('api_v4', now=30)
+    assert health.order() == ['html', 'api_v4']
+    assert health.allow('api_v4', now=61)
+    assert not health.allow('api_v4', now=61)
+    health.record('api_v4', True, 0.2, now=62)
+    assert health.snapshot()['api_v4']['state'] == 'closed'
+
+
+def test_http_pool_reuse():
+    """Test pool keep-alive: request berikutnya pakai ulang koneksi, koneksi idle lama diganti"""
+    server = FakeShopeeServer()
+    server.start()
+    try:
+        server.add_item(1, 101, stock=1)
+        config = Config()
+        config.HTTP_IDLE_TIMEOUT = 0.3
+        pool = HttpPool(config)
+        url = f"{server.base_url}/api/v4/item/get?itemid=101&shopid=1"
+        for _ in range(5):
+            assert pool.get('shopee', url, timeout=5).status_code == 200
+        stats = pool.stats()['shopee']
+        assert stats == {'requests': 5, 'new_connections': 1, 'reused': 4}
+        assert server.connections == 1
+        
+        # Idle lebih lama dari HTTP_IDLE_TIMEOUT: session lama ditutup, koneksi baru dibuka
+        time.sleep(0.5)
+        assert pool.get('shopee', url, timeout=5).status_code == 200
+        assert pool.stats()['shopee'] == {'requests': 6, 'new_connections': 2, 'reused': 4}
+        assert server.connections == 2
+        pool.close()
+    finally:
+        server.stop()
+
+def test_telegram_outbox():
+    """Test antrian Telegram: tidak blocking, digest per chat, hormati retry_after"""
+    telegram = FakeTelegramServer()
+    telegram.start()
+    try:
+        config = Config()
+        config.TELEGRAM_API_URL = telegram.base_url
+        config.TELEGRAM_DIGEST_WINDOW = 0.3
+        outbox = TelegramOutbox(HttpPool(config), telegram.token, config)
+        telegram.throttle_next = 1
+        
+        started = time.monotonic()
+        for i in range(3):
+            outbox.send('111', f'Produk {i} READY')
+        outbox.send('222', 'Produk lain READY')
+        assert time.monotonic() - started < 0.1
+        
+        outbox.close(timeout=10)
+        assert outbox.pending_count() == 0
+        assert outbox.stats['throttled'] == 1
+        assert outbox.stats['merged'] == 2
+        assert sorted(chat for chat, _ in telegram.messages) == ['111', '222']
+        digest = dict(telegram.messages)['111']
+        assert all(f'Produk {i} READY' in digest for i in range(3))
+        
+        # Listener yang error tidak mematikan thread pengirim
+        config.TELEGRAM_DIGEST_WINDOW = 0
+        outbox = TelegramOutbox(HttpPool(config), telegram.token, config)
+        outbox.delivery_listeners.append(lambda key, detected_at, sent_at: 1 / 0)
+        outbox.send('333', 'restock 1', detected_at=time.time())
+        deadline = time.monotonic() + 5
+        while outbox.stats['sent'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        outbox.send('333', 'restock 2', detected_at=time.time())
+        outbox.close(timeout=10)
+        assert outbox.stats['sent'] == 2 and outbox.pending_count() == 0
+    finally:
+        telegram.stop()
+
+
+def test_response_cache():
+    """Test halaman tidak berubah dijawab 304/fingerprint tanpa parsing ulang"""
+    server = FakeShopeeServer()
+    server.start()
+    try:
+        server.add_item(1, 101, name='Produk A', stock=3)
+        page_url = server.add_page(1, 102, SAMPLE_PAGES[0])
+        monitor = offline_monitor(server)
+        
+        first = monitor.method_2_html_scraping(page_url)
+        second = monitor.method_2_html_scraping(page_url)
+        assert first == second
+        assert monitor.response_cache.stats['hit_304'] == 1
+        
+        # Tanpa ETag: isi JSON-LD sama -> pakai hasil parsing sebelumnya
+        server.use_etag = False
+        assert monitor.method_2_html_scraping(page_url) == first
+        assert monitor.response_cache.stats['hit_fingerprint'] == 1
+        
+        # API v4: payload sama persis -> tidak di-parse ulang
+        assert monitor.method_1_api_v4('1', '101') == monitor.method_1_api_v4('1', '101')
+        assert monitor.response_cache.stats['hit_fingerprint'] == 2
+        
+        # Payload berubah -> hasil baru
+        server.add_item(1, 101, name='Produk A', stock=0)
+        assert monitor.method_1_api_v4('1', '101')['is_available'] is False
+    finally:
+        server.stop()
+
+
+def test_sharded_workers():
+    """Test mode sharding: produk terbagi rata, restock dikirim tepat sekali, state bersama"""
+    import os
+    import tempfile
+    
+    products = {f'Produk {i}': f'https://shopee.co.id/Produk-{i}-i.{i % 3}.{1000 + i}' for i in range(60)}
+    shards = split_products(products, 4)
+    assert sum(len(shard) for shard in shards) == len(products)
+    assert split_products(products, 4) == shards
+    assert all(shard for shard in shards)
+    
+    def wait_state(path, keys, check, timeout=15):
+        """Tunggu sampai status semua key di state.db memenuhi check (dibaca koneksi baru)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            store = StateStore(path)
+            try:
+                states = [store.get(key) for key in keys]
+            finally:
+                store.close()
+            if all(state is not None and check(state) for state in states):
+                return True
+            time.sleep(0.1)
+        return False
+    
+    def wait_workers(coordinator, timeout=10):
+        """Tunggu semua worker di-fork dulu: koneksi SQLite yang terbuka saat fork
+        membuat proses anak menunggu lock yang tidak pernah dilepas"""
+        expected = sum(1 for shard in coordinator.shards if shard)
+        deadline = time.monotonic() + timeout
+        while len(coordinator.processes) < expected and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert len(coordinator.processes) == expected
+    
+    def wait_messages(text, count, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if '\n'.join(message for _, message in telegram.messages).count(text) >= count:
+                return True
+            time.sleep(0.1)
+        return False
+    
+    shopee = FakeShopeeServer()
+    telegram = FakeTelegramServer()
+    shopee.start()
+    telegram.start()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, 'state.db')
+        overrides = {
+            'SHOPEE_BASE_URL': shopee.base_url,
+            'TELEGRAM_API_URL': telegram.base_url,
+            'TELEGRAM_BOT_TOKEN': telegram.token,
+            'TELEGRAM_CHAT_ID': '999',
+            'TELEGRAM_DIGEST_WINDOW': 0.1,
+            'STATE_DB': state_path,
+            'STATE_FLUSH_INTERVAL': 0.1,
+            'HISTORY_DIR': '',
+            'SCHEDULE_MODE': 'sweep',
+            'CHECK_INTERVAL': 0.2,
+            'POLITE_DELAY_MIN': 0,
+            'POLITE_DELAY_MAX': 0,
+            'PRODUCTS': {},
+        }
+        try:
+            with benchmark.config_overrides(**overrides):
+                products = {}
+                for i in range(8):
+                    shopee.add_item(1, 100 + i, name=f'Produk {i}', stock=0)
+                    products[f'Produk {i}'] = shopee.product_url(1, 100 + i)
+                keys = [f'1.{100 + i}' for i in range(8)]
+                
+                # Produk watchlist Telegram ikut dibagi, bukan hanya Config.PRODUCTS
+                store = StateStore(state_path)
+                for product_name, product_url in products.items():
+                    store.watch(product_name, product_url)
+                store.subscribe('555', shopee.product_url(2, 200), 'Produk chat lain')
+                store.close()
+                
+                coordinator = ShardCoordinator(3)
+                assert coordinator.products == products
+                thread = threading.Thread(target=coordinator.run, daemon=True)
+                thread.start()
+                wait_workers(coordinator)
+                
+                # Tunggu semua produk dicek sekali (status awal HABIS)
+                assert wait_state(state_path, keys, lambda state: state.is_available is False)
+                shopee.add_item(1, 102, name='Produk 2', stock=5)
+                shopee.add_item(1, 105, name='Produk 5', stock=5)
+                assert wait_messages('READY STOCK!', 2)
+                assert wait_state(state_path, ['1.102', '1.105'], lambda state: state.is_available)
+                coordinator.stop()
+                thread.join(20)
+                
+                texts = '\n'.join(text for _, text in telegram.messages)
+                assert texts.count('READY STOCK!') == 2
+                assert texts.count('Produk 2') == 1
+                assert texts.count('Produk 5') == 1
+                assert 'Produk chat lain' not in texts
+                
+                # Jumlah worker berubah: produk pindah shard, status terakhir tetap ada
+                restarted = time.time()
+                coordinator = ShardCoordinator(2)
+                thread = threading.Thread(target=coordinator.run, daemon=True)
+                thread.start()
+                wait_workers(coordinator)
+                assert wait_state(state_path, keys, lambda state: state.last_seen >= restarted)
+                coordinator.stop()
+                thread.join(20)
+                
+                texts = '\n'.join(text for _, text in telegram.messages)
+                assert texts.count('READY STOCK!') == 2
+                assert 'Produk Habis' not in texts
+        finally:
+            shopee.stop()
+            telegram.stop()
+
+
+def test_sharded_shop_watch():
+    """Test mode sharding tanpa produk: worker 0 tetap jalan untuk pantau toko"""
+    import os
+    import tempfile
+    
+    shopee = FakeShopeeServer()
+    telegram = FakeTelegramServer()
+    shopee.start()
+    telegram.start()
+    try:
+        shopee.add_item(2, 201, name='Item Lama', stock=3)
+        with tempfile.TemporaryDirectory() as tmp, benchmark.config_overrides(
+            SHOPEE_BASE_URL=shopee.base_url, TELEGRAM_API_URL=telegram.base_url,
+            TELEGRAM_BOT_TOKEN=telegram.token, TELEGRAM_CHAT_ID='999', TELEGRAM_DIGEST_WINDOW=0.1,
+            STATE_DB=os.path.join(tmp, 'state.db'), HISTORY_DIR='', POLITE_DELAY_MIN=0, POLITE_DELAY_MAX=0,
+            PRODUCTS={}, SHOPS={'Toko Dua': f"{shopee.base_url}/shop/2"}, SHOP_CHECK_INTERVAL=0.2,
+        ):
+            coordinator = ShardCoordinator(3)
+            assert coordinator.products == {}
+            thread = threading.Thread(target=coordinator.run, daemon=True)
+            thread.start()
+            try:
+                # Crawl kedua sudah mulai = index awal toko selesai dibuat
+                deadline = time.monotonic() + 15
+                while shopee.hits['/api/v4/shop/search_items'] < 2 and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                assert shopee.hits['/api/v4/shop/search_items'] >= 2
+                assert list(coordinator.processes) == [0]
+                
+                shopee.add_item(2, 202, name='Item Baru', stock=1)
+                deadline = time.monotonic() + 10
+                while not any('Item Baru' in text for _, text in telegram.messages) and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                assert any('PRODUK BARU' in text and 'Item Baru' in text for _, text in telegram.messages)
+            finally:
+                coordinator.stop()
+                thread.join(20)
+    finally:
+        shopee.stop()
+        telegram.stop()
+
+
+def test_sharded_worker_restart():
+    """Test coordinator: worker mati di-restart walau antrian event sibuk, waktu kirim kembali ke worker"""
+    
+    class DeadProcess:
+        pid = None
+        exitcode = 1
+        
+        def is_alive(self):
+            return False
+        
+        def join(self, timeout=None):
+            pass
+    
+    with benchmark.config_overrides(TELEGRAM_CHAT_ID='999'):
+        coordinator = ShardCoordinator(1, {'A': 'https://shopee.co.id/A-i.1.101'})
+    started = []
+    coordinator._start_worker = lambda index: started.append(index) or coordinator.processes.update({index: DeadProcess()})
+    coordinator.notify = lambda message, detected_at=None, key=None, urgent=False: True
+    busy = threading.Event()
+    
+    def flood():
+        while not busy.is_set():
+            coordinator.events.put((0, 'restock', time.time(), None, False))
+            time.sleep(0.005)
+    
+    feeder = threading.Thread(target=flood, daemon=True)
+    feeder.start()
+    thread = threading.Thread(target=coordinator.run, daemon=True)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 5
+        while len(started) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        # Start awal + restart setelah WORKER_CHECK_INTERVAL
+        assert len(started) >= 2
+    finally:
+        busy.set()
+        coordinator.stop()
+        thread.join(10)
+        feeder.join(5)
+    
+    # Notif dari worker 1 terkirim di coordinator -> waktu kirim diteruskan ke worker 1 (laporan burst)
+    coordinator.deliveries.append(multiprocessing.Queue())
+    coordinator._event((1, 'READY', 100.0, '1.101', True))
+    coordinator._delivered('1.101', 100.0, 101.0)
+    coordinator._delivered('9.999', 100.0, 101.0)
+    delivery = coordinator.deliveries[1].get(timeout=2)
+    assert delivery == ('1.101', 100.0, 101.0) and coordinator.deliveries[1].empty()
+    received = []
+    notifiers = Notifiers([])
+    notifiers.delivery_listeners.append(lambda *args: received.append(args))
+    coordinator.deliveries[1].put(delivery)
+    coordinator.deliveries[1].put(None)
+    _forward_deliveries(coordinator.deliveries[1], notifiers)
+    assert received == [delivery]
+
+
+def test_fake_server_faults():
+    """Test simulasi latency, HTTP 500 dan 429 di server Shopee lokal"""
+    server = FakeShopeeServer()
+    server.start()
+    try:
+        server.add_item(1, 101)
+        url = f"{server.base_url}/api/v4/item/get?shopid=1&itemid=101"
+        
+        server.configure(error_rate=1.0)
+        assert requests.get(url, timeout=5).status_code == 500
+        server.configure(throttle_rate=1.0)
+        response = requests.get(url, timeout=5)
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+        server.configure(latency=0.2)
+        started = time.monotonic()
+        assert requests.get(url, timeout=5).status_code == 200
+        assert time.monotonic() - started >= 0.2
+        assert server.hits['error_500'] == 1
+        assert server.hits['error_429'] == 1
+    finally:
+        server.stop()
+
+
+def test_benchmark_smoke():
+    """Test benchmark jalan cepat dengan ukuran kecil"""
+    args = benchmark.parse_args([
+        '--products', '12', '--sweeps', '1', '--restocks', '3', '--page-kb', '20',
+        '--parse-runs', '2', '--min-interval', '0.1', '--max-interval', '0.4',
+        '--latency', '0', '--jitter', '0', '--timeout', '20', '--cold-runs', '1', '--cold-products', '3',
+        '--memory-products', '500',
+    ])
+    results = benchmark.run_benchmarks(args)
+    
+    assert results['sweep']['batch']['products'] == 12
+    assert results['sweep']['per_item']['products_per_second'] > 0
+    assert results['restock']['detected'] == 3
+    assert 0 < results['restock']['p50_seconds'] <= results['restock']['p99_seconds']
+    assert results['parse']['beautifulsoup']['cpu_ms'] > 0
+    assert results['cold_start']['failed_runs'] == 0
+    assert results['cold_start']['once_seconds'] > results['cold_start']['import_seconds'] > 0
+    assert 0 < results['memory']['compact_bytes_per_product'] < results['memory']['legacy_bytes_per_product']
+    assert benchmark.percentile([5, 1, 3, 2, 4], 50) == 3
+    assert benchmark.percentile([5, 1, 3, 2, 4], 99) == 5
+
+
+def test_metrics_endpoint():
+    """Test histogram latency/parsing, counter gagal per status dan endpoint /metrics"""
+    metrics = Metrics()
+    metrics.fetch_latency.labels('api_v4').observe(0.003)
+    metrics.fetch_latency.labels('api_v4').observe(0.2)
+    text = metrics.render()
+    assert 'shopee_fetch_latency_seconds_bucket{method="api_v4",le="0.005"} 1' in text
+    assert 'shopee_fetch_latency_seconds_bucket{method="api_v4",le="+Inf"} 2' in text
+    assert 'shopee_fetch_latency_seconds_count{method="api_v4"} 2' in text
+    
+    shopee = FakeShopeeServer()
+    telegram = FakeTelegramServer()
+    shopee.start()
+    telegram.start()
+    try:
+        shopee.add_item(1, 101, name='Produk A', stock=0)
+        shopee.blocked_paths.add('/api/v4/item/get')
+        url = shopee.product_url(1, 101)
+        
+        monitor = offline_monitor(shopee)
+        monitor.check_product(url, 'A')
+        shopee.add_item(1, 101, name='Produk A', stock=3)
+        monitor.check_product(url, 'A')
+        
+        text = monitor.metrics.render()
+        # Cek kedua langsung pakai API v2 (metode sehat dicoba duluan)
+        assert 'shopee_fetch_failures_total{method="api_v4",status="403"} 1' in text
+        assert 'shopee_fetch_failures_total{method="html",status="404"} 1' in text
+        assert 'shopee_fetch_latency_seconds_count{method="api_v2"} 2' in text
+        assert 'shopee_parse_seconds_count{parser="json"} 2' in text
+        assert 'shopee_checks_total{result="changed"} 1' in text
+        monitor.shutdown()
+        
+        # Detection lag dicatat saat pesan benar-benar terkirim
+        config = Config()
+        config.TELEGRAM_API_URL = telegram.base_url
+        config.TELEGRAM_DIGEST_WINDOW = 0
+        http = HttpPool(config)
+        outbox = TelegramOutbox(http, telegram.token, config, metrics)
+        outbox.send('999', 'restock', detected_at=time.time() - 1.5)
+        outbox.send('999', 'info biasa')
+        outbox.close()
+        http.close()
+        assert 'shopee_detection_lag_seconds_count 1' in metrics.render()
+        assert 'shopee_detection_lag_seconds_bucket{le="1"} 0' in metrics.render()
+        
+        server = MetricsServer(metrics, 0)
+        assert server.start()
+        try:
+            response = requests.get(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5)
+            assert response.status_code == 200
+            assert '# TYPE shopee_fetch_latency_seconds histogram' in response.text
+            assert requests.get(f"http://127.0.0.1:{server.server_port}/", timeout=5).status_code == 404
+        finally:
+            server.stop()
+    finally:
+        shopee.stop()
+        telegram.stop()
+
+
+def test_rule_engine():
+    """Test rule harga/stok/terjual hanya dievaluasi untuk field yang berubah"""
+    engine = RuleEngine([
+        {'type': 'price_drop', 'percent': 10},
+        {'type': 'price_below', 'target': 80000, 'product': 'A'},
+        {'type': 'stock_below', 'threshold': 5},
+        {'type': 'stock_above', 'threshold': 20},
+        {'type': 'sold_spike', 'per_hour': 100},
+    ])
+    
+    def info(price, stock, sold, method=Method.API_V4):
+        units = to_units(price)
+        return ProductSnapshot('A', units, units, units, stock, sold, 'Toko', stock > 0, method)
+    
+    assert engine.evaluate('a', 'A', info(100000, 10, 0), now=0) == []
+    # Tidak ada field berubah -> tidak ada rule yang dipanggil
+    assert engine.evaluate('a', 'A', info(100000, 10, 0), now=60) == []
+    assert engine.stats['evaluated'] == 0
+    
+    reasons = engine.evaluate('a', 'A', info(75000, 10, 0), now=120)
+    assert len(reasons) == 2
+    assert 'Harga turun 25%' in reasons[0] and 'target' in reasons[1]
+    assert engine.evaluate('b', 'B', info(75000, 10, 0), now=120) == []
+    assert engine.evaluate('b', 'B', info(70000, 10, 0), now=130) == []
+    
+    assert 'Stok menipis' in engine.evaluate('a', 'A', info(75000, 3, 0), now=180)[0]
+    assert 'Stok naik' in engine.evaluate('a', 'A', info(75000, 25, 0), now=240)[0]
+    # 10 unit dalam 60 detik = 600/jam
+    assert 'Penjualan melonjak' in engine.evaluate('a', 'A', info(75000, 25, 10), now=300)[0]
+    assert engine.evaluate('a', 'A', info(75000, 25, 11), now=3900) == []
+    # HTML tidak punya stok/terjual asli: tidak dianggap berubah
+    assert engine.evaluate('a', 'A', info(75000, 1, 0, method=Method.HTML_JSONLD), now=4000) == []
+    
+    # Setelah restart: harga terakhir dari state.db jadi pembanding
+    restarted = RuleEngine([{'type': 'price_drop', 'percent': 10}])
+    assert restarted.evaluate('a', 'A', info(50000, 25, 11), last_price=75000.0, now=0)
+    
+    server = FakeShopeeServer()
+    server.start()
+    try:
+        server.add_item(1, 101, name='Produk A', price=100000, stock=10)
+        url = server.product_url(1, 101)
+        monitor = offline_monitor(server)
+        monitor.rules = RuleEngine([{'type': 'price_drop', 'percent': 10}])
+        sent = []
+        monitor.send_telegram_message = lambda message, detected_at=None, **kwargs: sent.append(message)
+        
+        monitor.check_product(url, 'A')
+        server.add_item(1, 101, name='Produk A', price=85000, stock=10)
+        monitor.check_product(url, 'A')
+        assert len(sent) == 1
+        assert 'Harga turun 15%' in sent[0]
+        monitor.shutdown()
+    finally:
+        server.stop()
+
+
+def test_history_store():
+    """Test riwayat harga/stok: append ringkas, query range, downsampling"""
+    import os
+    import tempfile
+    
+    def info(price, stock, available, method=Method.API_V4):
+        units = to_units(price)
+        return ProductSnapshot('A', units, units, units, stock, 7, 'Toko', available, method)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(tmp, downsample_after=86400, bucket=3600)
+        start = 1699999200  # pas di awal jam
+        # 2 hari observasi tiap 60 detik, tersedia hanya sebentar di hari pertama
+        for i in range(2 * 1440):
+            now = start + i * 60
+            available = 600 <= i < 610
+            store.append('url-a', info(150000.4 - i, 3 if available else 0, available), now=now)
+        store.append('url-a', info(1000, 1, True, method=Method.HTML_JSONLD), now=start + 2 * 86400)
+        
+        rows = store.query('url-a', start + 86400 + 60, start + 86400 + 180)
+        assert [row[0] for row in rows] == [start + 86400 + 60, start + 86400 + 120, start + 86400 + 180]
+        assert rows[0][1] == 150000 - 1441 and rows[0][3] == 7
+        assert store.query('url-a')[-1][2:4] == (-1, -1)
+        
+        # Append terakhir memicu downsampling: hari pertama jadi 24 record per jam
+        assert os.path.getsize(store.path('url-a')) == HEADER.size + (24 + 1440 + 1) * RECORD.size
+        rows = store.query('url-a')
+        hourly = [row for row in rows if row[0] < start + 86400]
+        assert len(hourly) == 24
+        # Bucket berisi restock tetap tercatat tersedia, harga = harga terendah
+        assert store.restocks('url-a', end=start + 86400) == [start + 10 * 3600]
+        assert hourly[0][1] == 150000 - 59
+        # Idempotent
+        store.compact('url-a', now=start + 2 * 86400)
+        assert store.query('url-a') == rows
+        
+        # Buka ulang: lanjut append di file yang sama
+        store = HistoryStore(tmp)
+        store.append('url-a', info(900, 2, True), now=start + 2 * 86400 + 60)
+        assert store.query('url-a')[-1] == (start + 2 * 86400 + 60, 900, 2, 7, True)
+        assert store.query('url-lain') == []
+
+
+def test_telegram_commands():
+    """Test /add /remove /list /interval lewat getUpdates tanpa restart"""
+    shopee = FakeShopeeServer()
+    telegram = FakeTelegramServer()
+    shopee.start()
+    telegram.start()
+    try:
+        shopee.add_item(1, 101, name='Produk A', stock=0)
+        shopee.add_item(1, 102, name='Produk B', stock=4)
+        url_a = shopee.product_url(1, 101)
+        url_b = shopee.product_url(1, 102, slug='Kaos-Polos-Hitam')
+        canonical_b = f"{shopee.base_url}/product/1/102"
+        
+        with benchmark.config_overrides(
+            SHOPEE_BASE_URL=shopee.base_url, TELEGRAM_API_URL=telegram.base_url,
+            TELEGRAM_BOT_TOKEN=telegram.token, TELEGRAM_CHAT_ID='999',
+            TELEGRAM_DIGEST_WINDOW=0, TELEGRAM_RATE_PER_CHAT=100, HISTORY_DIR='',
+            POLITE_DELAY_MIN=0, POLITE_DELAY_MAX=0, PRODUCTS={'A': url_a},
+            MIN_CHECK_INTERVAL=30, MAX_CHECK_INTERVAL=60, CHECK_INTERVAL=60,
+        ):
+            monitor = ShopeeMonitorReliable(state_path=':memory:')
+            engine = AsyncPollingEngine(monitor)
+            done = threading.Event()
+        
+            async def run_engine():
+                task = asyncio.create_task(engine.run_scheduled())
+                while not done.is_set():
+                    await asyncio.sleep(0.05)
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        
+            thread = threading.Thread(target=asyncio.run, args=(run_engine(),), daemon=True)
+            thread.start()
+            # Jadwal hanya diubah dari thread event loop, bukan thread getUpdates
+            mutators = []
+            for method in ('add', 'remove', 'set_interval'):
+                original = getattr(engine.scheduler, method)
+                
+                def recorded(*args, original=original, **kwargs):
+                    mutators.append(threading.current_thread())
+                    return original(*args, **kwargs)
+                setattr(engine.scheduler, method, recorded)
+            commands = TelegramCommands(monitor, engine, poll_timeout=1)
+            commands.start()
+        
+            def command(text, chat_id='999'):
+                count = len(telegram.messages)
+                telegram.push_command(text, chat_id)
+                if chat_id != '999':
+                    time.sleep(0.5)
+                    return None
+                deadline = time.monotonic() + 5
+                while len(telegram.messages) == count and time.monotonic() < deadline:
+                    time.sleep(0.02)
+                assert len(telegram.messages) == count + 1
+                return telegram.messages[-1][1]
+        
+            try:
+                # Host selain Shopee (jaringan internal) ditolak walau path mirip URL produk
+                assert 'Hanya URL produk Shopee' in command(f'/add {telegram.base_url}/x-i.1.2')
+                assert 'Hanya URL produk Shopee' in command('/add file:///etc/passwd-i.1.2')
+                assert '/x-i.1.2' not in telegram.hits
+                assert 'Ditambahkan' in command(f'/add {url_b}')
+                # Yang disimpan URL kanonik, bukan teks dari chat
+                assert monitor.products['Kaos Polos Hitam'] == canonical_b
+                # Produk baru langsung dicek tanpa restart
+                deadline = time.monotonic() + 5
+                while 'is_available' not in monitor.product_status.get('1.102', {}) and time.monotonic() < deadline:
+                    time.sleep(0.02)
+                assert monitor.product_status['1.102']['is_available'] is True
+                assert 'Sudah dimonitor' in command(f'/add {url_b}')
+            
+                reply = command('/list')
+                assert '1. A - HABIS' in reply and '2. Kaos Polos Hitam - READY' in reply
+                assert 'minimal' in command('/interval 5')
+                assert 'dicek tiap 15 detik' in command('/interval 15 2')
+                assert engine.scheduler.intervals()['Kaos Polos Hitam'] == 15
+                assert 'Dihapus' in command('/remove 1')
+                assert list(monitor.products) == ['Kaos Polos Hitam']
+                assert 'A' not in engine.scheduler.intervals()
+                assert command('/list', chat_id='123') is None
+                assert commands.stats['rejected'] == 1
+                assert 'Perintah tidak dikenal' in command('/foo')
+                assert len(mutators) >= 3 and set(mutators) == {thread}
+            finally:
+                commands.stop()
+                done.set()
+                thread.join(5)
+        
+            # Tiap perintah diproses sekali, offset tersimpan di state.db
+            assert len(telegram.messages) == 9
+            restarted = TelegramCommands(monitor, engine, poll_timeout=0)
+            assert restarted.offset == commands.offset
+            assert restarted.poll_once() == 0
+            assert monitor.product_status.watchlist() == ({'Kaos Polos Hitam': canonical_b}, {'A'})
+            engine.close()
+            monitor.shutdown()
+    finally:
+        shopee.stop()
+        telegram.stop()
+
+
+def test_subscriptions_fanout():
+    """Test satu produk dengan banyak pelanggan: sekali fetch, notif ke semua chat"""
+    store = StateStore(':memory:')
+    subscriptions = Subscriptions(store)
+    assert subscriptions.subscribe('1', 'u1', 'Produk 1') is True
+    assert subscriptions.subscribe('2', 'u1', 'Produk Satu') is False
+    subscriptions.subscribe('2', 'u2', 'Produk 2')
+    assert sorted(subscriptions.subscribers('u1')) == ['1', '2']
+    assert subscriptions.products() == {'Produk 1': 'u1', 'Produk 2': 'u2'}
+    assert subscriptions.chat_products('2') == {'u1': 'Produk Satu', 'u2': 'Produk 2'}
+    assert len(subscriptions) == 3 and subscriptions.product_count() == 2
+    assert subscriptions.unsubscribe('1', 'u1') is False
+    assert subscriptions.unsubscribe('2', 'u1') is True
+    # Langganan tersimpan di state.db
+    assert Subscriptions(store).chat_products('2') == {'u2': 'Produk 2'}
+    store.close()
+    
+    # Key lambat (resolve short link) tidak menahan lookup pelanggan di jalur cek
+    slow = Subscriptions(key=lambda url: time.sleep(1.0) or url if url == 'short' else url)
+    slow.subscribe('1', 'u1', 'Produk 1')
+    adding = threading.Thread(target=slow.subscribe, args=('2', 'short', 'Short'))
+    adding.start()
+    time.sleep(0.1)
+    started = time.monotonic()
+    assert slow.subscribers('u1') == ('1',)
+    assert time.monotonic() - started < 0.5
+    adding.join()
+    
+    shopee = FakeShopeeServer()
+    telegram = FakeTelegramServer()
+    shopee.start()
+    telegram.start()
+    try:
+        shopee.add_item(1, 101, name='Produk A', stock=0)
+        url = shopee.product_url(1, 101)
+        with benchmark.config_overrides(
+            SHOPEE_BASE_URL=shopee.base_url, TELEGRAM_API_URL=telegram.base_url,
+            TELEGRAM_BOT_TOKEN=telegram.token, TELEGRAM_CHAT_ID='999',
+            TELEGRAM_DIGEST_WINDOW=0, TELEGRAM_RATE_PER_CHAT=100, HISTORY_DIR='',
+            POLITE_DELAY_MIN=0, POLITE_DELAY_MAX=0, PRODUCTS={'A': url},
+        ):
+            monitor = ShopeeMonitorReliable(state_path=':memory:')
+            monitor.subscriptions.subscribe('123', url, 'Produk A')
+            monitor.subscriptions.subscribe('456', url, 'Incaran')
+            assert monitor.products == {'A': url}
+            
+            assert monitor.check_product(url, 'A') is not None
+            shopee.set_stock(1, 101, 3)
+            fetches = sum(shopee.hits.values())
+            assert monitor.check_product(url, 'A')['is_available'] is True
+            # Satu fetch untuk tiga pelanggan
+            assert sum(shopee.hits.values()) == fetches + 1
+            
+            deadline = time.monotonic() + 5
+            while len(telegram.messages) < 3 and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert sorted(chat for chat, _ in telegram.messages) == ['123', '456', '999']
+            assert all('READY STOCK' in text for _, text in telegram.messages)
+            monitor.shutdown()
+    finally:
+        shopee.stop()
+        telegram.stop()
+
+
+def test_product_identity():
+    """Test URL beda untuk item sama digabung, short link di-resolve sekali"""
+    import os
+    import tempfile
+    
+    assert parse_ids('https://shopee.co.id/Kaos-Polos-i.12.345?sp_atk=x') == ('12', '345')
+    assert parse_ids('https://shopee.co.id/product/12/345/') == ('12', '345')
+    assert parse_ids('https://shopee.co.id/shop/12/345') == ('12', '345')
+    assert parse_ids('https://shp.ee/abc123') == (None, None)
+    
+    server = FakeShopeeServer()
+    server.start()
+    try:
+        server.add_item(1, 101, name='Produk A', stock=0)
+        server.add_item(1, 102, name='Produk B', stock=2)
+        url_a = server.product_url(1, 101)
+        short = server.add_short_link('abc', server.product_url(1, 101, slug='Promo'))
+        products = {
+            'A': url_a,
+            'A promo': server.product_url(1, 101, slug='Promo') + '?sp_atk=123',
+            'A share': f"{server.base_url}/product/1/101",
+            'A short': short,
+            'B': server.product_url(1, 102),
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'state.db')
+            # State lama masih pakai key URL
+            store = StateStore(path)
+            store[url_a] = {'is_available': False, 'fail_count': 0, 'last_price': 100000.0}
+            store.close()
+            
+            with benchmark.config_overrides(
+                SHOPEE_BASE_URL=server.base_url, HISTORY_DIR='', SHORT_LINK_HOSTS=['127.0.0.1'],
+            ):
+                monitor = ShopeeMonitorReliable(state_path=path, products=products)
+                monitor.send_telegram_message = lambda message, detected_at=None, **kwargs: True
+                assert monitor.products == {'A': url_a, 'B': products['B']}
+                assert server.hits['/s/abc'] == 1
+                assert monitor.extract_product_ids(short) == ('1', '101')
+                
+                # Host di luar SHORT_LINK_HOSTS tidak pernah di-request (SSRF lewat /add)
+                resolved = []
+                identities = ProductIdentities(resolver=lambda url: resolved.append(url) or url)
+                for url in (
+                    short, 'http://169.254.169.254/latest/meta-data/', 'file:///etc/passwd',
+                    'https://shp.ee.evil.example/abc', f"http://localhost:{server.base_url.rsplit(':', 1)[1]}/s/abc",
+                ):
+                    assert identities.ids(url) == (None, None)
+                assert resolved == []
+                assert is_short_link('https://shp.ee/abc') and is_short_link('https://s.shopee.co.id/x')
+                # Status lama pindah ke key identitas, jadi restock tetap terdeteksi
+                assert monitor.product_status['1.101']['is_available'] is False
+                assert url_a not in monitor.product_status
+                
+                fetches = sum(server.hits.values())
+                for product_name, product_url in monitor.products.items():
+                    monitor.check_product(product_url, product_name)
+                assert sum(server.hits.values()) == fetches + 2
+                monitor.shutdown()
+                
+                # Restart: short link diambil dari state.db tanpa request lagi
+                monitor = ShopeeMonitorReliable(state_path=path, products=products)
+                assert server.hits['/s/abc'] == 1
+                assert len(monitor.products) == 2
+                monitor.shutdown()
+    finally:
+        server.stop()
+
+
+def test_check_once():
+    """Test --once: status dari state.db, hanya notif perubahan, import ringan"""
+    import os
+    import subprocess
+    import sys
+    import tempfile
+    
+    # Import bot_reliable tidak memuat parser HTML dan tidak membuat bot.log
+    with tempfile.TemporaryDirectory() as tmp:
+        code = "import sys, bot_reliable; print(sorted({'bs4', 'lxml.etree', 'requests'} & set(sys.modules)))"
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=tmp, capture_output=True, text=True, check=True,
+            env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        ).stdout
+        assert output.strip() == '[]'
+        assert not os.path.exists(os.path.join(tmp, 'bot.log'))
+    
+    shopee = FakeShopeeServer()
+    telegram = FakeTelegramServer()
+    shopee.start()
+    telegram.start()
+    try:
+        shopee.add_item(1, 101, name='Produk A', stock=3)
+        shopee.add_item(1, 102, name='Produk B', stock=0)
+        products = {'A': shopee.product_url(1, 101), 'B': shopee.product_url(1, 102)}
+        with tempfile.TemporaryDirectory() as tmp, benchmark.config_overrides(
+            SHOPEE_BASE_URL=shopee.base_url, TELEGRAM_API_URL=telegram.base_url,
+            TELEGRAM_BOT_TOKEN=telegram.token, TELEGRAM_CHAT_ID='999', HISTORY_DIR='',
+            POLITE_DELAY_MIN=0, POLITE_DELAY_MAX=0, PRODUCTS=products,
+        ):
+            path = os.path.join(tmp, 'state.db')
+            store = StateStore(path)
+            store['1.101'] = {'is_available': False, 'fail_count': 0}
+            store.close()
+            
+            assert ShopeeMonitorReliable(state_path=path).check_once() == 0
+            # Hanya A yang berubah (habis -> ready); B baru dicatat, tanpa pesan start
+            assert len(telegram.messages) == 1 and 'Produk A' in telegram.messages[0][1]
+            
+            store = StateStore(path)
+            assert store['1.101']['is_available'] is True
+            assert store['1.102']['is_available'] is False
+            store.close()
+            
+            shopee.blocked_paths.update({'/api/v4/item/get', '/api/v2/item/get', '/api/v4/item/get_list'})
+            shopee.pages.clear()
+            assert ShopeeMonitorReliable(state_path=path).check_once() == 1
+    finally:
+        shopee.stop()
+        telegram.stop()
+
+
+def test_egress_pool():
+    """Test egress: 403/429 -> cooldown pindah egress, budget per endpoint membatasi request"""
+    server = FakeShopeeServer()
+    server.start()
+    try:
+        server.add_item(1, 101, name='Produk A', stock=3)
+        products = {'A': server.product_url(1, 101)}
+        with benchmark.config_overrides(
+            SHOPEE_BASE_URL=server.base_url, HISTORY_DIR='', METHOD_RETRY_DELAY=0,
+            EGRESS_POOL=['direct', 'source:127.0.0.1'], EGRESS_BURST=2,
+            EGRESS_BUDGETS={'api_v4': 0, 'html': 0, 'api_v2': 0, 'batch': 60},
+        ):
+            monitor = ShopeeMonitorReliable(state_path=':memory:', products=products)
+            monitor.send_telegram_message = lambda message, detected_at=None, **kwargs: True
+            pool = monitor.egress
+            direct, local = pool.egresses
+            assert (direct.session, local.session) == ('shopee', 'shopee@1')
+            
+            # API v4 diblokir: tiap egress kena sekali lalu cooldown, request ketiga tidak dikirim
+            server.blocked_paths.add('/api/v4/item/get')
+            for _ in range(2):
+                assert monitor.method_1_api_v4('1', '101') is None
+            try:
+                monitor.method_1_api_v4('1', '101')
+                assert False, "semua egress cooldown seharusnya EgressUnavailable"
+            except EgressUnavailable:
+                pass
+            assert server.hits['/api/v4/item/get'] == 2
+            monitor.check_product(products['A'], 'A')
+            assert direct.stats['cooldowns'] == local.stats['cooldowns'] == 1
+            assert monitor.product_status['1.101']['is_available'] is True
+            assert monitor.http.stats()['shopee@1']['requests'] >= 1
+            assert monitor.metrics.egress_cooldowns.labels('source:127.0.0.1', 'api_v4').value == 1
+            
+            # Budget batch: burst 2 per egress, lalu habis (tanpa menunggu)
+            taken = [pool.acquire('batch', timeout=0) for _ in range(4)]
+            assert sorted(egress.label for egress in taken) == ['direct', 'direct', 'source:127.0.0.1', 'source:127.0.0.1']
+            try:
+                pool.acquire('batch', timeout=0)
+                assert False, "budget batch seharusnya habis"
+            except EgressUnavailable:
+                pass
+            
+            # 429 dengan Retry-After lebih lama dari cooldown dasar, 200 mereset hitungan
+            pool.report(direct, 'html', 429, '600')
+            assert direct.cooldown_until['html'] - time.monotonic() > 500
+            pool.report(direct, 'html', 200)
+            assert direct.strikes['html'] == 0
+            assert pool.acquire('html', timeout=0) is local
+            monitor.shutdown()
+        
+        # Budget egress habis = ditunda, bukan gagal: breaker tetap closed, fail_count tidak naik
+        server.blocked_paths.clear()
+        server.hits.clear()
+        page_url = server.add_page(1, 101, SAMPLE_PAGES[0])
+        with benchmark.config_overrides(
+            SHOPEE_BASE_URL=server.base_url, HISTORY_DIR='', METHOD_RETRY_DELAY=0,
+            EGRESS_POOL=['direct'], EGRESS_BURST=1, EGRESS_MAX_WAIT=0,
+            EGRESS_BUDGETS={'api_v4': 1, 'html': 1, 'api_v2': 1, 'batch': 1},
+        ):
+            monitor = ShopeeMonitorReliable(state_path=':memory:', products={'A': page_url})
+            monitor.send_telegram_message = lambda message, detected_at=None, **kwargs: True
+            methods = [monitor.get_product_info(page_url)['method'] for _ in range(3)]
+            assert methods == ['API v4', 'HTML Scraping (JSON-LD)', 'API v2']
+            for _ in range(5):
+                try:
+                    monitor.get_product_info(page_url)
+                    assert False, "semua budget habis seharusnya EgressUnavailable"
+                except EgressUnavailable:
+                    pass
+            assert all(server.hits[path] == 1 for path in ('/api/v4/item/get', '/api/v2/item/get'))
+            assert {name: state['state'] for name, state in monitor.health.snapshot().items()} == {
+                'api_v4': 'closed', 'html': 'closed', 'api_v2': 'closed', 'batch': 'closed',
+            }
+            assert monitor.check_product(page_url, 'A') is None
+            assert monitor.product_status.get('1.101') is None
+            assert monitor.metrics.checks.labels('deferred').value == 1
+            monitor.shutdown()
+    finally:
+        server.stop()
+
+
+def test_shop_watch():
+    """Test pantau toko: index awal tanpa alert, halaman sama dilewati, alert item baru & restock, item hilang dibuang"""
+    import os
+    import tempfile
+    
+    assert parse_shop_id('https://shopee.co.id/shop/2') == '2'
+    assert parse_shop_id('2') == '2'
+    assert parse_shop_id('https://shopee.co.id/Kaos-i.2.201') == '2'
+    assert parse_shop_id('https://shopee.co.id/tokoresmi') is None
+    
+    server = FakeShopeeServer()
+    server.start()
+    try:
+        for item_id in range(201, 236):
+            server.add_item(2, item_id, name=f'Item {item_id}', stock=0 if item_id % 5 == 0 else 3)
+        server.add_item(9, 901, name='Toko lain', stock=1)
+        watched = {'Item 205': server.product_url(2, 205)}
+        with tempfile.TemporaryDirectory() as tmp, benchmark.config_overrides(
+            SHOPEE_BASE_URL=server.base_url, HISTORY_DIR='', SHOP_PAGE_SIZE=10, SHOP_MAX_ALERTS=1,
+            SHOPS={'Toko Dua': f"{server.base_url}/shop/2"},
+        ):
+            path = os.path.join(tmp, 'state.db')
+            monitor = ShopeeMonitorReliable(state_path=path, products=watched)
+            sent = []
+            monitor.send_telegram_message = lambda message, detected_at=None, **kwargs: sent.append(message)
+            watcher = monitor.shop_watch
+            
+            assert watcher.crawl('Toko Dua') == [] and sent == []
+            assert server.hits['/api/v4/shop/search_items'] == 4
+            assert len(watcher.index('2').items) == 35
+            
+            # Listing tidak berubah: semua halaman dilewati tanpa decode
+            assert watcher.crawl('Toko Dua') == []
+            assert watcher.stats['pages_skipped'] == 4
+            
+            server.add_item(2, 240, name='Item Baru', stock=2)
+            server.set_stock(2, 230, 4)
+            server.set_stock(2, 205, 4)  # dipantau per URL, tidak dobel
+            server.add_item(2, 221, name='Item 221', price=90000, stock=3)  # hanya harga
+            alerts = watcher.crawl('Toko Dua')
+            assert [(kind, info.name) for kind, info in alerts] == [('new', 'Item Baru'), ('ready', 'Item 230')]
+            assert alerts[0][1].url == f"{server.base_url}/product/2/240"
+            # SHOP_MAX_ALERTS=1: alert kedua diringkas
+            assert len(sent) == 2 and 'PRODUK BARU' in sent[0] and 'Item 230' in sent[1]
+            monitor.shutdown()
+            
+            # Restart: index dari state.db, tidak ada alert ulang
+            monitor = ShopeeMonitorReliable(state_path=path, products=watched)
+            monitor.send_telegram_message = lambda message, detected_at=None, **kwargs: sent.append(message)
+            hits = server.hits['/api/v4/shop/search_items']
+            assert monitor.shop_watch.crawl('Toko Dua') == []
+            assert monitor.shop_watch.stats['pages_skipped'] == 4
+            assert server.hits['/api/v4/shop/search_items'] == hits + 4
+            
+            # Item hilang dari halaman terakhir: dibuang dari index, item di halaman yang dilewati tetap
+            item = server.items.pop((2, 202))
+            assert monitor.shop_watch.crawl('Toko Dua') == []
+            index = monitor.shop_watch.index('2')
+            assert 202 not in index.items and len(index.items) == 35
+            assert monitor.shop_watch.stats['removed'] == 1
+            # Relist: alert produk baru lagi
+            server.items[(2, 202)] = item
+            alerts = monitor.shop_watch.crawl('Toko Dua')
+            assert [(kind, info.name) for kind, info in alerts] == [('new', 'Item 202')]
+            monitor.shutdown()
+    finally:
+        server.stop()
+
+
+def test_notifier_backends():
+    """Test template pesan (cache per produk) dan backend lambat tidak menunda backend lain"""
+    import os
+    import re
+    import tempfile
+    
+    renderer = MessageRenderer()
+    info = ProductSnapshot('Kaos', to_units(150000), to_units(100000), to_units(150000), 3, 12,
+                           'Toko A', True, Method.API_V4, url='https://shopee.co.id/Kaos-i.1.2')
+    message = renderer.render(info, 'rule', ['Harga turun 10%'])
+    expected = (
+        "\n🔔 <b>Perubahan Produk</b> 🔔\n\n📌 Harga turun 10%\n"
+        "\n📦 <b>Produk:</b> Kaos\n\n💰 <b>Harga:</b> Rp 100,000 - Rp 150,000\n"
+        "📊 <b>Stok:</b> READY ✅\n🛒 <b>Terjual:</b> 12 unit\n🏪 <b>Toko:</b> Toko A\n"
+        "\n🔗 <b>BELI SEKARANG:</b>\nhttps://shopee.co.id/Kaos-i.1.2\n\n🤖 <i>Metode: API v4</i>\n"
+    )
+    assert re.fullmatch(re.escape(expected) + r"⏰ <i>\d\d-\d\d-\d{4} \d\d:\d\d:\d\d</i>\n", message)
+    # Stok/terjual berubah: bagian statis dari cache
+    info.stock, info.sold, info.is_available = 0, 15, False
+    message = renderer.render(info, 'sold_out')
+    assert 'Produk Habis' in message and 'HABIS ❌' in message and '15 unit' in message
+    assert renderer.stats == {'render': 1, 'hit': 1}
+    # Harga berubah: render ulang
+    info.price_units = info.price_min_units = info.price_max_units = to_units(90000)
+    assert 'Rp 90,000\n' in renderer.render(info, 'ready')
+    assert renderer.stats['render'] == 2
+    
+    shopee = FakeShopeeServer()
+    telegram = FakeTelegramServer()
+    webhook = FakeWebhookServer()
+    for server in (shopee, telegram, webhook):
+        server.start()
+    webhook.configure(latency=0.3)
+    try:
+        shopee.add_item(1, 101, name='Produk A', stock=3)
+        url = shopee.product_url(1, 101)
+        with tempfile.TemporaryDirectory() as tmp, benchmark.config_overrides(
+            SHOPEE_BASE_URL=shopee.base_url, TELEGRAM_API_URL=telegram.base_url,
+            TELEGRAM_BOT_TOKEN=telegram.token, TELEGRAM_CHAT_ID='999',
+            TELEGRAM_DIGEST_WINDOW=0, TELEGRAM_RATE_PER_CHAT=100, HISTORY_DIR='',
+            NOTIFIERS=['telegram', 'webhook', 'file'], WEBHOOK_URL=webhook.url,
+            NOTIFY_FILE=os.path.join(tmp, 'notif.log'),
+        ):
+            monitor = ShopeeMonitorReliable(state_path=':memory:', products={'A': url})
+            monitor.subscriptions.subscribe('123', url, 'Produk A')
+            info = monitor.check_product(url, 'A')
+            started = time.monotonic()
+            for i in range(3):
+                monitor.notify_subscribers(url, monitor.format_message(info, 'ready', [f'Cek {i}']), time.time())
+            assert time.monotonic() - started < 0.1
+            
+            # Webhook lambat (0.3 detik/pesan) tidak menahan Telegram dan file
+            deadline = time.monotonic() + 5
+            while (monitor.outbox.pending_count() or monitor.notifiers.get('file').stats['sent'] < 3) \
+                    and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert time.monotonic() - started < 0.6
+            assert len(webhook.payloads) < 3
+            
+            monitor.shutdown()
+            # Chat pelanggan lain hanya lewat Telegram (pesan per chat boleh digabung jadi digest)
+            assert monitor.outbox.stats['queued'] == 6
+            assert {chat for chat, _ in telegram.messages} == {'123', '999'}
+            assert [payload['chat_id'] for payload in webhook.payloads] == ['999'] * 3
+            payload = webhook.payloads[0]
+            assert '<b>' in payload['text'] and '<b>' not in payload['plain'] and 'Cek 0' in payload['plain']
+            assert payload['detected_at'] is not None
+            with open(os.path.join(tmp, 'notif.log'), encoding='utf-8') as f:
+                lines = f.read()
+            assert lines.count('PRODUK READY STOCK!') == 3 and '<b>' not in lines
+    finally:
+        for server in (shopee, telegram, webhook):
+            server.stop()
+
+
+def test_burst_mode():
+    """Test mode burst: window harian, prewarm, hanya API v4, restock terlapor per produk, budget dipatuhi"""
+    import os
+    import tempfile
+    from datetime import datetime
+    
+    window = BurstWindow('12:00', 300, 'A')
+    assert window.next_start(datetime(2026, 11, 11, 9, 0)) == datetime(2026, 11, 11, 12, 0)
+    assert window.next_start(datetime(2026, 11, 11, 12, 3)) == datetime(2026, 11, 11, 12, 0)
+    assert window.next_start(datetime(2026, 11, 11, 12, 6)) == datetime(2026, 11, 12, 12, 0)
+    assert BurstWindow('2026-11-11 00:00', 60).next_start(datetime(2026, 11, 12)) is None
+    assert len(parse_windows([{'at': ['12:00', '00:00']}, {'at': '25:99'}], 300)) == 2
+    
+    shopee = FakeShopeeServer()
+    telegram = FakeTelegramServer()
+    shopee.start()
+    telegram.start()
+    try:
+        shopee.add_item(1, 101, name='Produk A', stock=0)
+        shopee.add_item(1, 102, name='Produk B', stock=2)
+        shopee.add_item(1, 103, name='Produk C', stock=0)
+        products = {name: shopee.product_url(1, item) for name, item in (('A', 101), ('B', 102), ('C', 103))}
+        # Digest 30 detik dan budget api_v4 1/menit: burst tidak boleh tertahan keduanya
+        with benchmark.config_overrides(
+            SHOPEE_BASE_URL=shopee.base_url, TELEGRAM_API_URL=telegram.base_url,
+            TELEGRAM_BOT_TOKEN=telegram.token, TELEGRAM_CHAT_ID='999',
+            TELEGRAM_DIGEST_WINDOW=30, HISTORY_DIR='', BURST_INTERVAL=0.05, BURST_BUDGET=6000,
+            EGRESS_POOL=['direct'], EGRESS_BUDGETS=dict(Config.EGRESS_BUDGETS, api_v4=1, burst=0),
+            EGRESS_BURST=1, EGRESS_MAX_WAIT=0,
+        ):
+            monitor = ShopeeMonitorReliable(state_path=':memory:', products=products)
+            engine = AsyncPollingEngine(monitor)
+            burst = BurstMode(monitor, engine, [BurstWindow('12:00', 300, 'A'), BurstWindow('12:00', 60)])
+            start, end, targets = burst.upcoming(datetime(2026, 11, 11, 11, 59))
+            assert start == datetime(2026, 11, 11, 12, 0) and (end - start).total_seconds() == 300
+            assert targets == products
+            
+            async def window(seconds, restocks=()):
+                targets = await burst.prewarm({'A': products['A'], 'C': products['C']})
+                for delay, item_id in restocks:
+                    asyncio.get_running_loop().call_later(delay, shopee.set_stock, 1, item_id, 5)
+                await burst.burst(targets, time.time() + seconds)
+            
+            asyncio.run(window(0.8, restocks=((0.3, 101), (0.5, 103))))
+            # Hanya API v4 (bucket egress burst sendiri) selama window, produk kembali ke jadwal normal
+            assert set(shopee.hits) == {'/api/v4/item/get'}
+            assert burst.stats['polls'] >= 8 and burst.stats['over_budget'] == 0
+            assert burst.stats['egress_deferred'] == 0
+            assert len(engine.scheduler) == 3
+            deadline = time.monotonic() + 5
+            while any(detection['delivered'] is None for detection in burst.detections) and time.monotonic() < deadline:
+                time.sleep(0.02)
+            texts = [text for _, text in telegram.messages]
+            assert any('READY STOCK' in text and 'Produk A' in text for text in texts)
+            assert any('READY STOCK' in text and 'Produk C' in text for text in texts)
+            detections = burst.report()
+            assert sorted(detection['name'] for detection in detections) == ['A', 'C']
+            for detection in detections:
+                # Stok muncul -> notif terkirim: kurang dari satu interval + kirim, tanpa digest 30 detik
+                assert detection['observed'] <= detection['delivered']
+                assert detection['delivered'] - detection['appeared_after'] < 1.0
+            assert monitor.metrics.burst_time_to_alert.labels().snapshot()[2] == 2
+            
+            # Notif produk lain yang terkirim di waktu yang sama tidak dianggap notif restock A
+            now = time.time()
+            detection = {'name': 'A', 'key': monitor.identities.key(products['A']), 'appeared_after': now - 1,
+                         'observed': now, 'detected': now + 1, 'delivered': None}
+            burst.detections = [detection]
+            burst._delivered(monitor.identities.key(products['B']), now + 0.5, now + 2)
+            assert detection['delivered'] is None
+            burst._delivered(detection['key'], now + 0.5, now + 3)
+            assert detection['delivered'] == now + 3
+            
+            # Budget 60/menit: satu cek per detik walau interval 0.05 detik
+            # (2 cek prewarm + 2 token awal + 1 token per detik)
+            burst.budget = 60
+            polls = burst.stats['polls']
+            asyncio.run(window(1.0))
+            assert burst.stats['polls'] - polls <= 5 and burst.stats['over_budget'] > 0
+            burst.close()
+            assert monitor.notifiers.delivery_listeners == []
+            engine.close()
+            monitor.shutdown()
+        
+        # Tanpa backend Telegram (NOTIFIERS=file): waktu kirim tetap terlapor
+        shopee.add_item(1, 104, name='Produk D', stock=0)
+        with tempfile.TemporaryDirectory() as tmp, benchmark.config_overrides(
+            SHOPEE_BASE_URL=shopee.base_url, TELEGRAM_CHAT_ID='999', HISTORY_DIR='',
+            NOTIFIERS=['file'], NOTIFY_FILE=os.path.join(tmp, 'notifikasi.log'), BURST_INTERVAL=0.05,
+        ):
+            monitor = ShopeeMonitorReliable(state_path=':memory:', products={'D': shopee.product_url(1, 104)})
+            engine = AsyncPollingEngine(monitor)
+            burst = BurstMode(monitor, engine, [])
+            
+            async def file_window():
+                targets = await burst.prewarm({'D': shopee.product_url(1, 104)})
+                asyncio.get_running_loop().call_later(0.2, shopee.set_stock, 1, 104, 5)
+                await burst.burst(targets, time.time() + 0.5)
+            
+            asyncio.run(file_window())
+            deadline = time.monotonic() + 5
+            while burst.detections and burst.detections[0]['delivered'] is None and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert [detection['name'] for detection in burst.detections] == ['D']
+            assert burst.detections[0]['delivered'] is not None
+            burst.close()
+            engine.close()
+            monitor.shutdown()
+    finally:
+        shopee.stop()
+        telegram.stop()
+
+
+# Test offline: pakai server lokal, tidak hit Shopee/Telegram asli
+OFFLINE_TESTS = [
+    ('Batch API v4', test_batch_fake_server),
+    ('Konkurensi terbatas', test_bounded_concurrency),
+    ('Scheduler', test_adaptive_scheduler),
+    ('Scheduler fixed-rate', test_fixed_rate_scheduler),
+    ('Scheduler batch lambat', test_scheduler_slow_batch),
+    ('Fast HTML', test_fast_html_extractor),
+    ('State restart', test_state_store_restart),
+    ('Method health', test_method_health_reorder),
+    ('Pool koneksi', test_http_pool_reuse),
+    ('Telegram outbox', test_telegram_outbox),
+    ('Response cache', test_response_cache),
+    ('Sharding', test_sharded_workers),
+    ('Sharding pantau toko', test_sharded_shop_watch),
+    ('Sharding restart worker', test_sharded_worker_restart),
+    ('Fake server faults', test_fake_server_faults),
+    ('Benchmark', test_benchmark_smoke),
+    ('Metrics', test_metrics_endpoint),
+    ('Rule engine', test_rule_engine),
+    ('History store', test_history_store),
+    ('Perintah Telegram', test_telegram_commands),
+    ('Langganan multi chat', test_subscriptions_fanout),
+    ('Identitas produk', test_product_identity),
+    ('Mode --once', test_check_once),
+    ('Egress pool', test_egress_pool),
+    ('Pantau toko', test_shop_watch),
+    ('Backend notifikasi', test_notifier_backends),
+    ('Mode burst', test_burst_mode),
+]
+
+
+def run_offline_tests():
+    """Jalankan semua test offline, return dict nama -> hasil"""
+    results = {}
+    for name, test in OFFLINE_TESTS:
+        try:
+            test()
+            results[name] = True
+        except Exception as e:
+            print(f"   ❌ {name}: {e!r}")
+            results[name] = False
+    return results
+
+
 def main():
     print("\n" + "#"*60)
     print("  BOT SHOPEE MONITOR - TESTING")
@@ -108,15 +1620,20 @@ def main():
     # Test Shopee
     shopee_ok = test_shopee()
     
+    # Test offline
+    offline = run_offline_tests()
+    
     # Summary
     print("\n" + "="*60)
     print("  HASIL TEST")
     print("="*60)
     print(f"Telegram: {'✅ OK' if telegram_ok else '❌ GAGAL'}")
     print(f"Shopee:   {'✅ OK' if shopee_ok else '❌ GAGAL'}")
+    for name, ok in offline.items():
+        print(f"{name}: {'✅ OK' if ok else '❌ GAGAL'}")
     print("="*60 + "\n")
     
-    if telegram_ok and shopee_ok:
+    if telegram_ok and shopee_ok and all(offline.values()):
         print("🎉 SEMUA TEST BERHASIL!")
         print("🚀 Bot siap dijalankan: python bot_reliable.py\n")
     else: